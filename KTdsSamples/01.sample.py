@@ -1,20 +1,14 @@
 # 환경변수
-import os
-import openai
 from dotenv import load_dotenv
+from aoai_client import chat_completion
 
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-openai.azure_endpoint = os.getenv("AZURE_ENDPOINT")
-openai.api_type = os.getenv("OPENAI_API_TYPE")
-openai.api_version = os.getenv("OPENAI_API_VERSION")
-
 subject = input("시의 주제를 입력하세요: ")
 content = input("시의 내용을 입력하세요: ")
 
 # OpenAI API 호출 예시
-response = openai.chat.completions.create(
+response = chat_completion(
     model = "dev-gpt-4o-mini",
     temperature=0.9,
     messages = [
@@ -1,16 +1,10 @@
 # 환경변수
-import os
-import openai
 from dotenv import load_dotenv
+from aoai_client import chat_completion
 import streamlit as st
 
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-openai.azure_endpoint = os.getenv("AZURE_ENDPOINT")
-openai.api_type = os.getenv("OPENAI_API_TYPE")
-openai.api_version = os.getenv("OPENAI_API_VERSION")
-
 subject = st.text_input("시의 주제를 입력하세요: ")
 content = st.text_area("시의 내용을 입력하세요: ")
 
@@ -19,7 +13,7 @@ button_clicked = st.button("시 생성")
 if button_clicked:
     # OpenAI API 호출 예시
     with st.spinner("Wait for it...", show_time=True):
-        response = openai.chat.completions.create(
+        response = chat_completion(
             model = "dev-gpt-4o-mini",
             temperature=0.9,
             max_tokens=500,
@@ -1,22 +1,27 @@
 # 환경변수
 import os
-import openai
+import time
 from dotenv import load_dotenv
+from aoai_client import chat_completion
 import streamlit as st
+from chat_history import HistoryManager
 
 load_dotenv()
-
-openai.api_key = os.getenv("OPENAI_API_KEY")
-openai.azure_endpoint = os.getenv("AZURE_ENDPOINT")
-openai.api_type = os.getenv("OPENAI_API_TYPE")
-openai.api_version = os.getenv("OPENAI_API_VERSION")
 DEPLOYMENT_NAME = os.getenv("DEPLOYMENT_NAME")
 
 #OpenAI 클라이언트 설정
-def get_openapi_client(messages):
+def get_openapi_client(messages, stream=False):
     # OpenAI API 호출 예시
     try:
-        response = openai.chat.completions.create(
+        if stream:
+            return chat_completion(
+                model = DEPLOYMENT_NAME,
+                temperature=0.4,
+                messages = messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        response = chat_completion(
             model = DEPLOYMENT_NAME,
             temperature=0.4,
             messages = messages,
@@ -27,6 +32,35 @@ def get_openapi_client(messages):
         st.error(f"OpenAI API 호출 중 오류 발생: {e}")
         return f"Error: {e}"
 
+#대화 이력 압축용 요약 호출
+def complete_text(messages):
+    response = chat_completion(
+        model = DEPLOYMENT_NAME,
+        temperature=0,
+        messages = messages,
+    )
+    return response.choices[0].message.content
+
+#오래된 대화는 누적 요약으로 대체해 요청 크기를 일정하게 유지 (요약은 대화 해시로 저장되어 세션 간 공유 가능)
+@st.cache_resource
+def get_history_manager():
+    return HistoryManager(complete_text)
+
+#스트리밍 응답에서 토큰만 꺼내면서 첫 토큰 지연시간(TTFT)과 초당 토큰 수 기록
+def stream_tokens(stream, metrics):
+    start = time.perf_counter()
+    for chunk in stream:
+        if chunk.usage is not None:
+            metrics["completion_tokens"] = chunk.usage.completion_tokens
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        if "ttft" not in metrics:
+            metrics["ttft"] = time.perf_counter() - start
+        metrics["chunks"] = metrics.get("chunks", 0) + 1
+        metrics.setdefault("parts", []).append(chunk.choices[0].delta.content)
+        yield chunk.choices[0].delta.content
+    metrics["elapsed"] = time.perf_counter() - start
+
 #Streamlit UI 설정
 st.title("Azure OpenAI Chat Interface")
 st.write("Azure OpenAI API를 사용한 모델과 대화해 보세요~^^")
@@ -45,10 +79,26 @@ if user_input := st.chat_input("메세지를 입력하세요."):
     st.session_state.messages.append({"role":"user", "content":user_input})
     st.chat_message("user").write(user_input)
 
-    #OpenAI API 호출
-    with st.spinner("응답 생성 중..."):
-        response = get_openapi_client(st.session_state.messages)
+    #OpenAI API 호출 (토큰이 도착하는 대로 화면에 출력)
+    with st.chat_message("assistant"):
+        history_manager = get_history_manager()
+        stream = get_openapi_client(history_manager.compact(st.session_state.messages), stream=True)
+        if isinstance(stream, str):
+            response = stream
+            st.write(response)
+        else:
+            metrics = {}
+            try:
+                response = st.write_stream(stream_tokens(stream, metrics))
+            except Exception as e:
+                # 스트리밍 도중 끊기면(APIError, 타임아웃, 연결 종료) 받은 데까지는 대화 이력에 남긴다
+                st.error(f"OpenAI API 응답 수신 중 오류 발생: {e}")
+                response = "".join(metrics.get("parts", [])) or f"Error: {e}"
+                metrics.pop("ttft", None)
+            if "ttft" in metrics:
+                tokens = metrics.get("completion_tokens", metrics["chunks"])
+                generation = max(metrics["elapsed"] - metrics["ttft"], 1e-6)
+                st.caption(f"첫 토큰 {metrics['ttft']:.2f}초 · {tokens / generation:.1f} tokens/s")
 
     #AI 응답 추가
     st.session_state.messages.append({"role":"assistant", "content":response})
-    st.chat_message("assistant").write(response)
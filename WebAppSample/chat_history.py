@@ -0,0 +1,199 @@
+import os
+import hashlib
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+
+# 대화 이력(요약 + 최근 메시지)에 허용할 최대 토큰 수와 그중 요약에 쓸 토큰 수
+HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "3000"))
+SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "500"))
+
+# 메시지 하나당 role/구분자 등으로 추가되는 토큰 수 (근사치)
+MESSAGE_OVERHEAD = 4
+# 요약을 system 메시지로 넣을 때 앞에 붙이는 머리말
+SUMMARY_HEADER = "[이전 대화 요약]\n"
+
+SUMMARY_PROMPT = (
+    "아래는 지금까지의 대화 요약과 그 이후의 대화 내용입니다. "
+    "이후 대화를 이어가는 데 필요한 사실, 사용자의 요청/조건, 결정된 내용을 빠짐없이 포함해 "
+    "기존 요약을 갱신한 새 요약을 한글로 간결하게 작성해줘. 요약만 출력해.\n\n"
+)
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    # 인코더 로드는 느리므로 import 시점이 아니라 처음 토큰을 셀 때 한 번만 수행
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    """토큰 수 계산 (tiktoken이 없으면 글자 수 기반 근사치)"""
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(text) // 2 + 1
+
+
+def message_tokens(message):
+    return count_tokens(message['content'] or '') + MESSAGE_OVERHEAD
+
+
+def _truncate(text, max_tokens):
+    """max_tokens를 넘지 않도록 앞부분만 남김"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoder = _encoder()
+    if encoder is not None:
+        return encoder.decode(encoder.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max(0, 2 * (max_tokens - 1))]
+
+
+class HistoryManager:
+    """토큰 예산 안에서 대화 이력을 압축하는 관리자
+
+    - 최근 메시지는 원문 그대로(sliding window), 그보다 오래된 메시지는 누적 요약 하나로 대체
+    - 요약은 이전 요약 + 새로 밀려난 메시지만으로 갱신 (대화 전체를 다시 요약하지 않음)
+    - 예산을 넘을 때만 창을 low_water 비율까지 줄여서, 요약 호출이 매 턴 일어나지 않게 함
+    - 요약은 대화 앞부분의 해시로 저장하므로 여러 세션이 하나의 관리자를 공유해도 됨
+
+    complete(messages) -> str 는 OpenAI 형식 메시지 목록으로 LLM을 호출해 텍스트를 돌려주는 함수.
+    """
+
+    def __init__(self, complete, max_tokens=HISTORY_MAX_TOKENS, summary_tokens=SUMMARY_MAX_TOKENS,
+                 low_water=0.6, cache_size=1000):
+        self.complete = complete
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.low_water = low_water
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._summaries = OrderedDict()  # 앞부분 메시지 해시 -> (요약된 메시지 수, 요약)
+        self.summary_calls = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+
+    @staticmethod
+    def _prefix_hashes(messages):
+        """i번째 값 = messages[:i]의 해시"""
+        h = hashlib.sha256()
+        hashes = [h.hexdigest()]
+        for msg in messages:
+            h.update(f"{msg['role']}\0{msg['content']}\0".encode('utf-8'))
+            hashes.append(h.hexdigest())
+        return hashes
+
+    def _cached_summary(self, hashes, limit):
+        """limit 이하의 가장 긴 앞부분에 대한 저장된 요약 (없으면 (0, ''))"""
+        with self._lock:
+            for n in range(limit, 0, -1):
+                entry = self._summaries.get(hashes[n])
+                if entry is not None:
+                    self._summaries.move_to_end(hashes[n])
+                    return entry
+        return 0, ''
+
+    def _store_summary(self, key, n, summary):
+        with self._lock:
+            self._summaries[key] = (n, summary)
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+
+    def _summarize(self, summary, messages):
+        dialog = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = SUMMARY_PROMPT + f"[기존 요약]\n{summary or '(없음)'}\n\n[이후 대화]\n{dialog}"
+        self.summary_calls += 1
+        try:
+            text = self.complete([{"role": "user", "content": prompt}])
+        except Exception:
+            # 요약 실패 시 기존 요약을 유지 (밀려난 메시지는 빠지지만 최대 크기는 지킴)
+            return summary
+        return _truncate(text.strip(), self.summary_tokens)
+
+    def _window_start(self, messages, budget, start):
+        """뒤에서부터 budget 안에 들어가는 메시지의 시작 위치 (최소 마지막 메시지 하나는 포함)"""
+        used, i = 0, len(messages)
+        while i > start and (i == len(messages) or used + message_tokens(messages[i - 1]) <= budget):
+            used += message_tokens(messages[i - 1])
+            i -= 1
+        return i
+
+    def compact(self, messages):
+        """예산 안으로 압축한 메시지 목록 반환
+
+        앞쪽 system 메시지는 항상 유지하고, 그 뒤에 요약(system 메시지)과 최근 메시지를 붙인다.
+        """
+        pinned = 0
+        while pinned < len(messages) and messages[pinned]['role'] == 'system':
+            pinned += 1
+        head, dialog = list(messages[:pinned]), list(messages[pinned:])
+        budget = self.max_tokens - sum(message_tokens(msg) for msg in head)
+        full = sum(message_tokens(msg) for msg in messages)
+
+        # 요약 메시지 자리: 머리말 + 요약 + 메시지 오버헤드
+        summary_reserve = count_tokens(SUMMARY_HEADER) + self.summary_tokens + MESSAGE_OVERHEAD
+
+        hashes = self._prefix_hashes(dialog)
+        summarized, summary = self._cached_summary(hashes, len(dialog))
+        window_budget = budget - (summary_reserve if summarized else 0)
+        start = self._window_start(dialog, window_budget, summarized)
+        if start > summarized or sum(message_tokens(msg) for msg in dialog[summarized:]) > window_budget:
+            # 예산 초과: 창을 low_water까지 줄이고 밀려난 메시지를 기존 요약에 합친다
+            window_budget = budget - summary_reserve
+            start = max(summarized, self._window_start(dialog, int(window_budget * self.low_water), summarized))
+            if start > summarized:
+                summary = self._summarize(summary, dialog[summarized:start])
+                summarized = start
+                self._store_summary(hashes[start], start, summary)
+
+        window = dialog[summarized:]
+        # 마지막 메시지 하나만으로도 예산을 넘으면 내용을 잘라서라도 최대 크기를 보장
+        remaining = window_budget - sum(message_tokens(msg) for msg in window[:-1])
+        if window and message_tokens(window[-1]) > remaining:
+            last = dict(window[-1])
+            last['content'] = _truncate(last['content'], max(0, remaining - MESSAGE_OVERHEAD))
+            window[-1] = last
+        result = head
+        if summary:
+            # summary_tokens가 예산보다 큰 설정에서도 최대 크기를 넘지 않도록 남은 자리에 맞춰 자른다
+            room = budget - sum(message_tokens(msg) for msg in window) - MESSAGE_OVERHEAD
+            content = _truncate(SUMMARY_HEADER + summary, max(0, room))
+            if len(content) > len(SUMMARY_HEADER):
+                result.append({"role": "system", "content": content})
+        result.extend(window)
+
+        sent = sum(message_tokens(msg) for msg in result)
+        with self._lock:
+            self.full_tokens += full
+            self.sent_tokens += sent
+        return result
+
+    def stats(self):
+        """지금까지 보낸 이력 토큰과 압축하지 않았을 때의 토큰 비교"""
+        return {
+            'full_tokens': self.full_tokens,
+            'sent_tokens': self.sent_tokens,
+            'reduction': round(1 - self.sent_tokens / self.full_tokens, 3) if self.full_tokens else 0.0,
+            'summary_calls': self.summary_calls,
+        }
+
+
+if __name__ == "__main__":
+    # 긴 대화(60턴)에서 압축 전/후 이력 토큰 비교 (LLM 대신 입력의 마지막 1500자를 돌려주는 요약기 사용)
+    def fake_complete(messages):
+        return messages[-1]['content'][-1500:]
+
+    manager = HistoryManager(fake_complete, max_tokens=3000, summary_tokens=500)
+    messages = [{"role": "system", "content": "You are a travel assistant that provides information on travel service"}]
+    for turn in range(1, 61):
+        messages.append({"role": "user", "content": f"{turn}번째 질문입니다. 호텔과 항공편 조건을 자세히 알려주세요. " * 3})
+        compacted = manager.compact(messages)
+        if turn % 10 == 0:
+            full = sum(message_tokens(msg) for msg in messages)
+            sent = sum(message_tokens(msg) for msg in compacted)
+            print(f"turn {turn:3d}: full={full:6d} sent={sent:5d} messages={len(compacted)}")
+        messages.append({"role": "assistant", "content": f"{turn}번째 답변입니다. 요청하신 조건에 맞는 호텔은 다음과 같습니다. " * 8})
+    print(manager.stats())
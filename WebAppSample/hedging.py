@@ -0,0 +1,267 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 첫 요청이 최근 지연시간의 몇 퍼센타일을 넘으면 보조 요청을 보낼지
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# 요청 하나에 허용하는 전체 시간(초), 넘으면 TimeoutError
+HEDGE_DEADLINE = float(os.getenv("HEDGE_DEADLINE", "60"))
+# 전체 요청 중 보조 요청을 보낼 수 있는 최대 비율 (upstream 부하 상한)
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+# 지연시간 표본이 min_samples개 모이기 전에 쓰는 대기 시간(초)
+HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", "5"))
+
+
+class Hedger:
+    """느린 upstream 응답에 대비한 헤지 요청 관리자
+
+    - 첫 요청이 최근 지연시간의 percentile 값을 넘도록 끝나지 않으면 보조 요청을 하나 더 보내고 먼저 끝난 쪽을 사용
+    - 진 쪽은 취소 (비동기는 태스크 취소로 연결을 끊고, 동기는 결과를 버림)
+    - 보조 요청 수는 전체 요청의 budget 비율 이하로 제한하고, 요청마다 deadline을 넘으면 TimeoutError
+    - 스트리밍은 첫 청크까지의 시간으로 비교하고, 먼저 첫 청크를 보낸 쪽을 끝까지 사용
+    """
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, deadline=HEDGE_DEADLINE, budget=HEDGE_BUDGET,
+                 initial_delay=HEDGE_INITIAL_DELAY, min_samples=20, window=500, max_workers=32):
+        self.percentile = percentile
+        self.deadline = deadline
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._max_workers = max_workers
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def hedge_delay(self):
+        """보조 요청을 보내기까지 기다릴 시간(초): 최근 지연시간의 percentile 값"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self._latencies)
+        return ordered[max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)]
+
+    def _start(self):
+        with self._lock:
+            self.requests += 1
+
+    def _allow_hedge(self):
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def _finish(self, latency, label):
+        with self._lock:
+            self._latencies.append(latency)
+            if label == 'secondary':
+                self.hedge_wins += 1
+
+    def _timeout(self):
+        with self._lock:
+            self.timeouts += 1
+        return TimeoutError(f"upstream request exceeded deadline of {self.deadline}s")
+
+    def call(self, primary, secondary):
+        """primary()/secondary() 중 먼저 성공한 결과 반환 (동기 함수, 스레드 풀에서 실행)"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._start()
+        start = time.monotonic()
+        hedge_at = start + self.hedge_delay()
+        deadline = start + self.deadline
+        futures = {self._executor.submit(primary): 'primary'}
+        hedging = False
+        error = None
+        try:
+            while futures:
+                now = time.monotonic()
+                until = deadline if hedging else min(deadline, hedge_at)
+                done, _ = wait(futures, timeout=max(0.0, until - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    label = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    self._finish(time.monotonic() - start, label)
+                    return result
+                now = time.monotonic()
+                if now >= deadline:
+                    raise self._timeout()
+                if not hedging and now >= hedge_at:
+                    hedging = True  # 예산이 없으면 보조 요청 없이 계속 기다림
+                    if futures and self._allow_hedge():
+                        futures[self._executor.submit(secondary)] = 'secondary'
+            raise error
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def acall(self, primary, secondary):
+        """primary()/secondary()가 만드는 코루틴 중 먼저 성공한 결과 반환 (진 쪽 태스크는 취소)"""
+        self._start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        hedge_at = start + self.hedge_delay()
+        deadline = start + self.deadline
+        tasks = {asyncio.ensure_future(primary()): 'primary'}
+        hedging = False
+        error = None
+        try:
+            while tasks:
+                until = deadline if hedging else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, until - loop.time()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    label = tasks.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self._finish(loop.time() - start, label)
+                    return task.result()
+                if loop.time() >= deadline:
+                    raise self._timeout()
+                if not hedging and loop.time() >= hedge_at:
+                    hedging = True
+                    if tasks and self._allow_hedge():
+                        tasks[asyncio.ensure_future(secondary())] = 'secondary'
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def astream(self, primary, secondary):
+        """primary()/secondary()가 만드는 비동기 스트림 중 첫 청크를 먼저 보낸 쪽을 끝까지 전달"""
+        self._start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        hedge_at = start + self.hedge_delay()
+        deadline = start + self.deadline
+        streams = {}
+
+        def open_stream(factory, label):
+            iterator = factory().__aiter__()
+            streams[asyncio.ensure_future(iterator.__anext__())] = (label, iterator)
+
+        open_stream(primary, 'primary')
+        hedging = False
+        error = None
+        winner = None
+        try:
+            while streams and winner is None:
+                until = deadline if hedging else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(streams, timeout=max(0.0, until - loop.time()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    label, iterator = streams.pop(task)
+                    if isinstance(task.exception(), StopAsyncIteration):
+                        winner = (label, iterator, None)  # 청크 없이 끝난 스트림
+                    elif task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    else:
+                        winner = (label, iterator, task.result())
+                    break
+                if winner is not None:
+                    break
+                if loop.time() >= deadline:
+                    raise self._timeout()
+                if not hedging and loop.time() >= hedge_at:
+                    hedging = True
+                    if streams and self._allow_hedge():
+                        open_stream(secondary, 'secondary')
+            if winner is None:
+                raise error
+        finally:
+            for task, (_, iterator) in streams.items():
+                task.cancel()
+                asyncio.ensure_future(_aclose(iterator, task))
+
+        label, iterator, first = winner
+        self._finish(loop.time() - start, label)
+        if first is None:
+            return
+        try:
+            yield first
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise self._timeout()
+                yield chunk
+        finally:
+            await _aclose(iterator)
+
+    def stats(self):
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'timeouts': self.timeouts,
+                'hedge_delay': round(delay, 3),
+            }
+
+
+async def _aclose(iterator, pending=None):
+    if pending is not None:
+        # 취소된 __anext__가 끝난 뒤에 닫아야 "already running" 오류가 나지 않는다
+        await asyncio.gather(pending, return_exceptions=True)
+    aclose = getattr(iterator, 'aclose', None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+
+def percentiles(latencies, points=(50, 95, 99)):
+    ordered = sorted(latencies)
+    return {f"p{p}": round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 3) for p in points}
+
+
+if __name__ == "__main__":
+    import random
+
+    # 대부분 0.05~0.1초지만 3%는 1~2초 걸리는 upstream을 흉내 내어 헤지 전/후 지연시간 비교
+    rng = random.Random(0)
+
+    async def upstream():
+        await asyncio.sleep(rng.uniform(1.0, 2.0) if rng.random() < 0.03 else rng.uniform(0.05, 0.1))
+        return "ok"
+
+    async def run(hedger, requests=2000, concurrency=50):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                if hedger is None:
+                    await upstream()
+                else:
+                    await hedger.acall(upstream, upstream)
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return percentiles(latencies)
+
+    print("before", asyncio.run(run(None)))
+    hedger = Hedger(percentile=95, budget=0.1, initial_delay=0.2)
+    print("after ", asyncio.run(run(hedger)), hedger.stats())
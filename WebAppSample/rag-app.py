@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 from openai import AzureOpenAI
+from chat_history import HistoryManager
+from hedging import Hedger
 
 def main():
     os.system("cls" if os.name == "nt" else "clear")
@@ -11,6 +13,18 @@ def main():
     openai_api_key = os.getenv("OPENAI_API_KEY")
     openai_endpoint = os.getenv("OPENAI_ENDPOINT")
     chat_deployment_name = os.getenv("CHAT_DEPLOYMENT_NAME")
+    # CHAT_HEDGING=1이면 응답이 최근 p95보다 늦을 때 보조 배포에 같은 요청을 보내 먼저 온 응답 사용
+    # 같은 배포로 보내면 이미 느리거나 제한 중인 배포에 부하만 더하므로 다른 배포/리소스가 있을 때만 켠다
+    hedge_endpoint = os.getenv("CHAT_HEDGE_ENDPOINT") or openai_endpoint
+    hedge_deployment_name = os.getenv("CHAT_HEDGE_DEPLOYMENT_NAME") or chat_deployment_name
+    hedger = None
+    if os.getenv("CHAT_HEDGING", "0") == "1":
+        if (hedge_endpoint, hedge_deployment_name) != (openai_endpoint, chat_deployment_name):
+            hedger = Hedger()
+        else:
+            print("CHAT_HEDGING ignored: set CHAT_HEDGE_DEPLOYMENT_NAME or CHAT_HEDGE_ENDPOINT to a separate secondary")
+    # 헤지에서 진 요청도 deadline이 지나면 끊기도록 요청 타임아웃을 맞춘다
+    request_options = {'timeout': hedger.deadline} if hedger is not None else {}
     embedding_deployment_name = os.getenv("EMBEDDING_DEPLOYMENT_NAME")
     search_endpoint = os.getenv("SEARCH_ENDPOINT")
     search_api_key = os.getenv("SEARCH_API_KEY")
@@ -22,6 +36,21 @@ def main():
         azure_endpoint=openai_endpoint,
         api_version="2025-04-14",
     )
+    hedge_client = chat_client
+    if hedger is not None and hedge_endpoint != openai_endpoint:
+        hedge_client = AzureOpenAI(
+            api_key=os.getenv("CHAT_HEDGE_API_KEY") or openai_api_key,
+            azure_endpoint=hedge_endpoint,
+            api_version="2025-04-14",
+        )
+
+    # 오래된 대화는 요약으로 대체해 요청 크기를 CHAT_HISTORY_MAX_TOKENS 이하로 유지
+    history_manager = HistoryManager(
+        lambda messages: chat_client.chat.completions.create(
+            model=chat_deployment_name,
+            messages=messages,
+        ).choices[0].message.content
+    )
 
     #initialize prompt with system message
     prompt = [
@@ -34,6 +63,9 @@ def main():
     while True:
         input_text = input("Enter your question (or 'exit' to quit): ")
         if input_text.lower() == 'exit':
+            print(f"History tokens: {history_manager.stats()}")
+            if hedger is not None:
+                print(f"Hedging: {hedger.stats()}")
             print("Exiting the application.")
             break
         elif input_text.strip() == "":
@@ -68,11 +100,21 @@ def main():
             }
         }
 
-        response = chat_client.chat.completions.create(
-            model=chat_deployment_name,
-            messages=prompt,
-            extra_body=rag_params
-        )
+        messages = history_manager.compact(prompt)
+
+        def create(client, deployment):
+            return lambda: client.chat.completions.create(
+                model=deployment,
+                messages=messages,
+                extra_body=rag_params,
+                **request_options,
+            )
+
+        if hedger is None:
+            response = create(chat_client, chat_deployment_name)()
+        else:
+            response = hedger.call(create(chat_client, chat_deployment_name),
+                                   create(hedge_client, hedge_deployment_name))
 
         completion = response.choices[0].message.content
         print(f"AI: {completion}")
@@ -3,14 +3,21 @@ from dotenv import load_dotenv
 import os
 
 load_dotenv()
+# Imported after load_dotenv: the cache and preprocessing read their settings at import time
+from vision_cache import VisionCache, CACHE_PATH
+from image_preprocess import prepare_image, rescale_result, settings as preprocess_settings
 
 SUBSCRIPTION_KEY=os.getenv("SUBSCRIPTION_KEY")
 ENDPOINT=os.getenv("ENDPOINT")
 
+# Persistent result cache (set VISION_CACHE_PATH= to disable)
+cache = VisionCache() if CACHE_PATH else None
+
 def analyze_image(image_path):
     ENDPOINT_URL = ENDPOINT + "vision/v3.2/analyze"
 
     params = {"visualFeatures": "Categories,Description,Color"}
+    cache_params = dict(params, preprocess=preprocess_settings()) if preprocess_settings() else params
     headers = {
         "Ocp-Apim-Subscription-Key": SUBSCRIPTION_KEY,
         "Content-Type": "application/octet-stream"
@@ -22,10 +29,19 @@ def analyze_image(image_path):
     except Exception as e:
         print(f"Error reading image file: {e}")
         return None
-    
-    response = requests.post(ENDPOINT_URL, params=params, headers=headers, data=image_data)
+
+    if cache is not None:
+        cached = cache.get(ENDPOINT_URL, cache_params, image_data)
+        if cached is not None:
+            return cached
+
+    # Downsized, EXIF-oriented JPEG instead of the raw file; coordinates are mapped back afterwards
+    payload, scale = prepare_image(image_data)
+    response = requests.post(ENDPOINT_URL, params=params, headers=headers, data=payload)
     if response.status_code == 200:
-        analysis = response.json()
+        analysis = rescale_result(response.json(), scale)
+        if cache is not None:
+            cache.put(ENDPOINT_URL, cache_params, image_data, analysis)
         return analysis
     else:
         print(f"Error: {response.status_code} - {response.text}")
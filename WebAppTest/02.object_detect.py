@@ -1,61 +1,147 @@
 import requests
 from dotenv import load_dotenv
 import os
-from PIL import Image, ImageDraw, ImageFont
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageDraw, ImageFont, ImageOps
 
 load_dotenv()
+# Imported after load_dotenv: the cache and preprocessing read their settings at import time
+from vision_cache import VisionCache, CACHE_PATH
+from image_preprocess import max_dimension_for, prepare_image, rescale_result, settings as preprocess_settings
 
 SUBSCRIPTION_KEY=os.getenv("SUBSCRIPTION_KEY")
 ENDPOINT=os.getenv("ENDPOINT")
 
-def analyze_image(image_path):
-    ENDPOINT_URL = ENDPOINT + "vision/v3.2/analyze"
+# Vision API paths and query parameters per feature
+FEATURES = {
+    "analyze": ("vision/v3.2/analyze", {"visualFeatures": "Categories,Description,Color"}),
+    "detect": ("vision/v3.2/detect", {}),
+    "ocr": ("vision/v3.2/ocr", {}),
+}
 
-    params = {"visualFeatures": "Categories,Description,Color"}
-    headers = {
-        "Ocp-Apim-Subscription-Key": SUBSCRIPTION_KEY,
-        "Content-Type": "application/octet-stream"
-    }
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+# Shared connection pool (keep-alive) for all requests
+MAX_CONNECTIONS = int(os.getenv("VISION_MAX_CONNECTIONS", "16"))
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=MAX_CONNECTIONS, pool_maxsize=MAX_CONNECTIONS))
+session.mount("http://", HTTPAdapter(pool_connections=MAX_CONNECTIONS, pool_maxsize=MAX_CONNECTIONS))
+
+# Persistent result cache shared by all workers (set VISION_CACHE_PATH= to disable)
+cache = VisionCache() if CACHE_PATH else None
+
+# When the service returns 429, every worker waits until this time (time.monotonic())
+_throttle_lock = threading.Lock()
+_throttle_until = 0.0
+
+
+class VisionError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
 
-    try:
-        with open(image_path, "rb") as image_file:
-            image_data = image_file.read()
-    except Exception as e:
-        print(f"Error reading image file: {e}")
-        return None
-    
-    response = requests.post(ENDPOINT_URL, params=params, headers=headers, data=image_data)
-    if response.status_code == 200:
-        analysis = response.json()
-        return analysis
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
-        return None
-    
-# Object detect function
-def object_detect(image_path):
-    ENDPOINT_URL = ENDPOINT + "vision/v3.2/detect"
 
+def _wait_for_throttle():
+    delay = _throttle_until - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _throttle(seconds):
+    global _throttle_until
+    with _throttle_lock:
+        _throttle_until = max(_throttle_until, time.monotonic() + seconds)
+
+
+def call_vision(feature, image_data, retries=5, backoff=1.0):
+    """POST image bytes to the Vision API, retrying 429/5xx (honors Retry-After)"""
+    path, params = FEATURES[feature]
     headers = {
         "Ocp-Apim-Subscription-Key": SUBSCRIPTION_KEY,
         "Content-Type": "application/octet-stream"
     }
+    for attempt in range(retries + 1):
+        _wait_for_throttle()
+        try:
+            response = session.post(ENDPOINT + path, params=params, headers=headers, data=image_data, timeout=60)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+            continue
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code == 429 or response.status_code >= 500:
+            if attempt == retries:
+                raise VisionError(response.status_code, response.text)
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.replace('.', '', 1).isdigit() \
+                else backoff * (2 ** attempt) * (0.5 + random.random())
+            if response.status_code == 429:
+                _throttle(delay)
+            else:
+                time.sleep(delay)
+            continue
+        raise VisionError(response.status_code, response.text)
+
+
+def cached_vision(feature, image_data, stats=None):
+    """Downsize the image, call the Vision API and map coordinates back to the original image
+
+    OCR uploads keep a much larger maximum size (VISION_OCR_MAX_DIMENSION) so small text stays legible.
 
+    Reuses the stored result when this image was already processed. If stats is a dict, the
+    uploaded byte count and preprocessing time are recorded in it.
+    """
+    path, params = FEATURES[feature]
+    preprocess = preprocess_settings(feature)
+    if preprocess is not None:
+        params = dict(params, preprocess=preprocess)  # results differ per preprocessing setting
+    if cache is not None:
+        result = cache.get(ENDPOINT + path, params, image_data)
+        if result is not None:
+            if stats is not None:
+                stats.update(bytes_uploaded=0, cached=True)
+            return result
+    start = time.perf_counter()
+    payload, scale = prepare_image(image_data, max_dimension=max_dimension_for(feature))
+    if stats is not None:
+        stats.update(bytes_uploaded=len(payload), preprocess_seconds=round(time.perf_counter() - start, 3))
+    result = rescale_result(call_vision(feature, payload), scale)
+    if cache is not None:
+        cache.put(ENDPOINT + path, params, image_data, result)
+    return result
+
+
+def _request_image(feature, image_path):
     try:
         with open(image_path, "rb") as image_file:
             image_data = image_file.read()
     except Exception as e:
         print(f"Error reading image file: {e}")
         return None
-    
-    response = requests.post(ENDPOINT_URL, headers=headers, data=image_data)
-    if response.status_code == 200:
-        detection = response.json()
-        return detection
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
+
+    try:
+        return cached_vision(feature, image_data)
+    except (VisionError, requests.RequestException) as e:
+        print(f"Error: {e}")
         return None
 
+
+def analyze_image(image_path):
+    return _request_image("analyze", image_path)
+
+# Object detect function
+def object_detect(image_path):
+    return _request_image("detect", image_path)
+
 # create bounding box function
 def create_bounding_box(image_path, detection_data):
     try:
@@ -64,6 +150,8 @@ def create_bounding_box(image_path, detection_data):
         print(f"Error opening image file: {e}")
         return None
     
+    # Coordinates refer to the EXIF-oriented image (see image_preprocess.prepare_image)
+    image = ImageOps.exif_transpose(image)
     draw = ImageDraw.Draw(image)
 
     for obj in detection_data.get('objects', []):
@@ -86,27 +174,103 @@ def create_bounding_box(image_path, detection_data):
 
 # OCR function
 def ocr_image(image_path):
-    ENDPOINT_URL = ENDPOINT + "vision/v3.2/ocr"
+    return _request_image("ocr", image_path)
 
-    headers = {
-        "Ocp-Apim-Subscription-Key": SUBSCRIPTION_KEY,
-        "Content-Type": "application/octet-stream"
-    }
+def find_images(directory):
+    # Absolute paths so resume matches however the directory was spelled (imgs, ./imgs, /abs/imgs)
+    for root, dirs, files in os.walk(os.path.abspath(directory)):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTS) and '_annotated.' not in name:
+                yield os.path.join(root, name)
+
+def load_done(output_path):
+    """Paths whose latest record from a previous run is ok
+
+    Only the latest record per path is kept: when a path appears more than once (e.g. an error
+    retried on a later run) or a line is unreadable, the file is rewritten without the stale lines.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    latest = {}  # absolute path -> (line number, status)
+    lines = 0
+    with open(output_path, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            lines += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partially written last line of an interrupted run
+            latest[os.path.abspath(record["path"])] = (number, record.get("status"))
+    if lines > len(latest):
+        keep = {number for number, _ in latest.values()}
+        with open(output_path, encoding="utf-8") as src, open(output_path + ".tmp", "w", encoding="utf-8") as dst:
+            for number, line in enumerate(src):
+                if number in keep:
+                    record = json.loads(line)
+                    record["path"] = os.path.abspath(record["path"])
+                    dst.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(output_path + ".tmp", output_path)
+    return {path for path, (_, status) in latest.items() if status == "ok"}
 
+def _process(feature, image_path):
+    start = time.perf_counter()
+    record = {"path": image_path}
     try:
         with open(image_path, "rb") as image_file:
             image_data = image_file.read()
+        record["bytes_original"] = len(image_data)
+        result = cached_vision(feature, image_data, record)
+        record.update(status="ok", result=result)
     except Exception as e:
-        print(f"Error reading image file: {e}")
-        return None
-    
-    response = requests.post(ENDPOINT_URL, headers=headers, data=image_data)
-    if response.status_code == 200:
-        ocr_result = response.json()
-        return ocr_result
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
-        return None
+        record.update(status="error", error=str(e))
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+def run_batch(directory, feature, output_path, workers=8):
+    """Analyze every image under directory and append one JSON line per image (resumable)"""
+    done = load_done(output_path)
+    paths = [path for path in find_images(directory) if path not in done]
+    print(f"{len(done)} already done, {len(paths)} to process with {workers} workers")
+
+    # An interrupted run may have left a partial last line; start on a fresh line
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                with open(output_path, "a", encoding="utf-8") as out:
+                    out.write("\n")
+
+    counts = {"ok": 0, "error": 0, "bytes_original": 0, "bytes_uploaded": 0}
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        # Submit in windows so memory stays flat for very large folders
+        pending = set()
+        for path in paths:
+            pending.add(executor.submit(_process, feature, path))
+            if len(pending) >= workers * 4:
+                finished = next(as_completed(pending))
+                pending.discard(finished)
+                _write_record(out, finished.result(), counts, start)
+        for finished in as_completed(pending):
+            _write_record(out, finished.result(), counts, start)
+    elapsed = time.perf_counter() - start
+    print(f"Done: {counts['ok']} ok, {counts['error']} errors in {elapsed:.1f}s -> {output_path}")
+    if counts["bytes_original"]:
+        print(f"Uploaded {counts['bytes_uploaded'] / 1e6:.1f} MB for {counts['bytes_original'] / 1e6:.1f} MB of images "
+              f"({100 * counts['bytes_uploaded'] / counts['bytes_original']:.0f}%)")
+    if cache is not None:
+        print(f"Cache: {cache.stats()}")
+
+def _write_record(out, record, counts, start):
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+    counts[record["status"]] += 1
+    counts["bytes_original"] += record.get("bytes_original", 0)
+    counts["bytes_uploaded"] += record.get("bytes_uploaded", 0)
+    total = counts["ok"] + counts["error"]
+    if total % 100 == 0:
+        print(f"{total} processed ({total / (time.perf_counter() - start):.1f} images/s)")
 
 def main():
     image_path = input("Enter the path to the image file: ")
@@ -139,4 +303,16 @@ def main():
         return
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        parser = argparse.ArgumentParser(description="Batch image analysis with Azure AI Vision")
+        parser.add_argument("--batch", required=True, help="directory with images (walked recursively)")
+        parser.add_argument("--feature", choices=list(FEATURES), default="detect")
+        parser.add_argument("--output", default="results.jsonl")
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--no-cache", action="store_true", help="always call the API (ignore cached results)")
+        args = parser.parse_args()
+        if args.no_cache:
+            cache = None
+        run_batch(args.batch, args.feature, args.output, min(args.workers, MAX_CONNECTIONS))
+    else:
+        main()
\ No newline at end of file
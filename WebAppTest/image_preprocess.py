@@ -0,0 +1,102 @@
+import os
+import io
+from PIL import Image, ImageOps
+
+# Client-side preprocessing before upload (VISION_PREPROCESS=0 uploads the original bytes)
+PREPROCESS = os.getenv("VISION_PREPROCESS", "1") == "1"
+# Longest side sent to the API; v3.2 analyze/detect/ocr work well well below phone-camera resolution
+MAX_DIMENSION = int(os.getenv("VISION_MAX_DIMENSION", "1600"))
+# OCR loses small glyphs when downscaled, so it is only shrunk to the v3.2 OCR input limit (4200 px)
+OCR_MAX_DIMENSION = int(os.getenv("VISION_OCR_MAX_DIMENSION", "4200"))
+JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+MIN_JPEG_QUALITY = 50
+# The v3.2 API rejects uploads over 4 MB
+MAX_BYTES = 4 * 1024 * 1024
+
+
+def max_dimension_for(feature=None):
+    """Longest side to upload for a Vision feature ("analyze", "detect", "ocr")"""
+    return OCR_MAX_DIMENSION if feature == "ocr" else MAX_DIMENSION
+
+
+def settings(feature=None):
+    """Preprocessing parameters that change the API result (part of the cache key), or None when disabled"""
+    if not PREPROCESS:
+        return None
+    return {"max_dimension": max_dimension_for(feature), "quality": JPEG_QUALITY}
+
+
+def prepare_image(image_data, max_dimension=MAX_DIMENSION, quality=JPEG_QUALITY):
+    """Decode once, apply EXIF orientation, downsize and re-encode as JPEG
+
+    Returns (payload, scale) where scale = original size / uploaded size for (x, y), used to map
+    returned coordinates back onto the (EXIF-oriented) original. Images that are already small,
+    upright JPEGs are sent unchanged, as is anything Pillow cannot decode.
+    """
+    if not PREPROCESS:
+        return image_data, (1.0, 1.0)
+    try:
+        with Image.open(io.BytesIO(image_data)) as original:
+            rotated = original.getexif().get(0x0112, 1) not in (None, 1)
+            if (original.format == "JPEG" and not rotated and max(original.size) <= max_dimension
+                    and len(image_data) <= MAX_BYTES):
+                return image_data, (1.0, 1.0)
+            width, height = _oriented_size(original)
+            # draft() lets the JPEG decoder downscale by 1/2..1/8 while decoding, much cheaper than a full decode
+            ratio = max_dimension / max(original.size)
+            original.draft("RGB", (round(original.size[0] * ratio), round(original.size[1] * ratio)))
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+    except Exception:
+        return image_data, (1.0, 1.0)
+
+    # Lower the quality until the payload fits the API limit
+    for q in range(quality, MIN_JPEG_QUALITY - 1, -10):
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=q, optimize=True)
+        if buffer.tell() <= MAX_BYTES:
+            break
+    payload = buffer.getvalue()
+    if len(payload) >= len(image_data) and not rotated and (width, height) == image.size:
+        return image_data, (1.0, 1.0)  # re-encoding did not help
+    return payload, (width / image.size[0], height / image.size[1])
+
+
+def _oriented_size(image):
+    width, height = image.size
+    if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):  # rotated by 90/270 degrees
+        return height, width
+    return width, height
+
+
+def rescale_result(result, scale):
+    """Map rectangles/bounding boxes in an analyze/detect/ocr result back to original pixel coordinates"""
+    sx, sy = scale
+    if (sx, sy) == (1.0, 1.0):
+        return result
+    if isinstance(result, list):
+        return [rescale_result(item, scale) for item in result]
+    if not isinstance(result, dict):
+        return result
+    scaled = {}
+    for key, value in result.items():
+        if key in ("rectangle", "faceRectangle") and isinstance(value, dict):
+            scaled[key] = {name: _scale_value(name, number, sx, sy) for name, number in value.items()}
+        elif key == "boundingBox" and isinstance(value, str):
+            x, y, w, h = (int(part) for part in value.split(","))
+            scaled[key] = f"{round(x * sx)},{round(y * sy)},{round(w * sx)},{round(h * sy)}"
+        elif key == "metadata" and isinstance(value, dict) and "width" in value:
+            scaled[key] = dict(value, width=round(value["width"] * sx), height=round(value["height"] * sy))
+        else:
+            scaled[key] = rescale_result(value, scale)
+    return scaled
+
+
+def _scale_value(name, number, sx, sy):
+    if name in ("x", "w", "left", "width"):
+        return round(number * sx)
+    if name in ("y", "h", "top", "height"):
+        return round(number * sy)
+    return number
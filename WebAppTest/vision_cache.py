@@ -0,0 +1,160 @@
+import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Persistent cache of Vision API results (empty path disables the cache)
+CACHE_PATH = os.getenv("VISION_CACHE_PATH", "./.cache/vision_cache.sqlite3")
+CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", str(30 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("VISION_CACHE_MAX_ENTRIES", "10000"))
+# Max Hamming distance (of 64 bits) for a perceptual-hash hit; negative disables near-duplicate lookup
+CACHE_PHASH_DISTANCE = int(os.getenv("VISION_CACHE_PHASH_DISTANCE", "-1"))
+
+
+def perceptual_hash(image_data):
+    """64-bit difference hash (dHash) of the image and its (width, height)"""
+    from PIL import Image, ImageOps
+    with Image.open(io.BytesIO(image_data)) as image:
+        size = image.size
+        small = ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits, size
+
+
+class VisionCache:
+    """SQLite cache of Vision API results keyed by (endpoint, params, SHA-256 of the image bytes)
+
+    - Entries older than ttl seconds are ignored and purged; the least recently used entries
+      beyond max_entries are evicted
+    - With phash_distance >= 0, an image whose dHash is within that Hamming distance of a cached
+      image of the same size and request is also a hit (near-identical re-uploads/re-encodes)
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES,
+                 phash_distance=CACHE_PHASH_DISTANCE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.phash_distance = phash_distance
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._phashes = OrderedDict()  # digest -> (phash, size), computed once per image for get + put
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vision_cache (key TEXT PRIMARY KEY, request TEXT, digest TEXT,"
+            " phash TEXT, width INTEGER, height INTEGER, result TEXT, created REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vision_cache_request ON vision_cache (request)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vision_cache_last_used ON vision_cache (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _request_key(url, params):
+        return hashlib.sha256(f"{url}\0{json.dumps(params or {}, sort_keys=True)}".encode("utf-8")).hexdigest()
+
+    def _phash(self, digest, image_data):
+        with self._lock:
+            if digest in self._phashes:
+                return self._phashes[digest]
+        try:
+            value = perceptual_hash(image_data)
+        except Exception:
+            value = (None, (None, None))  # not decodable by Pillow: exact matches only
+        with self._lock:
+            self._phashes[digest] = value
+            while len(self._phashes) > 256:
+                self._phashes.popitem(last=False)
+        return value
+
+    def get(self, url, params, image_data):
+        """Cached result for this request and image, or None"""
+        request = self._request_key(url, params)
+        digest = hashlib.sha256(image_data).hexdigest()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, result FROM vision_cache WHERE key = ? AND created > ?",
+                (f"{request}:{digest}", now - self.ttl),
+            ).fetchone()
+        if row is None and self.phash_distance >= 0:
+            row = self._near_duplicate(request, digest, image_data, now)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE vision_cache SET last_used = ? WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[1])
+
+    def _near_duplicate(self, request, digest, image_data, now):
+        phash, size = self._phash(digest, image_data)
+        if phash is None:
+            return None
+        with self._lock:
+            # Same size only: detect/OCR coordinates are in pixels of the uploaded image
+            rows = self._conn.execute(
+                "SELECT key, result, phash FROM vision_cache WHERE request = ? AND width = ? AND height = ?"
+                " AND phash IS NOT NULL AND created > ?",
+                (request, size[0], size[1], now - self.ttl),
+            ).fetchall()
+        best = None
+        for key, result, other in rows:
+            distance = (phash ^ int(other, 16)).bit_count()
+            if distance <= self.phash_distance and (best is None or distance < best[0]):
+                best = (distance, key, result)
+        if best is None:
+            return None
+        with self._lock:
+            self.phash_hits += 1
+        return best[1], best[2]
+
+    def put(self, url, params, image_data, result):
+        request = self._request_key(url, params)
+        digest = hashlib.sha256(image_data).hexdigest()
+        phash, size = self._phash(digest, image_data) if self.phash_distance >= 0 else (None, (None, None))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vision_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (f"{request}:{digest}", request, digest, f"{phash:016x}" if phash is not None else None,
+                 size[0], size[1], json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        expired = self._conn.execute("DELETE FROM vision_cache WHERE created <= ?", (now - self.ttl,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM vision_cache").fetchone()[0]
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            self._conn.execute(
+                "DELETE FROM vision_cache WHERE key IN (SELECT key FROM vision_cache ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+        self.evictions += expired + overflow
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM vision_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "phash_hits": self.phash_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
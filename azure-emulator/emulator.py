@@ -0,0 +1,659 @@
+"""Azure OpenAI / Computer Vision 로컬 대역 서버 (실제 Azure 없이 부하 테스트·성능 측정용)
+
+사용법:
+    uv run python emulator.py --port 8001
+    EMULATOR_CHAT_LATENCY="lognormal:0.8:0.4,tail:0.03:5" EMULATOR_CHAT_THROTTLE_RATE=0.05 uv run python emulator.py
+
+각 앱의 엔드포인트 환경변수를 에뮬레이터 주소로 바꾸면 그대로 동작한다.
+- final-test, KTdsSamples: AZURE_ENDPOINT=http://localhost:8001/
+- WebAppSample/rag-app.py: OPENAI_ENDPOINT=http://localhost:8001/ (data_source 검색 결과도 흉내 냄)
+- WebAppTest: ENDPOINT=http://localhost:8001/
+- ktds-llm (OpenAI 호환 경로): OPENAI_BASE_URL=http://localhost:8001/v1
+
+- 응답 내용은 요청 내용의 해시로 정해지므로 같은 요청에는 항상 같은 응답 (임베딩은 비슷한 문장일수록 가까운 벡터)
+- 지연시간 분포, 오류율, 429 비율, 분당 요청/토큰 한도는 환경변수 또는 PUT /emulator/config 로 바꿀 수 있음
+"""
+import os
+import io
+import json
+import math
+import time
+import array
+import base64
+import random
+import uuid
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 경로 그룹별 장애 주입 설정 (chat, embeddings, vision, search)
+GROUPS = ('chat', 'embeddings', 'vision', 'search')
+DEFAULT_LATENCY = {'chat': 'lognormal:0.5:0.3', 'embeddings': 'lognormal:0.1:0.3',
+                   'vision': 'lognormal:0.3:0.3', 'search': 'lognormal:0.1:0.3'}
+
+# 스트리밍 시 토큰 사이 간격(초), 응답 길이(토큰), 429 응답의 retry-after(초)
+TOKEN_LATENCY = float(os.getenv("EMULATOR_TOKEN_LATENCY", "0.01"))
+COMPLETION_TOKENS = int(os.getenv("EMULATOR_COMPLETION_TOKENS", "80"))
+RETRY_AFTER = float(os.getenv("EMULATOR_RETRY_AFTER", "1"))
+# 배포별 분당 요청/토큰 한도 (0이면 제한 없음, Azure처럼 10초 단위로 검사)
+RPM_LIMIT = int(os.getenv("EMULATOR_RPM", "0"))
+TPM_LIMIT = int(os.getenv("EMULATOR_TPM", "0"))
+SEED = int(os.getenv("EMULATOR_SEED", "0"))
+
+EMBEDDING_DIMENSIONS = {'text-embedding-3-large': 3072}
+DEFAULT_EMBEDDING_DIMENSION = 1536
+
+FILLER = ("근로기준법", "연차", "휴가", "임금", "계약", "조항", "기준", "확인", "필요", "경우", "the", "service",
+          "hotel", "travel", "code", "module", "function", "result", "analysis", "summary")
+OBJECTS = (("dog", "mammal"), ("cat", "mammal"), ("person", None), ("car", "Land vehicle"),
+           ("chair", "furniture"), ("bicycle", "cycle"), ("cup", None), ("laptop", "computer"))
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    """토큰 수 계산 (tiktoken이 없으면 글자 수 기반 근사치)"""
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(text) // 2 + 1
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def parse_latency(spec):
+    """지연시간 분포 문자열을 샘플 함수로 변환 (초)
+
+    fixed:0.2 / uniform:0.1:0.5 / normal:0.3:0.1 / lognormal:0.3:0.6 (중앙값, sigma)
+    뒤에 ",tail:0.02:3" 을 붙이면 2% 요청에 3초를 더함 (꼬리 지연)
+    """
+    parts = [part.strip() for part in spec.split(',') if part.strip()]
+    kind, *args = parts[0].split(':')
+    args = [float(arg) for arg in args]
+    tail_rate, tail_seconds = 0.0, 0.0
+    for extra in parts[1:]:
+        name, rate, seconds = extra.split(':')
+        if name != 'tail':
+            raise ValueError(f"unknown latency option: {extra}")
+        tail_rate, tail_seconds = float(rate), float(seconds)
+
+    def base(rng):
+        if kind == 'fixed':
+            return args[0]
+        if kind == 'uniform':
+            return rng.uniform(args[0], args[1])
+        if kind == 'normal':
+            return max(0.0, rng.gauss(args[0], args[1]))
+        if kind == 'lognormal':
+            return rng.lognormvariate(math.log(args[0]), args[1])
+        raise ValueError(f"unknown latency distribution: {kind}")
+
+    base(random.Random(0))  # 잘못된 설정은 서버 시작(또는 설정 변경) 시점에 오류
+    return lambda rng: base(rng) + (tail_seconds if rng.random() < tail_rate else 0.0)
+
+
+def _rate(name, value):
+    value = float(value)
+    if not 0.0 <= value <= 1.0:
+        raise ValueError(f"{name} must be between 0 and 1: {value}")
+    return value
+
+
+def _non_negative(name, value, cast=float):
+    value = cast(value)
+    if value < 0:
+        raise ValueError(f"{name} must not be negative: {value}")
+    return value
+
+
+class Profile:
+    """경로 그룹 하나의 지연시간 분포와 오류(5xx)/429 주입 비율"""
+
+    def __init__(self, latency, error_rate=0.0, throttle_rate=0.0):
+        self.update(latency=latency, error_rate=error_rate, throttle_rate=throttle_rate)
+
+    def update(self, latency=None, error_rate=None, throttle_rate=None):
+        # 모두 검증한 뒤에 반영 (일부만 바뀐 상태로 남지 않도록)
+        sample = parse_latency(latency) if latency is not None else None
+        rates = {name: _rate(name, value) for name, value in
+                 (('error_rate', error_rate), ('throttle_rate', throttle_rate)) if value is not None}
+        if sample is not None:
+            self.sample, self.latency = sample, latency
+        for name, value in rates.items():
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return {'latency': self.latency, 'error_rate': self.error_rate, 'throttle_rate': self.throttle_rate}
+
+
+class Quota:
+    """배포별 분당 요청/토큰 한도 (10초 분량까지 쌓이는 토큰 버킷)"""
+
+    def __init__(self, rpm, tpm):
+        self.rpm, self.tpm = rpm, tpm
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, deployment, tokens):
+        """한도 안이면 차감하고 0, 넘으면 다시 시도할 수 있을 때까지의 시간(초) 반환"""
+        if not self.rpm and not self.tpm:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets.setdefault(deployment, {})
+            waits = []
+            for name, limit, amount in (('requests', self.rpm, 1), ('tokens', self.tpm, tokens)):
+                if not limit:
+                    continue
+                capacity, rate = limit / 6, limit / 60
+                level, updated = buckets.get(name, (capacity, now))
+                level = min(capacity, level + (now - updated) * rate)
+                buckets[name] = (level, now)
+                if level < min(amount, capacity):
+                    waits.append((min(amount, capacity) - level) / rate)
+            if waits:
+                return max(waits)
+            for name, limit, amount in (('requests', self.rpm, 1), ('tokens', self.tpm, tokens)):
+                if limit:
+                    level, updated = buckets[name]
+                    buckets[name] = (level - min(amount, limit / 6), updated)
+            return 0.0
+
+
+class Emulator:
+    def __init__(self, seed=SEED):
+        self.rng = random.Random(seed)
+        self.profiles = {
+            group: Profile(
+                os.getenv(f"EMULATOR_{group.upper()}_LATENCY", DEFAULT_LATENCY[group]),
+                float(os.getenv(f"EMULATOR_{group.upper()}_ERROR_RATE", "0")),
+                float(os.getenv(f"EMULATOR_{group.upper()}_THROTTLE_RATE", "0")),
+            )
+            for group in GROUPS
+        }
+        self.token_latency = TOKEN_LATENCY
+        self.completion_tokens = COMPLETION_TOKENS
+        self.retry_after = RETRY_AFTER
+        self.quota = Quota(RPM_LIMIT, TPM_LIMIT)
+        self.counts = defaultdict(int)
+        self.latency_sum = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def fault(self, group):
+        """주입할 결과: ('throttle' | 'error' | None, 지연시간)"""
+        profile = self.profiles[group]
+        with self._lock:
+            roll = self.rng.random()
+            delay = profile.sample(self.rng)
+        if roll < profile.throttle_rate:
+            return 'throttle', delay * 0.1  # 429는 요청을 처리하지 않으므로 빨리 돌아온다
+        if roll < profile.throttle_rate + profile.error_rate:
+            return 'error', delay
+        return None, delay
+
+    def record(self, group, status, seconds):
+        with self._lock:
+            self.counts[(group, status)] += 1
+            self.latency_sum[group] += seconds
+
+    def config(self):
+        return {
+            **{group: profile.as_dict() for group, profile in self.profiles.items()},
+            'token_latency': self.token_latency,
+            'completion_tokens': self.completion_tokens,
+            'retry_after': self.retry_after,
+            'rpm': self.quota.rpm,
+            'tpm': self.quota.tpm,
+        }
+
+    def configure(self, changes):
+        """설정 변경 (전부 검증한 뒤 한꺼번에 적용하므로, 하나라도 잘못되면 아무것도 바뀌지 않음)"""
+        if not isinstance(changes, dict):
+            raise TypeError("config must be a JSON object")
+        unknown = set(changes) - set(GROUPS) - {'token_latency', 'retry_after', 'completion_tokens', 'rpm', 'tpm', 'seed'}
+        if unknown:
+            raise ValueError(f"unknown config keys: {sorted(unknown)}")
+        profiles = {}
+        for group in GROUPS:
+            if group in changes:
+                if not isinstance(changes[group], dict):
+                    raise TypeError(f"{group} must be a JSON object")
+                profiles[group] = Profile(**{**self.profiles[group].as_dict(), **changes[group]})
+        scalars = {name: _non_negative(name, changes[name], cast)
+                   for name, cast in (('token_latency', float), ('retry_after', float), ('completion_tokens', int))
+                   if name in changes}
+        quota = None
+        if 'rpm' in changes or 'tpm' in changes:
+            quota = Quota(_non_negative('rpm', changes.get('rpm', self.quota.rpm), int),
+                          _non_negative('tpm', changes.get('tpm', self.quota.tpm), int))
+        rng = random.Random(int(changes['seed'])) if 'seed' in changes else None
+
+        with self._lock:
+            self.profiles = {**self.profiles, **profiles}
+            for name, value in scalars.items():
+                setattr(self, name, value)
+            if quota is not None:
+                self.quota = quota
+            if rng is not None:
+                self.rng = rng
+
+    def stats(self):
+        with self._lock:
+            requests = defaultdict(dict)
+            for (group, status), count in sorted(self.counts.items()):
+                requests[group][str(status)] = count
+            return {
+                'requests': requests,
+                'mean_injected_latency': {
+                    group: round(self.latency_sum[group] / sum(requests[group].values()), 4)
+                    for group in requests
+                },
+            }
+
+
+emulator = Emulator()
+app = FastAPI(title="Azure emulator", description="Local stand-in for Azure OpenAI and Computer Vision")
+
+
+######################
+#  공통 응답 (Azure 오류 형식과 429 헤더)
+######################
+
+def _openai_error(status, code, message, retry_after=None):
+    headers = {}
+    if retry_after is not None:
+        headers = {'retry-after': str(math.ceil(retry_after)), 'retry-after-ms': str(math.ceil(retry_after * 1000))}
+    return JSONResponse({'error': {'code': code, 'message': message}}, status_code=status, headers=headers)
+
+
+async def _inject(group, deployment=None, tokens=0, vision=False):
+    """지연시간을 기다린 뒤 주입할 오류 응답(없으면 None) 반환 (deployment가 있으면 분당 한도도 검사)"""
+    kind, delay = emulator.fault(group)
+    retry_after = emulator.retry_after
+    if kind is None and deployment is not None:
+        wait = emulator.quota.take(deployment, tokens)
+        if wait:
+            kind, delay, retry_after = 'throttle', 0.0, wait  # 한도 초과는 바로 거절
+    await asyncio.sleep(delay)
+    if kind == 'throttle':
+        emulator.record(group, 429, delay)
+        if vision:
+            return JSONResponse(
+                {'error': {'code': '429', 'message': f"Rate limit is exceeded. Try again in {math.ceil(retry_after)} seconds."}},
+                status_code=429, headers={'Retry-After': str(math.ceil(retry_after))},
+            )
+        return _openai_error(429, '429', f"Rate limit exceeded. Please retry after {math.ceil(retry_after)} seconds.",
+                             retry_after)
+    if kind == 'error':
+        emulator.record(group, 500, delay)
+        if vision:
+            return JSONResponse({'error': {'code': 'InternalServerError', 'message': 'Injected error'}}, status_code=500)
+        return _openai_error(500, 'InternalServerError', 'The server had an error while processing your request.')
+    emulator.record(group, 200, delay)
+    return None
+
+
+######################
+#  Chat completions (Azure 배포 경로 + OpenAI 호환 경로)
+######################
+
+def _message_text(message):
+    content = message.get('content') or ''
+    if isinstance(content, list):  # [{type: text, text: ...}, {type: image_url, ...}]
+        content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content
+
+
+@lru_cache(maxsize=None)
+def _word_tokens(word):
+    return count_tokens(' ' + word)
+
+
+def _completion_text(body, deployment, index, rng):
+    messages = body.get('messages', [])
+    question = next((_message_text(m) for m in reversed(messages) if m.get('role') == 'user'), '')
+    limit = body.get('max_completion_tokens') or body.get('max_tokens') or emulator.completion_tokens
+    target = min(limit, emulator.completion_tokens)
+    words = [f"[{deployment}#{index}]", f"'{question[:40]}'", "에", "대한", "응답입니다."]
+    # 머리말만 한 번 세고, 이후 단어는 미리 센 단어별 토큰 수를 더해 나간다 (단어마다 전체를 다시 세지 않음)
+    used = count_tokens(' '.join(words))
+    while True:
+        word = rng.choice(FILLER)
+        used += _word_tokens(word)
+        if used > target:
+            return ' '.join(words)
+        words.append(word)
+
+
+def _search_context(body, question, rng):
+    """rag-app.py의 data_source(azure_search) 요청에 대한 인용 문서"""
+    source = body.get('data_source') or (body.get('data_sources') or [None])[0]
+    if not source:
+        return None
+    index = source.get('parameters', {}).get('index_name', 'index')
+    top = source.get('parameters', {}).get('top_n_documents', 5)
+    citations = [{
+        'content': f"{question[:30]} 관련 문서 {i}: " + ' '.join(rng.choice(FILLER) for _ in range(30)),
+        'title': f"{index}-doc-{rng.randrange(1000)}",
+        'url': None,
+        'filepath': f"doc-{i}.md",
+        'chunk_id': str(i),
+    } for i in range(top)]
+    return {'citations': citations, 'intent': json.dumps([question[:60]], ensure_ascii=False)}
+
+
+def _generate_chat(body, deployment, has_source):
+    """응답 본문 생성 (CPU 작업이므로 이벤트 루프 밖 스레드에서 실행)"""
+    messages = body.get('messages', [])
+    rng = random.Random(_digest(deployment, messages, body.get('data_source'), body.get('data_sources')))
+    question = next((_message_text(m) for m in reversed(messages) if m.get('role') == 'user'), '')
+    context = _search_context(body, question, rng) if has_source else None
+    texts = [_completion_text(body, deployment, i, rng) for i in range(body.get('n') or 1)]
+    return context, texts, sum(count_tokens(text) for text in texts)
+
+
+async def _chat(request, deployment):
+    body = await request.json()
+    deployment = deployment or body.get('model', 'emulator')
+    messages = body.get('messages', [])
+    # 토큰 계산/응답 생성은 스레드에서 실행해 다른 요청의 주입 지연시간을 늘리지 않게 한다
+    prompt_tokens = await asyncio.to_thread(
+        lambda: sum(count_tokens(_message_text(m)) + 4 for m in messages) + 3)
+    max_tokens = body.get('max_completion_tokens') or body.get('max_tokens') or 4096
+    has_source = bool(body.get('data_source') or body.get('data_sources'))
+    # 응답 생성은 주입 지연시간 동안 함께 진행 (생성 시간이 지연시간에 더해지지 않도록)
+    generated = asyncio.ensure_future(asyncio.to_thread(_generate_chat, body, deployment, has_source))
+    # 검색(data_source) 지연은 LLM 지연 앞에 더해진다
+    error = await _inject('search') if has_source else None
+    if error is None:
+        error = await _inject('chat', deployment, prompt_tokens + max_tokens)
+    context, texts, completion_tokens = await generated
+    if error is not None:
+        return error
+    usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+             'total_tokens': prompt_tokens + completion_tokens}
+    response_id = f"chatcmpl-{_digest(deployment, messages)[:24]}"
+    created = int(time.time())
+
+    if not body.get('stream'):
+        # 스트리밍이 아니면 모든 토큰이 생성될 때까지 기다렸다가 응답
+        await asyncio.sleep(emulator.token_latency * completion_tokens)
+        choices = []
+        for i, text in enumerate(texts):
+            message = {'role': 'assistant', 'content': text}
+            if context is not None:
+                message['context'] = context
+            choices.append({'index': i, 'finish_reason': 'stop', 'message': message, 'content_filter_results': {}})
+        return JSONResponse({
+            'id': response_id, 'object': 'chat.completion', 'created': created, 'model': deployment,
+            'choices': choices, 'usage': usage, 'system_fingerprint': 'emulator',
+            'prompt_filter_results': [{'prompt_index': 0, 'content_filter_results': {}}],
+        })
+
+    include_usage = (body.get('stream_options') or {}).get('include_usage', False)
+
+    def chunk(choices, **extra):
+        payload = {'id': response_id, 'object': 'chat.completion.chunk', 'created': created,
+                   'model': deployment, 'choices': choices, **extra}
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def events():
+        # Azure처럼 콘텐츠 필터 결과만 담긴 빈 choices 청크를 먼저 보낸다
+        yield chunk([], prompt_filter_results=[{'prompt_index': 0, 'content_filter_results': {}}])
+        for i, text in enumerate(texts):
+            delta = {'role': 'assistant', 'content': ''}
+            if context is not None:
+                delta['context'] = context
+            yield chunk([{'index': i, 'delta': delta, 'finish_reason': None}])
+            for j, word in enumerate(text.split(' ')):
+                await asyncio.sleep(emulator.token_latency)
+                yield chunk([{'index': i, 'delta': {'content': word if j == 0 else ' ' + word}, 'finish_reason': None}])
+            yield chunk([{'index': i, 'delta': {}, 'finish_reason': 'stop'}])
+        if include_usage:
+            yield chunk([], usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def azure_chat(deployment: str, request: Request):
+    return await _chat(request, deployment)
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    return await _chat(request, None)
+
+
+######################
+#  Embeddings (글자 2/3-gram 해싱 벡터: 비슷한 문장일수록 코사인 유사도가 높음)
+######################
+
+@lru_cache(maxsize=1 << 16)
+def _gram_slot(gram, dimensions):
+    h = int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'little')
+    return h % dimensions, 1.0 if (h >> 32) & 1 else -1.0
+
+
+def embed_text(text, dimensions):
+    vector = [0.0] * dimensions
+    text = ' '.join(text.lower().split())
+    # 한국어는 띄어쓰기가 달라도 비슷하게 보이도록 공백을 뺀 2-gram도 함께 사용
+    compact = text.replace(' ', '')
+    grams = [text[i:i + 3] for i in range(max(1, len(text) - 2))] + [compact[i:i + 2] for i in range(len(compact) - 1)]
+    for gram in grams:
+        slot, sign = _gram_slot(gram, dimensions)
+        vector[slot] += sign
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _inputs(value):
+    """input은 문자열, 문자열 목록, 토큰 id 목록, 토큰 id 목록의 목록 중 하나"""
+    if isinstance(value, str):
+        return [value]
+    if value and all(isinstance(item, int) for item in value):
+        return [' '.join(map(str, value))]
+    return [item if isinstance(item, str) else ' '.join(map(str, item)) for item in value]
+
+
+def _embedding_data(texts, dimensions, encoding_format):
+    data = []
+    for i, text in enumerate(texts):
+        vector = embed_text(text, dimensions)
+        if encoding_format == 'base64':
+            # openai SDK는 기본으로 base64(float32 little-endian)를 요청한다
+            vector = base64.b64encode(array.array('f', vector).tobytes()).decode('ascii')
+        data.append({'object': 'embedding', 'index': i, 'embedding': vector})
+    return data
+
+
+async def _embeddings(request, deployment):
+    body = await request.json()
+    deployment = deployment or body.get('model', 'text-embedding-3-small')
+    texts = _inputs(body.get('input', ''))
+    tokens = await asyncio.to_thread(lambda: sum(count_tokens(text) for text in texts))
+    dimensions = body.get('dimensions') or EMBEDDING_DIMENSIONS.get(deployment, DEFAULT_EMBEDDING_DIMENSION)
+    # 벡터 계산은 스레드에서 주입 지연시간과 함께 진행
+    computed = asyncio.ensure_future(asyncio.to_thread(_embedding_data, texts, dimensions, body.get('encoding_format')))
+    error = await _inject('embeddings', deployment, tokens)
+    data = await computed
+    if error is not None:
+        return error
+    return JSONResponse({'object': 'list', 'data': data, 'model': deployment,
+                         'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}})
+
+
+@app.post("/openai/deployments/{deployment}/embeddings")
+async def azure_embeddings(deployment: str, request: Request):
+    return await _embeddings(request, deployment)
+
+
+@app.post("/v1/embeddings")
+async def openai_embeddings(request: Request):
+    return await _embeddings(request, None)
+
+
+######################
+#  Computer Vision v3.2 (analyze / detect / ocr)
+######################
+
+def _image_size(data):
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return 640, 480
+
+
+async def _vision_input(request):
+    data = await request.body()
+    if request.headers.get('content-type', '').startswith('application/json'):
+        url = json.loads(data or b'{}').get('url', '')
+        return url.encode('utf-8'), (640, 480)
+    return data, _image_size(data)
+
+
+def _objects(rng, width, height):
+    objects = []
+    for _ in range(rng.randint(1, 4)):
+        name, parent = rng.choice(OBJECTS)
+        w, h = rng.randint(width // 8, width // 2), rng.randint(height // 8, height // 2)
+        obj = {'rectangle': {'x': rng.randint(0, width - w), 'y': rng.randint(0, height - h), 'w': w, 'h': h},
+               'object': name, 'confidence': round(rng.uniform(0.5, 0.99), 3)}
+        if parent:
+            obj['parent'] = {'object': parent, 'confidence': round(rng.uniform(0.5, 0.99), 3)}
+        objects.append(obj)
+    return objects
+
+
+def _metadata(data, width, height):
+    return {'height': height, 'width': width, 'format': 'Jpeg' if data[:2] == b'\xff\xd8' else 'Png'}
+
+
+async def _vision(request, build):
+    data, (width, height) = await _vision_input(request)
+    if not data:
+        emulator.record('vision', 400, 0.0)
+        return JSONResponse({'error': {'code': 'InvalidImageSize', 'message': 'Image must be at least 50 pixels in width and height'}},
+                            status_code=400)
+    error = await _inject('vision', vision=True)
+    if error is not None:
+        return error
+    rng = random.Random(hashlib.sha256(data).hexdigest())
+    result = build(rng, width, height, request.query_params)
+    result.update(requestId=str(uuid.uuid4()), modelVersion='2021-05-01',
+                  metadata=_metadata(data, width, height))
+    return JSONResponse(result)
+
+
+def _analyze(rng, width, height, params):
+    features = {feature.strip().lower() for feature in params.get('visualFeatures', 'Categories').split(',')}
+    objects = _objects(rng, width, height)
+    names = sorted({obj['object'] for obj in objects})
+    result = {}
+    if 'categories' in features:
+        result['categories'] = [{'name': f"animal_{names[0]}" if names[0] in ('dog', 'cat') else 'others_',
+                                 'score': round(rng.uniform(0.5, 0.99), 3)}]
+    if 'tags' in features:
+        result['tags'] = [{'name': name, 'confidence': round(rng.uniform(0.5, 0.99), 3)} for name in names]
+    if 'description' in features:
+        result['description'] = {'tags': names, 'captions': [
+            {'text': f"a {' and a '.join(names)}", 'confidence': round(rng.uniform(0.4, 0.9), 3)}]}
+    if 'color' in features:
+        colors = ['Black', 'White', 'Grey', 'Brown', 'Blue', 'Green']
+        result['color'] = {'dominantColorForeground': rng.choice(colors), 'dominantColorBackground': rng.choice(colors),
+                           'dominantColors': rng.sample(colors, 2), 'accentColor': f"{rng.randrange(0xFFFFFF):06X}",
+                           'isBwImg': False, 'isBWImg': False}
+    if 'objects' in features:
+        result['objects'] = objects
+    if 'faces' in features:
+        result['faces'] = []
+    return result
+
+
+def _detect(rng, width, height, params):
+    return {'objects': _objects(rng, width, height)}
+
+
+def _ocr(rng, width, height, params):
+    lines = []
+    line_height = max(10, height // 20)
+    for row in range(rng.randint(1, 6)):
+        x, y = width // 10, height // 10 + row * line_height * 2
+        words = []
+        for _ in range(rng.randint(2, 6)):
+            text = rng.choice(FILLER)
+            w = min(len(text) * line_height // 2, max(1, width - x))
+            words.append({'boundingBox': f"{x},{y},{w},{line_height}", 'text': text})
+            x += w + line_height // 2
+        left = width // 10
+        lines.append({'boundingBox': f"{left},{y},{max(1, x - left)},{line_height}", 'words': words})
+    top, bottom = height // 10, height // 10 + len(lines) * line_height * 2
+    region = {'boundingBox': f"{width // 10},{top},{width * 8 // 10},{bottom - top}", 'lines': lines}
+    return {'language': params.get('language', 'unk') if params.get('language', 'unk') != 'unk' else 'en',
+            'textAngle': 0.0, 'orientation': 'Up', 'regions': [region]}
+
+
+@app.post("/vision/v3.2/analyze")
+async def vision_analyze(request: Request):
+    return await _vision(request, _analyze)
+
+
+@app.post("/vision/v3.2/detect")
+async def vision_detect(request: Request):
+    return await _vision(request, _detect)
+
+
+@app.post("/vision/v3.2/ocr")
+async def vision_ocr(request: Request):
+    return await _vision(request, _ocr)
+
+
+######################
+#  에뮬레이터 설정/통계
+######################
+
+@app.get("/emulator/config")
+def get_config():
+    return emulator.config()
+
+
+@app.put("/emulator/config")
+async def put_config(request: Request):
+    """예: {"chat": {"latency": "fixed:2", "throttle_rate": 0.1}, "tpm": 60000}"""
+    try:
+        emulator.configure(await request.json())
+    except (ValueError, TypeError, IndexError) as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    return emulator.config()
+
+
+@app.get("/emulator/stats")
+def get_stats():
+    return emulator.stats()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="local Azure OpenAI / Computer Vision emulator")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
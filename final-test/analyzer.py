@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from aoai_client import chat_completion
+from result_cache import content_hash
+
+try:
+    import tiktoken
+    _ENCODER = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODER = None
+
+# 청크/워커 설정 (배포 규모에 맞게 환경변수로 조정)
+CHUNK_TOKENS = int(os.getenv("ANALYZE_CHUNK_TOKENS", "3000"))
+REDUCE_TOKENS = int(os.getenv("ANALYZE_REDUCE_TOKENS", "12000"))
+MAX_WORKERS = int(os.getenv("ANALYZE_MAX_WORKERS", "4"))
+
+# 프롬프트를 바꾸면 버전을 올려 이전 캐시 결과를 무효화한다
+PROMPT_VERSION = "v1"
+
+# 분석할 내용이 없을 때 LLM 호출 없이 반환하는 요약
+EMPTY_SUMMARY = "분석할 소스코드 내용이 없습니다. (비어 있는 파일만 포함되어 있습니다)"
+
+SYSTEM_PROMPT = "당신은 훌륭한 소스코드 분석가입니다."
+
+MAP_PROMPT = (
+    "아래는 소스코드 파일의 일부입니다. 이 코드 조각의 역할, 주요 클래스/함수, "
+    "비즈니스 로직, 다른 모듈과의 의존 관계를 한글로 간결하게 요약해줘.\n\n"
+)
+DIR_PROMPT = (
+    "아래는 같은 디렉터리에 속한 소스코드 조각들의 요약입니다. "
+    "디렉터리 전체의 역할, 주요 구성 요소와 흐름을 한글로 구조적으로 요약해줘.\n\n"
+)
+REPO_PROMPT = (
+    "아래는 디렉터리별 소스코드 요약입니다. 전체를 분석해주고, 비즈니스 로직, "
+    "주요 특징/구성/주요 함수 및 전반적인 구조와 개선점을 요약해줘. "
+    "그리고 시퀀스 다이어그램도 그려줘\n\n"
+)
+
+
+def count_tokens(text):
+    """텍스트의 토큰 수 계산 (tiktoken이 없으면 글자 수 기반 추정)"""
+    if _ENCODER is not None:
+        return len(_ENCODER.encode(text, disallowed_special=()))
+    return len(text) // 2 + 1
+
+
+class StageStats:
+    """단계별 지연시간과 토큰 사용량 집계"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {
+            'calls': 0, 'seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0,
+        })
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self._stage(name)['seconds'] += seconds
+
+    def add_call(self, name, usage):
+        with self._lock:
+            stage = self._stage(name)
+            stage['calls'] += 1
+            if usage is not None:
+                stage['prompt_tokens'] += usage.prompt_tokens
+                stage['completion_tokens'] += usage.completion_tokens
+
+    def add_stream(self, name, ttft, completion_tokens, seconds):
+        """스트리밍 호출의 첫 토큰 지연시간(TTFT)과 초당 토큰 수 기록"""
+        with self._lock:
+            stage = self._stage(name)
+            stage['ttft'] = round(ttft, 3)
+            stage['tokens_per_sec'] = round(completion_tokens / seconds, 1) if seconds > 0 else 0.0
+
+    def rows(self):
+        """Streamlit 표 출력용 리스트"""
+        return [{'stage': name, **values} for name, values in self.stages.items()]
+
+
+def split_into_chunks(files, max_tokens=CHUNK_TOKENS):
+    """파일을 줄 단위로 잘라 토큰 예산 이하의 청크 목록으로 분할"""
+    chunks = []
+    for file in files:
+        lines = file['content'].splitlines(keepends=True)
+        buf, buf_tokens, index = [], 0, 0
+        for line in lines:
+            line_tokens = count_tokens(line)
+            # 한 줄이 예산보다 긴 경우(압축된 js 등)는 글자 단위로 자른다
+            while line_tokens > max_tokens:
+                cut = max(1, len(line) * max_tokens // line_tokens)
+                head, line = line[:cut], line[cut:]
+                if buf:
+                    chunks.append({'path': file['path'], 'index': index, 'text': ''.join(buf), 'tokens': buf_tokens})
+                    buf, buf_tokens, index = [], 0, index + 1
+                chunks.append({'path': file['path'], 'index': index, 'text': head, 'tokens': count_tokens(head)})
+                index += 1
+                line_tokens = count_tokens(line)
+            if buf and buf_tokens + line_tokens > max_tokens:
+                chunks.append({'path': file['path'], 'index': index, 'text': ''.join(buf), 'tokens': buf_tokens})
+                buf, buf_tokens, index = [], 0, index + 1
+            buf.append(line)
+            buf_tokens += line_tokens
+        if buf:
+            chunks.append({'path': file['path'], 'index': index, 'text': ''.join(buf), 'tokens': buf_tokens})
+    return chunks
+
+
+def _stream_chat(messages, stage, stats, deployment, temperature, on_token):
+    """stream=True로 호출해 토큰이 도착할 때마다 on_token(누적 텍스트)을 호출하고 전체 텍스트 반환"""
+    start = time.perf_counter()
+    ttft, usage, parts = None, None, []
+    stream = chat_completion(
+        model=deployment,
+        temperature=temperature,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        # Azure는 콘텐츠 필터 결과만 담긴 빈 choices 청크를 먼저 보내기도 한다
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        parts.append(chunk.choices[0].delta.content)
+        on_token(''.join(parts))
+    content = ''.join(parts)
+    elapsed = time.perf_counter() - start
+    stats.add_call(stage, usage)
+    completion_tokens = usage.completion_tokens if usage is not None else count_tokens(content)
+    stats.add_stream(stage, ttft if ttft is not None else elapsed, completion_tokens, elapsed - (ttft or 0))
+    return content
+
+
+def _chat(prompt, stage, stats, deployment, cache=None, temperature=0.2, on_token=None):
+    """chat completions 호출 후 토큰 사용량 기록 (cache가 있으면 프롬프트 해시로 재사용)
+
+    on_token이 주어지면 스트리밍으로 호출한다.
+    """
+    key = None
+    if cache is not None:
+        key = content_hash(PROMPT_VERSION, deployment, SYSTEM_PROMPT, prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            return cached
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    if on_token is not None:
+        content = _stream_chat(messages, stage, stats, deployment, temperature, on_token)
+    else:
+        response = chat_completion(
+            model=deployment,
+            temperature=temperature,
+            messages=messages,
+        )
+        stats.add_call(stage, response.usage)
+        content = response.choices[0].message.content
+    if cache is not None:
+        cache.put(key, stage, content)
+    return content
+
+
+def map_chunks(chunks, stats, deployment, max_workers=MAX_WORKERS, cache=None):
+    """청크별 요약을 제한된 워커 풀로 동시에 수행"""
+    def summarize(chunk):
+        prompt = MAP_PROMPT + chunk.get('context', '') + f"### 파일: {chunk['path']} (part {chunk['index'] + 1})\n{chunk['text']}"
+        return _chat(prompt, 'map', stats, deployment, cache)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        summaries = list(executor.map(summarize, chunks))
+    stats.add_time('map', time.perf_counter() - start)
+    return [dict(chunk, summary=summary) for chunk, summary in zip(chunks, summaries)]
+
+
+def _reduce_texts(texts, instruction, stage, stats, deployment, max_workers, cache=None,
+                  budget=REDUCE_TOKENS, on_token=None):
+    """요약 목록이 예산을 넘으면 묶음 단위로 반복 축약해 하나의 요약으로 합침
+
+    on_token은 마지막(최종) 축약 호출에만 적용된다.
+    """
+    if not texts:
+        # 빈 파일만 있는 저장소 등 요약할 내용이 없으면 LLM을 호출하지 않는다
+        if on_token is not None:
+            on_token(EMPTY_SUMMARY)
+        return EMPTY_SUMMARY
+    while True:
+        groups, buf, buf_tokens = [], [], 0
+        for text in texts:
+            tokens = count_tokens(text)
+            if buf and buf_tokens + tokens > budget:
+                groups.append(buf)
+                buf, buf_tokens = [], 0
+            buf.append(text)
+            buf_tokens += tokens
+        if buf:
+            groups.append(buf)
+
+        if len(groups) == 1:
+            return _chat(instruction + "\n\n".join(groups[0]), stage, stats, deployment, cache, on_token=on_token)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            texts = list(executor.map(
+                lambda group: _chat(instruction + "\n\n".join(group), stage, stats, deployment, cache),
+                groups,
+            ))
+
+
+def group_by_directory(summarized_chunks):
+    """청크 요약을 디렉터리별 축약 입력 텍스트로 묶음"""
+    by_dir = defaultdict(list)
+    for chunk in summarized_chunks:
+        by_dir[os.path.dirname(chunk['path']) or '.'].append(
+            f"### 파일: {chunk['path']} (part {chunk['index'] + 1})\n{chunk['summary']}"
+        )
+    return by_dir
+
+
+def reduce_directory_texts(by_dir, stats, deployment, max_workers=MAX_WORKERS, cache=None):
+    """디렉터리별 입력 텍스트를 디렉터리 요약으로 축약"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            directory: executor.submit(_reduce_texts, texts, DIR_PROMPT, 'reduce_dir', stats, deployment, 1, cache)
+            for directory, texts in by_dir.items()
+        }
+        dir_summaries = {directory: future.result() for directory, future in futures.items()}
+    stats.add_time('reduce_dir', time.perf_counter() - start)
+    return dir_summaries
+
+
+def reduce_directories(summarized_chunks, stats, deployment, max_workers=MAX_WORKERS, cache=None):
+    """청크 요약을 디렉터리 단위로 축약"""
+    return reduce_directory_texts(group_by_directory(summarized_chunks), stats, deployment, max_workers, cache)
+
+
+def reduce_repository(dir_summaries, stats, deployment, max_workers=MAX_WORKERS, cache=None, on_token=None):
+    """디렉터리 요약을 전체 저장소 리포트로 축약 (on_token이 있으면 최종 리포트를 스트리밍)"""
+    texts = [f"## 디렉터리: {directory}\n{summary}" for directory, summary in sorted(dir_summaries.items())]
+    start = time.perf_counter()
+    report = _reduce_texts(
+        texts, REPO_PROMPT + "최대한 구조적으로, 한글로 정리해줘.\n\n",
+        'reduce_repo', stats, deployment, max_workers, cache, on_token=on_token,
+    )
+    stats.add_time('reduce_repo', time.perf_counter() - start)
+    return report
+
+
+def _file_key(file, deployment, chunk_tokens):
+    return content_hash(PROMPT_VERSION, deployment, chunk_tokens, file['path'], file['content'])
+
+
+def analyze_repository(files, deployment, chunk_tokens=CHUNK_TOKENS, max_workers=MAX_WORKERS, cache=None,
+                       on_token=None):
+    """map(청크 요약) → reduce(디렉터리) → reduce(저장소) 순으로 분석하고 (리포트, 통계) 반환
+
+    cache(ResultCache)가 주어지면 내용이 바뀌지 않은 파일은 저장된 청크 요약을 그대로 사용한다.
+    """
+    stats = StageStats()
+
+    # 파일 단위 캐시 조회: 변경되지 않은 파일은 분할/요약을 건너뛴다
+    summarized, changed = [], []
+    for file in files:
+        cached = cache.get(_file_key(file, deployment, chunk_tokens)) if cache is not None else None
+        if cached is not None:
+            summarized.extend(json.loads(cached))
+        else:
+            changed.append(file)
+
+    start = time.perf_counter()
+    chunks = split_into_chunks(changed, chunk_tokens)
+    stats.add_time('split', time.perf_counter() - start)
+    stats.stages['split']['prompt_tokens'] = sum(chunk['tokens'] for chunk in chunks)
+
+    mapped = map_chunks(chunks, stats, deployment, max_workers, cache)
+    if cache is not None:
+        by_path = defaultdict(list)
+        for chunk in mapped:
+            by_path[chunk['path']].append(
+                {'path': chunk['path'], 'index': chunk['index'], 'summary': chunk['summary']}
+            )
+        for file in changed:
+            cache.put(_file_key(file, deployment, chunk_tokens), 'file', json.dumps(by_path[file['path']], ensure_ascii=False))
+    summarized.extend(mapped)
+    summarized.sort(key=lambda chunk: (chunk['path'], chunk['index']))
+
+    dir_summaries = reduce_directories(summarized, stats, deployment, max_workers, cache)
+    report = reduce_repository(dir_summaries, stats, deployment, max_workers, cache, on_token)
+    return report, stats
@@ -0,0 +1,355 @@
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+
+# 배포별 분당 요청 수/토큰 수 한도 (Azure 포털의 배포 할당량에 맞게 설정, 0이면 제한 없음)
+# Azure는 분당 한도를 1~10초 단위로 나눠 검사하므로 버킷에는 BURST_SECONDS 분량만 쌓아 둔다
+BURST_SECONDS = float(os.getenv("AOAI_BURST_SECONDS", "10"))
+# max_tokens 없이 호출할 때 응답 토큰 수 추정치
+DEFAULT_COMPLETION_TOKENS = int(os.getenv("AOAI_DEFAULT_COMPLETION_TOKENS", "1000"))
+# 메시지 하나당 role/구분자 등으로 추가되는 토큰 수 (근사치)
+MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    """토큰 수 계산 (tiktoken이 없으면 글자 수 기반 근사치)"""
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(text) // 2 + 1
+
+
+def estimate_tokens(kwargs):
+    """요청이 TPM 한도에서 차감될 토큰 수 추정 (Azure와 같이 프롬프트 토큰 + max_tokens 기준)"""
+    prompt = 3
+    for message in kwargs.get('messages', []):
+        content = message.get('content') or ''
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        prompt += count_tokens(content) + MESSAGE_OVERHEAD
+    completion = kwargs.get('max_completion_tokens') or kwargs.get('max_tokens') or DEFAULT_COMPLETION_TOKENS
+    return prompt + completion * kwargs.get('n', 1)
+
+
+class TokenBucket:
+    """분당 한도를 초 단위로 채우는 토큰 버킷 (요청 순서대로 예약하고 부족한 만큼 대기)"""
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute * burst_seconds / 60)
+        self.scale = 1.0  # 429를 받으면 줄였다가 성공할 때마다 조금씩 회복
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.per_minute / 60 * self.scale
+
+    def reserve(self, amount):
+        """amount만큼 미리 차감하고, 잔량이 음수가 되면 채워질 때까지 기다려야 할 시간(초) 반환"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _status_code(error):
+    return getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def _retry_after(error, attempt, backoff):
+    """retry-after-ms / retry-after 헤더의 대기 시간, 없으면 지수 백오프 + 지터"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    for name, unit in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        try:
+            return float(headers[name]) * unit
+        except (KeyError, TypeError, ValueError):
+            continue
+    return backoff * 2 ** attempt * (0.5 + random.random() / 2)
+
+
+def _make_client(max_connections):
+    # 전역 openai 모듈 설정 대신 연결 풀을 가진 클라이언트를 만든다 (재시도는 한도를 알고 있는 Deployment가 담당)
+    import httpx
+    from openai import AzureOpenAI
+    return AzureOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+        api_version=os.getenv("OPENAI_API_VERSION"),
+        max_retries=0,
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(120.0, connect=10.0),
+        ),
+    )
+
+
+class Deployment:
+    """배포 하나에 대한 공유 chat completions 호출자
+
+    - 연결 풀을 가진 클라이언트 하나를 모든 호출이 공유
+    - 보내기 전에 RPM/TPM 토큰 버킷에서 예약해 한도 안에서만 요청 (429로 버려지는 요청을 줄임)
+    - 429를 받으면 retry-after 헤더만큼 배포 전체가 쉬고, 전송 속도를 낮췄다가 성공할 때마다 회복
+    - 같은 인자로 진행 중인 요청이 있으면 새로 보내지 않고 그 결과를 함께 받음 (스트리밍 제외)
+    """
+
+    def __init__(self, name, rpm, tpm, client=None, max_connections=20, max_retries=5, backoff=1.0,
+                 burst_seconds=BURST_SECONDS):
+        self.name = name
+        self.client = client if client is not None else _make_client(max_connections)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.buckets = [TokenBucket(limit, burst_seconds) if limit else None for limit in (rpm, tpm)]
+        self._cooldown_until = 0.0
+        self._slowed_at = 0.0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {'requests': 0, 'coalesced': 0, 'throttled': 0, 'failed': 0,
+                       'estimated_tokens': 0, 'total_tokens': 0, 'wait_seconds': 0.0}
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _cooldown(self):
+        while True:
+            with self._lock:
+                pause = self._cooldown_until - time.monotonic()
+            if pause <= 0:
+                return
+            time.sleep(pause)
+
+    def _acquire(self, tokens):
+        start = time.monotonic()
+        self._cooldown()
+        requests_bucket, tokens_bucket = self.buckets
+        wait = max(requests_bucket.reserve(1) if requests_bucket else 0.0,
+                   tokens_bucket.reserve(tokens) if tokens_bucket else 0.0)
+        if wait > 0:
+            time.sleep(wait)
+            self._cooldown()  # 기다리는 동안 다른 요청이 429를 받았으면 함께 쉰다
+        self._count('wait_seconds', time.monotonic() - start)
+
+    def _adapt(self, throttled, pause=0.0):
+        with self._lock:
+            now = time.monotonic()
+            if throttled:
+                self._cooldown_until = max(self._cooldown_until, now + pause)
+                # 동시에 받은 429들로 속도가 한꺼번에 떨어지지 않도록 1초에 한 번만 줄인다
+                if now - self._slowed_at < 1.0:
+                    return
+                self._slowed_at = now
+            for bucket in self.buckets:
+                if bucket is not None:
+                    bucket.scale = max(0.1, bucket.scale * 0.7) if throttled else min(1.0, bucket.scale + 0.01)
+
+    def _send(self, kwargs):
+        tokens = estimate_tokens(kwargs)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens)
+            self._count('requests')
+            self._count('estimated_tokens', tokens)
+            try:
+                response = self.client.chat.completions.create(model=self.name, **kwargs)
+            except Exception as e:
+                status = _status_code(e)
+                retryable = status == 429 or (status is not None and status >= 500)
+                if not retryable or attempt == self.max_retries:
+                    self._count('failed')
+                    raise
+                if status == 429:
+                    self._count('throttled')
+                self._adapt(True, _retry_after(e, attempt, self.backoff))
+                continue
+            self._adapt(False)
+            return response
+
+    def _stream(self, response):
+        for chunk in response:
+            if getattr(chunk, 'usage', None) is not None:
+                self._count('total_tokens', chunk.usage.total_tokens)
+            yield chunk
+
+    def create(self, coalesce=True, **kwargs):
+        """client.chat.completions.create와 같은 인자로 호출 (model은 배포 이름으로 고정)"""
+        if kwargs.get('stream'):
+            return self._stream(self._send(kwargs))
+        if not coalesce:
+            return self._record(self._send(kwargs))
+
+        key = hashlib.sha256(json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._record(self._send(kwargs))
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def _record(self, response):
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            self._count('total_tokens', usage.total_tokens)
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 2)
+        stats['rate_scale'] = round(min((bucket.scale for bucket in self.buckets if bucket), default=1.0), 2)
+        return stats
+
+
+_deployments = {}
+_deployments_lock = threading.Lock()
+
+
+def get_deployment(name=None, rpm=None, tpm=None, client=None):
+    """배포 이름별 공유 Deployment (프로세스마다 한 번만 생성, 이후 호출의 한도 인자는 무시)
+
+    한도는 프로세스 단위이므로 여러 프로세스가 같은 배포를 쓰면 할당량을 나눠서 넘겨야 한다.
+    """
+    name = name or os.getenv("DEPLOYMENT_NAME")
+    with _deployments_lock:
+        deployment = _deployments.get(name)
+        if deployment is None:
+            deployment = _deployments[name] = Deployment(
+                name,
+                rpm=int(os.getenv("AOAI_RPM_LIMIT", "0")) if rpm is None else rpm,
+                tpm=int(os.getenv("AOAI_TPM_LIMIT", "0")) if tpm is None else tpm,
+                client=client,
+                max_connections=int(os.getenv("AOAI_MAX_CONNECTIONS", "20")),
+                max_retries=int(os.getenv("AOAI_MAX_RETRIES", "5")),
+            )
+        return deployment
+
+
+def chat_completion(model=None, **kwargs):
+    """공유 Deployment로 chat completions 호출 (model은 배포 이름, 생략하면 DEPLOYMENT_NAME)"""
+    return get_deployment(model).create(**kwargs)
+
+
+class _SimulatedRateLimit(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(status_code=429, headers={'retry-after-ms': str(math.ceil(retry_after * 1000))})
+
+
+class _SimulatedService:
+    """할당량을 burst_seconds 단위로 검사하는 가짜 Azure OpenAI (처리량 비교용)"""
+
+    def __init__(self, rpm, tpm, burst_seconds, latency=0.2):
+        self.buckets = [TokenBucket(rpm, burst_seconds), TokenBucket(tpm, burst_seconds)]
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, **kwargs):
+        self.calls += 1
+        tokens = estimate_tokens(kwargs)
+        for bucket, amount in zip(self.buckets, (1, tokens)):
+            with bucket._lock:
+                now = time.monotonic()
+                bucket.tokens = min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate)
+                bucket.updated = now
+                if bucket.tokens < amount:
+                    raise _SimulatedRateLimit((amount - bucket.tokens) / bucket.rate)
+        for bucket, amount in zip(self.buckets, (1, tokens)):
+            with bucket._lock:
+                bucket.tokens -= amount
+        time.sleep(self.latency)
+        usage = SimpleNamespace(total_tokens=tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))], usage=usage)
+
+
+def _simulate(rpm=3000, tpm=600000, requests=200, duplicate_ratio=0.2, workers=32, burst_seconds=1.0):
+    """같은 할당량에서 제한 없이 보내기(SDK 기본 재시도) vs Deployment 처리량 비교"""
+    from concurrent.futures import ThreadPoolExecutor
+    rng = random.Random(0)
+    unique = int(requests * (1 - duplicate_ratio))
+    prompts = [f"질문 {rng.randrange(unique)}" if i >= unique else f"질문 {i}" for i in range(requests)]
+    rng.shuffle(prompts)
+    jobs = [{'messages': [{'role': 'user', 'content': prompt * 50}], 'max_tokens': 400} for prompt in prompts]
+
+    def naive(service):
+        # 한도를 모르는 호출자: 중복도 그대로 보내고, 429면 각자 retry-after만큼 기다렸다가 재시도
+        def call(job, max_retries=10):
+            for attempt in range(max_retries + 1):
+                try:
+                    return service.create(model='sim', **job)
+                except _SimulatedRateLimit as e:
+                    if attempt == max_retries:
+                        raise
+                    time.sleep(_retry_after(e, attempt, 1.0))
+        return call, lambda: {}
+
+    def shared(service):
+        deployment = Deployment('sim', rpm, tpm, client=service, burst_seconds=burst_seconds)
+        return (lambda job: deployment.create(**job)), deployment.stats
+
+    results = {}
+    for label, make in (('naive', naive), ('shared', shared)):
+        service = _SimulatedService(rpm, tpm, burst_seconds)
+        call, stats = make(service)
+
+        def run(job):
+            try:
+                call(job)
+                return True
+            except _SimulatedRateLimit:
+                return False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            ok = sum(executor.map(run, jobs))
+        elapsed = time.perf_counter() - start
+        results[label] = {'ok': ok, 'failed': requests - ok, 'service_calls': service.calls,
+                          'seconds': round(elapsed, 2), 'ok_per_sec': round(ok / elapsed, 1), **stats()}
+    return results
+
+
+if __name__ == "__main__":
+    for label, result in _simulate().items():
+        print(label, result)
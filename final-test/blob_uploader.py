@@ -0,0 +1,102 @@
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from azure.storage.blob import BlobServiceClient, ContentSettings
+
+# 동시 업로드 수와 재시도 설정
+UPLOAD_WORKERS = int(os.getenv("BLOB_UPLOAD_WORKERS", "8"))
+UPLOAD_RETRIES = int(os.getenv("BLOB_UPLOAD_RETRIES", "3"))
+UPLOAD_BACKOFF = float(os.getenv("BLOB_UPLOAD_BACKOFF", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+
+def get_container_client(zip_name=None):
+    """zip 파일명으로 컨테이너를 만들고 클라이언트 반환 (연결 정보가 없으면 None)"""
+    connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    if not connection_string:
+        return None
+    # zip 파일명(확장자 제외)으로 컨테이너명 생성
+    if zip_name:
+        container_name = os.path.splitext(os.path.basename(zip_name))[0].lower().replace('.', '-').replace('_', '-')
+    else:
+        container_name = "uploaded-files"
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    try:
+        blob_service_client.create_container(container_name)
+    except Exception:
+        pass  # 이미 있으면 무시
+    return blob_service_client.get_container_client(container_name)
+
+
+def existing_md5s(container_client):
+    """컨테이너에 이미 있는 blob 이름 → content MD5"""
+    md5s = {}
+    for blob in container_client.list_blobs():
+        md5 = blob.content_settings.content_md5 if blob.content_settings else None
+        if md5:
+            md5s[blob.name] = bytes(md5)
+    return md5s
+
+
+def upload_files(container_client, files, max_workers=UPLOAD_WORKERS, delta=True,
+                 retries=UPLOAD_RETRIES, backoff=UPLOAD_BACKOFF):
+    """파일 레코드를 스레드 풀로 동시에 업로드
+
+    delta=True이면 기존 blob의 MD5와 같은 파일은 건너뛴다.
+    실패한 업로드는 지수 백오프로 retries번까지 재시도한다.
+    재시도 후에도 실패한 파일 경로는 result['failed']에 담아 반환한다.
+    container_client는 list_blobs/upload_blob만 사용하므로 fake_blob.FakeContainerClient로 대체할 수 있다.
+    """
+    known = existing_md5s(container_client) if delta else {}
+    result = {'uploaded': 0, 'skipped': 0, 'failed': []}
+    lock = threading.Lock()
+    # 제출 대기 중인 작업 수를 제한해 파일 내용을 한꺼번에 메모리에 올리지 않는다
+    slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def upload(file):
+        try:
+            data = file['content'].encode('utf-8')
+            md5 = hashlib.md5(data).digest()
+            if known.get(file['path']) == md5:
+                outcome = 'skipped'
+            else:
+                outcome = 'failed'
+                for attempt in range(retries + 1):
+                    try:
+                        container_client.upload_blob(
+                            file['path'], data, overwrite=True,
+                            content_settings=ContentSettings(content_md5=bytearray(md5)),
+                        )
+                        outcome = 'uploaded'
+                        break
+                    except Exception:
+                        if attempt == retries:
+                            logger.exception("Upload failed after %d attempts: %s", retries + 1, file['path'])
+                            break
+                        time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+            with lock:
+                if outcome == 'failed':
+                    result['failed'].append(file['path'])
+                else:
+                    result[outcome] += 1
+        finally:
+            slots.release()
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for file in files:
+            slots.acquire()
+            futures[executor.submit(upload, file)] = file['path']
+    # upload 안에서 잡히지 않은 예외도 실패로 집계
+    for future, path in futures.items():
+        try:
+            future.result()
+        except Exception:
+            logger.exception("Upload failed: %s", path)
+            result['failed'].append(path)
+    return result
@@ -0,0 +1,34 @@
+import hashlib
+import threading
+from azure.storage.blob import ContentSettings
+
+
+class _FakeProperties:
+    def __init__(self, name, md5):
+        self.name = name
+        self.content_settings = ContentSettings(content_md5=bytearray(md5))
+
+
+class FakeContainerClient:
+    """로컬 테스트용 메모리 기반 컨테이너 클라이언트 (Azurite 없이 blob_uploader.upload_files 확인용)"""
+
+    def __init__(self, fail_times=0):
+        self.blobs = {}
+        self.upload_calls = 0
+        self._fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def list_blobs(self):
+        with self._lock:
+            return [_FakeProperties(name, hashlib.md5(data).digest()) for name, data in self.blobs.items()]
+
+    def upload_blob(self, name, data, overwrite=False, content_settings=None):
+        with self._lock:
+            self.upload_calls += 1
+            # 처음 fail_times번은 일시적 오류를 흉내낸다
+            if self._fail_times > 0:
+                self._fail_times -= 1
+                raise ConnectionError("simulated transient error")
+            if name in self.blobs and not overwrite:
+                raise FileExistsError(name)
+            self.blobs[name] = bytes(data)
@@ -0,0 +1,267 @@
+import os
+import re
+import json
+import time
+import posixpath
+from collections import defaultdict
+from analyzer import (
+    CHUNK_TOKENS, MAX_WORKERS, PROMPT_VERSION, StageStats,
+    split_into_chunks, map_chunks, group_by_directory, reduce_directory_texts, reduce_repository,
+)
+from result_cache import content_hash
+
+MANIFEST_DIR = os.getenv("ANALYZE_MANIFEST_DIR", "./.cache/manifests")
+
+# 확장자별 import 구문 / 최상위 정의(함수, 클래스) 정적 파서
+IMPORT_PATTERNS = {
+    '.py': re.compile(r'^\s*(?:from\s+(\.*[\w.]*)\s+import\s+\(?\s*([\w., ]+)|import\s+([\w., ]+))', re.M),
+    '.java': re.compile(r'^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;', re.M),
+    '.js': re.compile(r'''(?:import\s[^'"]*?from\s*|import\s*|require\(\s*|export\s[^'"]*?from\s*)['"]([^'"]+)['"]'''),
+    '.c': re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.M),
+}
+IMPORT_PATTERNS['.ts'] = IMPORT_PATTERNS['.js']
+IMPORT_PATTERNS['.cpp'] = IMPORT_PATTERNS['.c']
+
+SYMBOL_PATTERNS = {
+    '.py': re.compile(r'^(?:async\s+)?(?:def|class)\s+(\w+)', re.M),
+    '.java': re.compile(r'\b(?:class|interface|enum|record)\s+(\w+)|^\s+(?:public|protected)\s[\w<>\[\], ]*?\s(\w+)\s*\(', re.M),
+    '.js': re.compile(r'^(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\*?|class|const|let|var)\s+(\w+)', re.M),
+    '.c': re.compile(r'^[A-Za-z_][\w\s\*&:<>,]*?\b(\w+)\s*\([^;{]*\)\s*(?:const\s*)?\{', re.M),
+}
+SYMBOL_PATTERNS['.ts'] = SYMBOL_PATTERNS['.js']
+SYMBOL_PATTERNS['.cpp'] = SYMBOL_PATTERNS['.c']
+
+
+def _ext(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def parse_imports(path, content):
+    """파일에서 import/include 대상(원문 표기) 목록 추출"""
+    pattern = IMPORT_PATTERNS.get(_ext(path))
+    if pattern is None:
+        return []
+    specs = []
+    for match in pattern.finditer(content):
+        if _ext(path) == '.py':
+            module, names, plain = match.groups()
+            if plain:
+                specs.extend(name.split(' as ')[0].strip() for name in plain.split(','))
+            else:
+                # from a import b 는 a.b(하위 모듈)와 a(모듈) 둘 다 후보로 둔다
+                specs.extend(
+                    f"{module}{'' if module.endswith('.') else '.'}{name.split(' as ')[0].strip()}"
+                    for name in names.split(',') if name.strip()
+                )
+                specs.append(module)
+        else:
+            specs.append(match.group(1))
+    return [spec for spec in specs if spec]
+
+
+def parse_symbols(path, content):
+    """파일의 최상위 함수/클래스 이름 목록 추출 (의존 파일 문맥용)"""
+    pattern = SYMBOL_PATTERNS.get(_ext(path))
+    if pattern is None:
+        return []
+    symbols = []
+    for match in pattern.finditer(content):
+        name = next((group for group in match.groups() if group), None)
+        if name and name not in symbols:
+            symbols.append(name)
+    return symbols[:30]
+
+
+class ImportResolver:
+    """import 표기를 업로드된 저장소 안의 파일 경로로 변환"""
+
+    def __init__(self, paths):
+        self.paths = set(paths)
+        # zip 최상위 폴더 이름과 무관하게 찾을 수 있도록 경로의 모든 접미사로 색인
+        self.by_suffix = defaultdict(list)
+        for path in paths:
+            parts = path.split('/')
+            for i in range(len(parts)):
+                self.by_suffix['/'.join(parts[i:])].append(path)
+
+    def _suffix(self, suffix):
+        matches = self.by_suffix.get(suffix, [])
+        return matches[0] if len(matches) == 1 else None
+
+    def _relative(self, path, spec, candidates):
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(path), spec))
+        for candidate in candidates:
+            if base + candidate in self.paths:
+                return base + candidate
+        return None
+
+    def resolve(self, path, spec):
+        ext = _ext(path)
+        if ext == '.py':
+            if spec.startswith('.'):
+                level = len(spec) - len(spec.lstrip('.'))
+                base = posixpath.dirname(path)
+                for _ in range(level - 1):
+                    base = posixpath.dirname(base)
+                module = spec[level:].replace('.', '/')
+                rel = posixpath.join(base, module) if module else base
+                for candidate in (rel + '.py', rel + '/__init__.py'):
+                    if candidate in self.paths:
+                        return candidate
+                return None
+            module = spec.replace('.', '/')
+            return self._suffix(module + '.py') or self._suffix(module + '/__init__.py')
+        if ext == '.java':
+            return self._suffix(spec.replace('.', '/') + '.java') if not spec.endswith('*') else None
+        if ext in ('.js', '.ts'):
+            if not spec.startswith('.'):
+                return None
+            return self._relative(path, spec, ('', '.ts', '.js', '/index.ts', '/index.js'))
+        if ext in ('.c', '.cpp'):
+            return self._relative(path, spec, ('',)) or self._suffix(spec) or self._suffix(posixpath.basename(spec))
+        return None
+
+
+def build_import_graph(entries):
+    """{경로: {'imports': [...]}} → {경로: 저장소 내부 의존 파일 목록}"""
+    resolver = ImportResolver(list(entries))
+    graph = {}
+    for path, entry in entries.items():
+        deps = {resolver.resolve(path, spec) for spec in entry['imports']}
+        deps.discard(None)
+        deps.discard(path)
+        graph[path] = sorted(deps)
+    return graph
+
+
+def manifest_key(deployment, chunk_tokens):
+    """요약 결과를 바꾸는 설정(프롬프트 버전, 배포/모델, 청크 크기)의 해시"""
+    return content_hash(PROMPT_VERSION, deployment, chunk_tokens)
+
+
+def _manifest_path(repo_name, key):
+    # 설정별로 파일을 나눠, 배포나 청크 크기를 바꿨다가 되돌려도 각 설정의 결과를 그대로 재사용
+    safe = re.sub(r'[^\w.-]', '_', repo_name)
+    return os.path.join(MANIFEST_DIR, f"{safe}-{key[:16]}.json")
+
+
+def load_manifest(repo_name, key):
+    try:
+        with open(_manifest_path(repo_name, key), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == key:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': key, 'files': {}, 'dirs': {}, 'report': None}
+
+
+def save_manifest(repo_name, key, manifest):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    tmp_path = _manifest_path(repo_name, key) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, _manifest_path(repo_name, key))
+
+
+def _dependency_context(deps, entries):
+    """의존 파일의 경로와 최상위 정의를 map 프롬프트 앞에 붙일 문맥으로 변환"""
+    if not deps:
+        return ''
+    lines = [f"- {dep}: {', '.join(entries[dep]['symbols']) or '-'}" for dep in deps]
+    return "이 파일이 참조하는 프로젝트 내부 파일과 그 정의:\n" + "\n".join(lines) + "\n\n"
+
+
+def analyze_incremental(files, repo_name, deployment, chunk_tokens=CHUNK_TOKENS,
+                        max_workers=MAX_WORKERS, cache=None, on_token=None):
+    """이전 분석 manifest와 비교해 변경된 파일과 그 직접 importer만 다시 분석
+
+    디렉터리/저장소 요약도 입력이 바뀐 경우에만 다시 축약한다.
+    (리포트, 통계, 변경 요약) 을 반환한다.
+    """
+    stats = StageStats()
+    key = manifest_key(deployment, chunk_tokens)
+    manifest = load_manifest(repo_name, key)
+    old_files = manifest['files']
+
+    # 1단계: 해시와 import/정의 목록만 수집 (내용은 보관하지 않음)
+    start = time.perf_counter()
+    entries = {}
+    for file in files:
+        entries[file['path']] = {
+            'hash': content_hash(file['content']),
+            'imports': parse_imports(file['path'], file['content']),
+            'symbols': parse_symbols(file['path'], file['content']),
+        }
+    graph = build_import_graph(entries)
+    importers = defaultdict(set)
+    for path, deps in graph.items():
+        for dep in deps:
+            importers[dep].add(path)
+    for path, old in old_files.items():
+        # 삭제된 파일을 참조하던 파일도 다시 분석해야 하므로 이전 그래프도 반영
+        for dep in old.get('deps', []):
+            importers[dep].add(path)
+
+    changed = {path for path, entry in entries.items()
+               if path not in old_files or old_files[path]['hash'] != entry['hash']}
+    removed = set(old_files) - set(entries)
+    affected = set(changed)
+    for path in changed | removed:
+        affected |= importers[path]
+    affected &= set(entries)
+    stats.add_time('scan', time.perf_counter() - start)
+
+    # 2단계: 영향받은 파일만 다시 읽어 청크 요약
+    start = time.perf_counter()
+    targets = [file for file in files if file['path'] in affected]
+    chunks = split_into_chunks(targets, chunk_tokens)
+    for chunk in chunks:
+        chunk['context'] = _dependency_context(graph[chunk['path']], entries)
+    stats.add_time('split', time.perf_counter() - start)
+    stats.stages['split']['prompt_tokens'] = sum(chunk['tokens'] for chunk in chunks)
+    mapped = map_chunks(chunks, stats, deployment, max_workers, cache)
+
+    new_chunks = defaultdict(list)
+    for chunk in mapped:
+        new_chunks[chunk['path']].append({'path': chunk['path'], 'index': chunk['index'], 'summary': chunk['summary']})
+    new_files = {}
+    for path, entry in entries.items():
+        summaries = new_chunks[path] if path in affected else old_files[path]['chunks']
+        new_files[path] = {'hash': entry['hash'], 'deps': graph[path], 'symbols': entry['symbols'], 'chunks': summaries}
+
+    # 3단계: 입력이 바뀐 디렉터리만 다시 축약
+    summarized = sorted(
+        (chunk for entry in new_files.values() for chunk in entry['chunks']),
+        key=lambda chunk: (chunk['path'], chunk['index']),
+    )
+    by_dir = group_by_directory(summarized)
+    dir_hashes = {directory: content_hash(*texts) for directory, texts in by_dir.items()}
+    stale = {directory: texts for directory, texts in by_dir.items()
+             if manifest['dirs'].get(directory, {}).get('hash') != dir_hashes[directory]}
+    reduced = reduce_directory_texts(stale, stats, deployment, max_workers, cache)
+    new_dirs = {
+        directory: {'hash': dir_hashes[directory],
+                    'summary': reduced[directory] if directory in reduced else manifest['dirs'][directory]['summary']}
+        for directory in by_dir
+    }
+
+    # 4단계: 디렉터리 요약이 하나라도 바뀌었을 때만 전체 리포트 재생성
+    dir_summaries = {directory: entry['summary'] for directory, entry in new_dirs.items()}
+    report_hash = content_hash(*(f"{directory}\n{summary}" for directory, summary in sorted(dir_summaries.items())))
+    if manifest['report'] and manifest['report']['hash'] == report_hash:
+        report = manifest['report']['text']
+        if on_token is not None:
+            on_token(report)
+    else:
+        report = reduce_repository(dir_summaries, stats, deployment, max_workers, cache, on_token)
+
+    save_manifest(repo_name, key, {
+        'version': key, 'files': new_files, 'dirs': new_dirs,
+        'report': {'hash': report_hash, 'text': report},
+    })
+    changes = {
+        'changed': len(changed), 'importers': len(affected - changed), 'removed': len(removed),
+        'reused': len(entries) - len(affected), 'dirs_reduced': len(stale),
+    }
+    return report, stats, changes
@@ -0,0 +1,111 @@
+import os
+import zipfile
+
+# 파일/전체 크기 제한 (압축 해제 기준)
+MAX_FILE_BYTES = int(os.getenv("INGEST_MAX_FILE_BYTES", str(1 * 1024 * 1024)))
+MAX_TOTAL_BYTES = int(os.getenv("INGEST_MAX_TOTAL_BYTES", str(200 * 1024 * 1024)))
+
+# 분석 대상이 아닌 디렉터리와 바이너리 확장자
+SKIP_DIRS = {'node_modules', '.git', '.svn', '.idea', '.vscode', '__pycache__', '.venv', 'venv',
+             'dist', 'build', 'target', '.gradle', '__MACOSX'}
+BINARY_EXTS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.svg', '.psd',
+    '.jar', '.war', '.ear', '.class', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+    '.exe', '.dll', '.so', '.dylib', '.o', '.a', '.lib', '.pyc', '.pyd', '.whl',
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.hwp',
+    '.mp3', '.mp4', '.avi', '.mov', '.wav', '.ttf', '.otf', '.woff', '.woff2', '.eot',
+    '.db', '.sqlite', '.sqlite3', '.bin', '.dat', '.pkl', '.npy', '.parquet',
+}
+MAGIC_BYTES = (
+    b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'PK\x03\x04', b'%PDF', b'\x7fELF',
+    b'\xca\xfe\xba\xbe', b'MZ', b'\x1f\x8b', b'BZh', b'7z\xbc\xaf',
+)
+SNIFF_BYTES = 8192
+
+
+def is_skipped_path(path):
+    """제외 디렉터리나 바이너리 확장자에 해당하는지 확인"""
+    parts = path.replace('\\', '/').split('/')
+    if any(part in SKIP_DIRS for part in parts[:-1]):
+        return True
+    return os.path.splitext(parts[-1])[1].lower() in BINARY_EXTS
+
+
+def is_binary(head):
+    """파일 앞부분(magic bytes, NUL 문자)으로 바이너리 여부 판단"""
+    return head.startswith(MAGIC_BYTES) or b'\0' in head
+
+
+class ZipSource:
+    """zip 멤버를 필요할 때마다 하나씩 읽어 파일 레코드를 내보내는 소스
+
+    반복할 때마다 zip을 다시 훑으므로 업로드/분석 단계가 각각 순회해도
+    전체 파일 내용을 메모리에 올려두지 않는다.
+    """
+
+    def __init__(self, fileobj, max_file_bytes=MAX_FILE_BYTES, max_total_bytes=MAX_TOTAL_BYTES):
+        self.fileobj = fileobj
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.stats = self.scan()
+
+    def _candidates(self, z, dropped=None):
+        """크기/경로 기준으로 걸러낸 zip 멤버 목록 (압축 해제 없이 헤더만 확인)
+
+        전체 크기 제한에 걸려 읽지 않은 대상 파일 수는 dropped['truncated']에 기록한다.
+        """
+        total = 0
+        infos = z.infolist()
+        for i, info in enumerate(infos):
+            if info.is_dir() or is_skipped_path(info.filename):
+                continue
+            if info.file_size > self.max_file_bytes:
+                continue
+            if total + info.file_size > self.max_total_bytes:
+                if dropped is not None:
+                    dropped['truncated'] = sum(
+                        1 for rest in infos[i:]
+                        if not rest.is_dir() and not is_skipped_path(rest.filename)
+                        and rest.file_size <= self.max_file_bytes
+                    )
+                break
+            total += info.file_size
+            yield info
+
+    def scan(self):
+        """대상 파일 수와 제외된 파일 수 집계 (바이너리 여부는 각 파일 앞부분만 읽어 판단)"""
+        self.fileobj.seek(0)
+        dropped = {'truncated': 0}
+        files = []
+        with zipfile.ZipFile(self.fileobj) as z:
+            members = [info for info in z.infolist() if not info.is_dir()]
+            for info in self._candidates(z, dropped):
+                with z.open(info) as f:
+                    if not is_binary(f.read(SNIFF_BYTES)):
+                        files.append(info)
+        return {
+            'members': len(members),
+            'candidates': len(files),
+            'skipped': len(members) - len(files) - dropped['truncated'],
+            'truncated': dropped['truncated'],
+            'bytes': sum(info.file_size for info in files),
+            'sample': [info.filename for info in files[:5]],
+        }
+
+    def __len__(self):
+        return self.stats['candidates']
+
+    def __iter__(self):
+        self.fileobj.seek(0)
+        with zipfile.ZipFile(self.fileobj) as z:
+            for info in self._candidates(z):
+                with z.open(info) as f:
+                    head = f.read(SNIFF_BYTES)
+                    if is_binary(head):
+                        continue
+                    # 헤더의 크기 정보를 믿지 않고 실제로 읽은 양으로 다시 제한
+                    rest = f.read(self.max_file_bytes + 1 - len(head))
+                data = head + rest
+                if len(data) > self.max_file_bytes:
+                    continue
+                yield {'path': info.filename, 'content': data.decode('utf-8', errors='ignore')}
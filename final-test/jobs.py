@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from aoai_client import get_deployment
+from analyzer import analyze_repository
+from incremental import analyze_incremental
+from result_cache import ResultCache
+from ingest import ZipSource
+from blob_uploader import get_container_client, upload_files
+from report import render_report
+
+# 작업 테이블/업로드 보관 위치와 워커 프로세스 수
+JOB_DB = os.getenv("ANALYZE_JOB_DB", "./.cache/jobs.sqlite3")
+UPLOAD_DIR = os.getenv("ANALYZE_UPLOAD_DIR", "./.cache/uploads")
+JOB_WORKERS = int(os.getenv("ANALYZE_JOB_WORKERS", "2"))
+
+STAGES = ['queued', 'upload', 'analyze', 'pdf', 'done']
+# 스트리밍 중인 리포트를 작업 테이블에 반영하는 최소 간격(초)
+PARTIAL_INTERVAL = float(os.getenv("ANALYZE_PARTIAL_INTERVAL", "0.5"))
+
+
+def _connect():
+    if os.path.dirname(JOB_DB):
+        os.makedirs(os.path.dirname(JOB_DB), exist_ok=True)
+    conn = sqlite3.connect(JOB_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        " id TEXT PRIMARY KEY, status TEXT, stage TEXT, zip_name TEXT, incremental INTEGER,"
+        " stage_times TEXT, result TEXT, report TEXT, partial TEXT, pdf BLOB, error TEXT, created REAL, updated REAL)"
+    )
+    return conn
+
+
+def _update(job_id, **fields):
+    fields['updated'] = time.time()
+    columns = ', '.join(f"{name} = ?" for name in fields)
+    with _connect() as conn:
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+
+def get_job(job_id):
+    """작업 상태 조회 (없으면 None)"""
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job['stage_times'] = json.loads(job['stage_times'] or '{}')
+    job['result'] = json.loads(job['result'] or '{}')
+    return job
+
+
+def submit_job(pool, uploaded_zip, zip_name, incremental):
+    """업로드된 zip을 디스크에 저장하고 분석 작업을 등록
+
+    같은 zip/옵션으로 이미 대기·진행·완료된 작업이 있으면 새로 실행하지 않고 그 작업 id를 돌려준다.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    digest = hashlib.sha256(f"{zip_name}\0{int(incremental)}\0".encode('utf-8'))
+    tmp_path = os.path.join(UPLOAD_DIR, f"upload-{os.getpid()}-{time.time_ns()}.tmp")
+    uploaded_zip.seek(0)
+    with open(tmp_path, 'wb') as f:
+        while block := uploaded_zip.read(1024 * 1024):
+            digest.update(block)
+            f.write(block)
+    job_id = digest.hexdigest()[:32]
+
+    with _connect() as conn:
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is not None and row['status'] != 'failed':
+            os.remove(tmp_path)
+            return job_id
+        os.replace(tmp_path, _zip_path(job_id))
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, stage, zip_name, incremental, stage_times, created, updated)"
+            " VALUES (?, 'queued', 'queued', ?, ?, '{}', ?, ?)",
+            (job_id, zip_name, int(incremental), now, now),
+        )
+    pool.submit(run_job, job_id)
+    return job_id
+
+
+def _zip_path(job_id):
+    return os.path.join(UPLOAD_DIR, f"{job_id}.zip")
+
+
+def _configure_openai(deployment):
+    """워커 프로세스의 공유 클라이언트 등록 (한도는 프로세스별이므로 배포 할당량을 워커 수로 나눔)"""
+    get_deployment(
+        deployment,
+        rpm=int(os.getenv("AOAI_RPM_LIMIT", "0")) // JOB_WORKERS,
+        tpm=int(os.getenv("AOAI_TPM_LIMIT", "0")) // JOB_WORKERS,
+    )
+
+
+def run_job(job_id):
+    """워커 프로세스에서 업로드 → 분석 → PDF 단계를 순서대로 실행"""
+    job = get_job(job_id)
+    if job is None or job['status'] not in ('queued', 'running'):
+        return
+    load_dotenv()
+    deployment = os.getenv("DEPLOYMENT_NAME")
+    _configure_openai(deployment)
+    stage_times, result = {}, {}
+
+    def stage(name):
+        _update(job_id, status='running', stage=name, stage_times=json.dumps(stage_times))
+        return time.perf_counter()
+
+    last_write = [0.0]
+
+    def on_token(text):
+        # 토큰마다 DB를 쓰지 않도록 일정 간격으로만 중간 결과 저장
+        now = time.perf_counter()
+        if now - last_write[0] >= PARTIAL_INTERVAL:
+            _update(job_id, partial=text)
+            last_write[0] = now
+
+    try:
+        with open(_zip_path(job_id), 'rb') as zip_file:
+            source = ZipSource(zip_file)
+            result['files'] = len(source)
+            result['truncated'] = source.stats['truncated']
+
+            start = stage('upload')
+            container_client = get_container_client(job['zip_name'])
+            if container_client is not None:
+                result['upload'] = upload_files(container_client, source)
+            stage_times['upload'] = time.perf_counter() - start
+
+            start = stage('analyze')
+            cache = ResultCache()
+            if job['incremental']:
+                repo_name = os.path.splitext(os.path.basename(job['zip_name']))[0]
+                report, stats, result['changes'] = analyze_incremental(
+                    source, repo_name, deployment, cache=cache, on_token=on_token)
+            else:
+                report, stats = analyze_repository(source, deployment, cache=cache, on_token=on_token)
+            result['stats'] = stats.rows()
+            result['cache'] = {'hits': cache.hits, 'misses': cache.misses}
+            stage_times['analyze'] = time.perf_counter() - start
+
+        start = stage('pdf')
+        pdf = render_report(report)
+        stage_times['pdf'] = time.perf_counter() - start
+
+        _update(job_id, status='done', stage='done', stage_times=json.dumps(stage_times),
+                result=json.dumps(result, ensure_ascii=False), report=report, partial=None, pdf=pdf)
+        os.remove(_zip_path(job_id))
+    except Exception as e:
+        traceback.print_exc()
+        _update(job_id, status='failed', stage_times=json.dumps(stage_times), error=str(e))
+
+
+def _cleanup_uploads():
+    """저장 도중 중단되어 남은 임시 업로드 파일 정리"""
+    if os.path.isdir(UPLOAD_DIR):
+        for name in os.listdir(UPLOAD_DIR):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(UPLOAD_DIR, name))
+
+
+def start_pool():
+    """워커 프로세스 풀을 만들고, 서버 재시작으로 중단된 작업을 다시 등록"""
+    pool = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+    _cleanup_uploads()
+    with _connect() as conn:
+        pending = [row['id'] for row in conn.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running')")]
+    for job_id in pending:
+        if os.path.exists(_zip_path(job_id)):
+            pool.submit(run_job, job_id)
+        else:
+            _update(job_id, status='failed', error='업로드 파일이 없습니다.')
+    return pool
@@ -1,22 +1,18 @@
 import os
 import glob
-import openai
+import time
 from dotenv import load_dotenv
 import streamlit as st
-from fpdf import FPDF
-import tempfile
-import traceback
-from azure.storage.blob import BlobServiceClient
-import zipfile
-import io
 
-# 환경변수 로드
+# 환경변수 로드 (아래 모듈들이 import 시점에 설정값을 읽음)
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-openai.azure_endpoint = os.getenv("AZURE_ENDPOINT")
-openai.api_type = os.getenv("OPENAI_API_TYPE")
-openai.api_version = os.getenv("OPENAI_API_VERSION")
-DEPLOYMENT_NAME = os.getenv("DEPLOYMENT_NAME")
+from ingest import ZipSource, MAX_TOTAL_BYTES
+from jobs import STAGES, get_job, submit_job, start_pool
+
+@st.cache_resource
+def get_job_pool():
+    """서버 프로세스 단위로 공유하는 분석 작업 워커 풀"""
+    return start_pool()
 
 def read_source_files(folder_path, exts=['.py', '.java', '.js', '.ts', '.cpp', '.c']):
     """지정된 폴더의 소스코드 파일 목록과 내용을 반환"""
@@ -31,68 +27,62 @@ def read_source_files(folder_path, exts=['.py', '.java', '.js', '.ts', '.cpp', '
                 continue
     return code_data
 
-def ai_analyze_source(files):
-    """AI를 통해 소스코드 요약/분석"""
-    if not files:
-        return "소스코드 파일을 찾을 수 없습니다."
+@st.fragment(run_every="1s")
+def show_job_progress(job_id):
+    """작업 진행 상황을 주기적으로 조회하고, 끝나면 전체 화면을 다시 그림"""
+    job = get_job(job_id)
+    if job is None or job['status'] in ('done', 'failed'):
+        st.rerun()
+    labels = {'queued': "대기 중", 'upload': "Blob Storage에 파일 업로드 중",
+              'analyze': "AI가 소스코드를 분석 중", 'pdf': "PDF로 저장 중"}
+    st.progress(STAGES.index(job['stage']) / (len(STAGES) - 1), text=f"{labels[job['stage']]}...")
+    st.caption(f"경과 시간 {time.time() - job['created']:.0f}초")
+    if job['partial']:
+        # 최종 리포트가 생성되는 동안 지금까지 받은 토큰을 보여준다
+        st.markdown(job['partial'])
 
-    # 간단 예시: 파일명만 전달 (실제 분석은 파일 내용을 요약/분석)
-    prompt = "아래 소스코드 파일들을 전체적으로 분석해주고, 비즈니스 로직, 주요 특징/구성/주요 함수 및 전반적인 구조와 개선점을 요약해줘. 그리고 시퀀스 다이어그램도 그려줘\n\n"
-    for file in files:
-        prompt += f"### 파일: {os.path.basename(file['path'])}\n"
-        prompt += f"{file['content'][:1000]}\n\n"  # 토큰 과다 방지, 각 파일별 최대 1000자
-    prompt += "\n최대한 구조적으로, 한글로 정리해줘."
+def show_job_result(job):
+    """완료된 작업의 업로드/분석 결과와 PDF 다운로드 표시"""
+    if job['status'] == 'failed':
+        st.error(f"분석 중 오류: {job['error']}")
+        return
 
-    try:
-        response = openai.chat.completions.create(
-            model=DEPLOYMENT_NAME,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "당신은 훌륭한 소스코드 분석가입니다."},
-                {"role": "user", "content": prompt}
-            ],
+    result = job['result']
+    if 'upload' in result:
+        st.success(
+            f"소스코드가 Blob Storage에 저장되었습니다. "
+            f"(업로드 {result['upload']['uploaded']}개, 변경 없음 {result['upload']['skipped']}개)"
         )
-        st.success("분석 완료!")
-        return response.choices[0].message.content
-    except Exception as e:
-        traceback.print_exc()
-        return f"분석 중 오류: {e}"
-
-def make_pdf(report, filename="분석_리포트.pdf"):
-    """텍스트를 PDF로 저장"""
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.add_font('NanumGothic-Regular', '', './fonts/NanumGothic-Regular.ttf', uni=True)
-    pdf.set_font('NanumGothic-Regular', '', 12)
-    for line in report.split('\n'):
-        pdf.multi_cell(0, 10, txt=line)
-    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    pdf.output(tmp_file.name)
-    return tmp_file.name
-
-def upload_files_to_blob_by_folder(files, zip_name=None):
-    connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-    if not connection_string:
-        st.warning("Azure Blob Storage 연결 정보가 없습니다.")
-        return
-    # zip 파일명(확장자 제외)으로 컨테이너명 생성
-    if zip_name:
-        container_name = os.path.splitext(os.path.basename(zip_name))[0].lower().replace('.', '-').replace('_', '-')
-    elif files and 'path' in files[-1]:
-        container_name = os.path.splitext(os.path.basename(files[-1]['path']))[0].lower()
+        if result['upload']['failed']:
+            failed = result['upload']['failed']
+            st.warning(f"업로드 실패 {len(failed)}개: {failed[:5]}")
     else:
-        container_name = "uploaded-files"
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    try:
-        blob_service_client.create_container(container_name)
-    except Exception:
-        pass  # 이미 있으면 무시
-    container_client = blob_service_client.get_container_client(container_name)
-    for file in files:
-        blob_name = file['path']
-        container_client.upload_blob(blob_name, file['content'], overwrite=True)
-    st.success(f"소스코드가 '{container_name}' 컨테이너에 저장되었습니다.")
-
+        st.warning("Azure Blob Storage 연결 정보가 없어 업로드를 건너뛰었습니다.")
+    if 'changes' in result:
+        changes = result['changes']
+        st.write(
+            f"변경 파일 {changes['changed']}개, 영향받은 참조 파일 {changes['importers']}개, "
+            f"삭제 파일 {changes['removed']}개, 재사용 {changes['reused']}개"
+        )
+    if result.get('truncated'):
+        st.warning(f"전체 크기 제한으로 {result['truncated']}개 파일은 분석하지 않았습니다.")
+    st.success("분석 완료!")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("캐시 히트", result['cache']['hits'])
+    col2.metric("캐시 미스", result['cache']['misses'])
+    streamed = next((row for row in result['stats'] if 'ttft' in row), None)
+    if streamed:
+        col3.metric("첫 토큰까지(TTFT)", f"{streamed['ttft']:.2f}초", help=f"{streamed['tokens_per_sec']} tokens/s")
+    st.write("단계별 처리 시간 및 토큰 사용량:")
+    st.table(result['stats'])
+    st.download_button(
+        label="PDF 리포트 다운로드",
+        data=job['pdf'],
+        file_name="분석_리포트.pdf",
+        mime="application/pdf"
+    )
+    st.write("분석 결과:")
+    st.text_area("AI 분석 요약", job['report'], height=400)
 
 def main():
     st.title("소스코드 분석 PDF 리포트 생성기")
@@ -103,32 +93,27 @@ def main():
     zip_name = None
     if uploaded_zip is not None:
         zip_name = uploaded_zip.name
-        with zipfile.ZipFile(io.BytesIO(uploaded_zip.read())) as z:
-            for file_info in z.infolist():
-                if not file_info.is_dir():
-                    with z.open(file_info) as f:
-                        content = f.read().decode('utf-8', errors='ignore')
-                        files.append({'path': file_info.filename, 'content': content})
-        st.write(f"총 {len(files)}개의 파일을 업로드했습니다.")
-        st.write("파일 목록 예시:", [f['path'] for f in files[:5]])
+        # 업로드 파일을 그대로 zip으로 열고, 멤버는 업로드/분석 단계에서 필요할 때 하나씩 읽는다
+        files = ZipSource(uploaded_zip)
+        st.write(f"총 {len(files)}개의 파일을 업로드했습니다. (제외된 파일 {files.stats['skipped']}개)")
+        if files.stats['truncated']:
+            st.warning(f"전체 크기 제한({MAX_TOTAL_BYTES // (1024 * 1024)}MB)을 넘어 {files.stats['truncated']}개 파일은 분석에서 제외됩니다.")
+        st.write("파일 목록 예시:", files.stats['sample'])
+
+    incremental = st.checkbox("증분 분석 (이전 분석 이후 변경된 파일과 이를 참조하는 파일만 다시 분석)", value=False)
 
     if files and st.button("Blob Storage에 업로드하고 AI로 분석"):
-        # zip 파일명으로 컨테이너 생성
-        with st.spinner("Blob Storage에 파일 업로드 중..."):
-            upload_files_to_blob_by_folder(files, zip_name)
-        with st.spinner("AI가 소스코드를 분석 중입니다..."):
-            report = ai_analyze_source(files)
-        with st.spinner("PDF로 저장 중..."):
-            pdf_path = make_pdf(report)
-        with open(pdf_path, "rb") as pdf_file:
-            st.download_button(
-                label="PDF 리포트 다운로드",
-                data=pdf_file,
-                file_name="분석_리포트.pdf",
-                mime="application/pdf"
-            )
-        st.write("분석 결과:")
-        st.text_area("AI 분석 요약", report, height=400)
+        # 업로드/분석/PDF 생성은 워커 프로세스에서 실행하고, 화면은 작업 상태만 조회한다
+        st.session_state.job_id = submit_job(get_job_pool(), uploaded_zip, zip_name, incremental)
+
+    if 'job_id' in st.session_state:
+        job = get_job(st.session_state.job_id)
+        if job is None:
+            st.warning("작업을 찾을 수 없습니다.")
+        elif job['status'] in ('done', 'failed'):
+            show_job_result(job)
+        else:
+            show_job_progress(job['id'])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import functools
+from fpdf import FPDF
+
+FONT_FAMILY = 'NanumGothic-Regular'
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts', 'NanumGothic-Regular.ttf')
+
+# 본문/코드/표 글자 크기와 줄 높이 (mm)
+BODY_SIZE, BODY_H = 11, 6
+CODE_SIZE, CODE_H = 9, 4.5
+TABLE_SIZE, TABLE_H = 9, 5
+HEADING_SIZES = {1: 18, 2: 16, 3: 14, 4: 12, 5: 11, 6: 11}
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*)$')
+TABLE_SEP_RE = re.compile(r'^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+BULLET_RE = re.compile(r'^(\s*)[-*+]\s+')
+INLINE_RE = re.compile(r'\*\*(.+?)\*\*|__(.+?)__|`([^`]+)`')
+
+
+class _CharSubset(list):
+    """fpdf가 사용 글자 목록(subset)에 `in` 검사를 반복하므로 집합으로 멤버십을 O(1)로 처리"""
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self._members = set(self)
+
+    def __contains__(self, item):
+        return item in self._members
+
+    def append(self, item):
+        self._members.add(item)
+        super().append(item)
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._members = set(self)
+
+
+@functools.lru_cache(maxsize=None)
+def _font_entries():
+    """한글 폰트 메트릭(.pkl 캐시)을 프로세스당 한 번만 읽어 둔다"""
+    pdf = FPDF()
+    pdf.add_font(FONT_FAMILY, '', FONT_PATH, uni=True)
+    key = FONT_FAMILY.lower()
+    font = pdf.fonts[key]
+    # .pkl에는 상대경로가 저장되어 있어 실행 위치와 무관하게 절대경로로 바꿔 둔다
+    font['ttffile'] = FONT_PATH
+    return key, font, pdf.font_files
+
+
+class ReportPDF(FPDF):
+    """캐시된 폰트 정보를 재사용하는 마크다운 리포트용 PDF"""
+
+    def __init__(self):
+        super().__init__()
+        key, font, font_files = _font_entries()
+        # subset은 문서마다 사용한 글자로 채워지므로 새 리스트로 복사 (cw 등 메트릭은 공유)
+        self.fonts[key] = dict(font, i=len(self.fonts) + 1, subset=_CharSubset(range(0, 57)))
+        self.font_files.update({name: dict(info) for name, info in font_files.items()})
+        self.set_auto_page_break(True, margin=15)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font(FONT_FAMILY, '', 8)
+        self.cell(0, 5, str(self.page_no()), align='C')
+
+
+def _plain(text):
+    """굵게/인라인 코드 같은 마크다운 인라인 표기를 제거"""
+    return INLINE_RE.sub(lambda m: next(g for g in m.groups() if g is not None), text)
+
+
+def _wrap(pdf, text, width):
+    """글자 단위로 폭에 맞게 줄바꿈 (표 셀 높이 계산용)"""
+    lines, line = [], ''
+    for ch in text:
+        if line and pdf.get_string_width(line + ch) > width:
+            lines.append(line)
+            line = ch
+        else:
+            line += ch
+    lines.append(line)
+    return lines
+
+
+def _table(pdf, rows):
+    ncols = max(len(row) for row in rows)
+    width = (pdf.w - pdf.l_margin - pdf.r_margin) / ncols
+    pdf.set_font(FONT_FAMILY, '', TABLE_SIZE)
+    for row_no, row in enumerate(rows):
+        cells = row + [''] * (ncols - len(row))
+        wrapped = [_wrap(pdf, cell, width - 2) for cell in cells]
+        height = max(len(lines) for lines in wrapped) * TABLE_H
+        if pdf.get_y() + height > pdf.page_break_trigger:
+            pdf.add_page()
+        x, y = pdf.l_margin, pdf.get_y()
+        for col, lines in enumerate(wrapped):
+            if row_no == 0:
+                pdf.set_fill_color(230, 230, 230)
+                pdf.rect(x + col * width, y, width, height, 'DF')
+            else:
+                pdf.rect(x + col * width, y, width, height)
+            pdf.set_xy(x + col * width, y)
+            pdf.multi_cell(width, TABLE_H, '\n'.join(lines))
+        pdf.set_xy(x, y + height)
+    pdf.ln(2)
+
+
+def render_markdown(pdf, text):
+    """마크다운 제목/코드 블록/표/목록을 PDF에 렌더링
+
+    연속된 본문 줄은 한 번의 multi_cell로 묶어 호출 수를 줄인다.
+    """
+    paragraph, code, table = [], None, []
+
+    def flush_paragraph():
+        if paragraph:
+            pdf.set_font(FONT_FAMILY, '', BODY_SIZE)
+            pdf.multi_cell(0, BODY_H, '\n'.join(paragraph))
+            paragraph.clear()
+
+    def flush_table():
+        if table:
+            _table(pdf, table)
+            table.clear()
+
+    for line in text.split('\n'):
+        stripped = line.strip()
+
+        # 코드 블록
+        if stripped.startswith('```'):
+            if code is None:
+                flush_paragraph()
+                flush_table()
+                code = []
+            else:
+                pdf.set_font(FONT_FAMILY, '', CODE_SIZE)
+                pdf.set_fill_color(245, 245, 245)
+                pdf.multi_cell(0, CODE_H, '\n'.join(code) or ' ', fill=True)
+                pdf.ln(2)
+                code = None
+            continue
+        if code is not None:
+            code.append(line.replace('\t', '    '))
+            continue
+
+        # 표
+        if stripped.startswith('|'):
+            flush_paragraph()
+            if not TABLE_SEP_RE.match(stripped):
+                table.append([_plain(cell.strip()) for cell in stripped.strip('|').split('|')])
+            continue
+        flush_table()
+
+        heading = HEADING_RE.match(stripped)
+        if heading:
+            flush_paragraph()
+            pdf.ln(2)
+            pdf.set_font(FONT_FAMILY, '', HEADING_SIZES[len(heading.group(1))])
+            pdf.multi_cell(0, HEADING_SIZES[len(heading.group(1))] * 0.5, _plain(heading.group(2)))
+            pdf.ln(1)
+        elif stripped in ('---', '***', '___'):
+            flush_paragraph()
+            y = pdf.get_y() + 2
+            pdf.line(pdf.l_margin, y, pdf.w - pdf.r_margin, y)
+            pdf.ln(4)
+        else:
+            bullet = BULLET_RE.match(line)
+            if bullet:
+                line = ' ' * len(bullet.group(1)) + '• ' + line[bullet.end():]
+            paragraph.append(_plain(line))
+
+    if code is not None:
+        pdf.set_font(FONT_FAMILY, '', CODE_SIZE)
+        pdf.multi_cell(0, CODE_H, '\n'.join(code) or ' ', fill=True)
+    flush_paragraph()
+    flush_table()
+
+
+def render_report(report):
+    """마크다운 리포트를 PDF로 렌더링해 bytes로 반환 (임시 파일을 만들지 않음)"""
+    pdf = ReportPDF()
+    pdf.add_page()
+    render_markdown(pdf, report)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+if __name__ == "__main__":
+    # 벤치마크: result.md를 반복해 200쪽 이상 리포트를 만들고 초당 페이지 수 측정
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result.md'), encoding='utf-8') as f:
+        sample = f.read()
+    report, pages = sample, 0
+    while pages < 200:
+        report += '\n\n' + report
+        pdf = ReportPDF()
+        pdf.add_page()
+        render_markdown(pdf, report)
+        pages = pdf.page_no()
+
+    start = time.perf_counter()
+    data = render_report(report)
+    elapsed = time.perf_counter() - start
+    print(f"report.py: {pages} pages, {len(data) / 1024:.0f} KB, {elapsed:.2f}s, {pages / elapsed:.1f} pages/s")
+
+    # 기존 방식(문서마다 add_font, 줄마다 multi_cell)과 비교
+    start = time.perf_counter()
+    legacy = FPDF()
+    legacy.add_page()
+    legacy.add_font(FONT_FAMILY, '', FONT_PATH, uni=True)
+    legacy.set_font(FONT_FAMILY, '', 12)
+    for line in report.split('\n'):
+        legacy.multi_cell(0, 10, txt=line)
+    legacy.output(dest='S')
+    elapsed = time.perf_counter() - start
+    print(f"legacy:    {legacy.page_no()} pages, {elapsed:.2f}s, {legacy.page_no() / elapsed:.1f} pages/s")
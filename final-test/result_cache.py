@@ -0,0 +1,83 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+# 캐시 파일 위치와 최대 크기 (기본 200MB)
+CACHE_PATH = os.getenv("ANALYZE_CACHE_PATH", "./.cache/analysis.sqlite3")
+CACHE_MAX_BYTES = int(os.getenv("ANALYZE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+
+def content_hash(*parts):
+    """내용(및 프롬프트/모델 버전)으로 SHA-256 키 생성"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class ResultCache:
+    """SQLite 기반 분석 결과 캐시 (LRU + 크기 제한 eviction)"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, kind TEXT, value TEXT, size INTEGER, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON results(accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """캐시 조회, 없으면 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, kind, value):
+        """결과 저장 후 최대 크기를 넘으면 오래 사용하지 않은 항목부터 삭제"""
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, kind, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, value, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM results ORDER BY accessed LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self):
+        """히트/미스 카운터와 저장된 항목 수"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
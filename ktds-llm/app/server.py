@@ -1,29 +1,240 @@
-
-# app/server.py
-from fastapi import FastAPI
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
-
-# 환경변수 로드
-load_dotenv()
-
-from langserve import add_routes
-
-# FastAPI 서버를 설정
-app = FastAPI(
-    title="LangChain Server",
-    version="1.0",
-    description="Spin up a simple api server using Langchain's Runnable interfaces",
-)
-
-# 라우팅 설정
-add_routes(
-    app,
-    ChatOpenAI(model="gpt-4.1-mini"),
-    path="/openai",   # OpenAI 모델에 대한 경로
-)
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="localhost", port=8000)
-    
\ No newline at end of file
+
+# app/server.py
+import os
+import sys
+import time
+import asyncio
+import threading
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langchain_openai import ChatOpenAI
+from dotenv import load_dotenv
+
+# 환경변수 로드
+load_dotenv()
+
+# 프로젝트 루트의 모듈(검색기/캐시 등)을 가져오기 위해 경로 추가 (python app/server.py 로 실행하는 경우)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from langserve import add_routes
+from llm_cache import LRUSQLiteCache
+from server_metrics import Metrics, TokenUsageCallback
+
+# 서버 설정
+# 워커마다 Chroma/BM25 인덱스를 따로 메모리에 올리므로 기본은 1개
+# (임베딩/LLM 캐시는 SQLite라 여러 워커가 같은 경로를 써도 안전)
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./.cache/llm_cache.sqlite3")  # 빈 값이면 메모리 전용
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "10000"))            # SQLite에 남길 최대 응답 수
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))            # 응답 유지 시간(초), 0이면 무제한
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+# 지표와 RAG 체인 전용 LLM 응답 캐시 (같은 프롬프트/모델 설정이면 LLM을 다시 호출하지 않음)
+# 전역(set_llm_cache)으로 걸면 /openai 패스스루 요청까지 캐시되므로 RAG의 ChatOpenAI에만 연결한다
+metrics = Metrics()
+# 상대 경로는 실행 위치(cwd)가 아니라 프로젝트 루트 기준으로 해석 (워커가 chdir 전에 import해도 같은 파일)
+llm_cache = LRUSQLiteCache(
+    max_entries=LLM_CACHE_SIZE,
+    path=os.path.join(PROJECT_ROOT, LLM_CACHE_PATH) if LLM_CACHE_PATH else None,
+    max_rows=LLM_CACHE_MAX_ROWS,
+    ttl=LLM_CACHE_TTL,
+)
+metrics.counter("llm_cache_hits_total", "RAG LLM response cache hits", lambda: llm_cache.hits)
+metrics.counter("llm_cache_misses_total", "RAG LLM response cache misses", lambda: llm_cache.misses)
+token_callback = TokenUsageCallback(metrics)
+
+# 라우트에 매칭되지 않은 요청(404 등)은 경로 대신 이 값으로 집계해 라벨 수가 늘어나지 않게 한다
+UNMATCHED_ROUTE = "unmatched"
+
+RAG_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """주어진 컨텍스트를 기반으로 질문에 답변하시오.
+
+[지침]
+- 컨텍스트에 있는 정보만을 사용하여 답변할 것
+- 컨텍스트에서 답을 찾을 수 없는 경우 "주어진 정보만으로는 답변하기 어렵습니다."라고 응답할 것
+- 답변은 한국어를 사용할 것
+
+[컨텍스트]
+{context}"""),
+    ("human", "{question}"),
+])
+
+
+class RAGService:
+    """근로기준법 RAG 체인 (워커 프로세스마다 첫 요청 시 한 번만 생성)
+
+    여러 질문을 한 번에 처리할 때 질문 임베딩을 한 번의 요청으로 묶고, LLM 호출은 동시에 실행한다.
+    """
+
+    def __init__(self):
+        from langchain_openai import OpenAIEmbeddings
+        from langchain_chroma import Chroma
+        from embedding_cache import CachedEmbeddings
+        from hybrid_retriever import reciprocal_rank_fusion
+        from vector_index import InMemoryVectorIndex
+        from context_packer import ContextPacker
+
+        self._fuse = reciprocal_rank_fusion
+        self.embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"))
+        chroma_db = Chroma(
+            collection_name="labor_law",
+            embedding_function=self.embeddings,
+            persist_directory="./chroma_db",
+        )
+        # chroma.sqlite3가 바뀌면 벡터 행렬과 BM25 색인을 같은 스냅샷으로 함께 재로드
+        self.index = InMemoryVectorIndex(chroma_db, with_bm25=True)
+        self.bm25 = self.index.bm25
+        self.packer = ContextPacker(max_tokens=2000)
+        self.llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0, cache=llm_cache, callbacks=[token_callback])
+
+    def _prompts(self, questions):
+        vectors = self.embeddings.embed_documents(questions)
+        prompts = []
+        for question, vector in zip(questions, vectors):
+            vector_docs = self.index.max_marginal_relevance_search_by_vector(vector, k=5, fetch_k=10, lambda_mult=0.3)
+            bm25_docs = [doc for doc, _ in self.bm25.search(question, 10)]
+            docs = self._fuse([vector_docs, bm25_docs], 5)
+            prompts.append(RAG_PROMPT.format_messages(context=self.packer.pack(docs, question), question=question))
+        return prompts
+
+    def batch(self, questions):
+        results = self.llm.batch(self._prompts(questions), config={'max_concurrency': LLM_CONCURRENCY})
+        return [result.content for result in results]
+
+    async def abatch(self, questions):
+        prompts = await asyncio.to_thread(self._prompts, questions)
+        results = await self.llm.abatch(prompts, config={'max_concurrency': LLM_CONCURRENCY})
+        return [result.content for result in results]
+
+
+_rag_service = None
+_rag_service_lock = threading.Lock()
+
+
+def get_rag_service():
+    """워커 프로세스의 RAGService (동시에 첫 요청이 와도 한 번만 생성)"""
+    global _rag_service
+    if _rag_service is None:
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService()
+    return _rag_service
+
+
+class MicroBatcher:
+    """동시에 들어온 요청을 max_wait초 동안(또는 max_size개까지) 모아 한 번의 배치 호출로 처리"""
+
+    def __init__(self, run_batch, max_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT_MS / 1000):
+        self.run_batch = run_batch
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            asyncio.ensure_future(self._run(pending))
+
+    async def _run(self, pending):
+        try:
+            results = await self.run_batch([item for item, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class RAGInput(BaseModel):
+    question: str
+
+
+def _question(inputs):
+    if isinstance(inputs, str):
+        return inputs
+    if isinstance(inputs, dict):
+        return inputs['question']
+    return inputs.question
+
+
+rag_batcher = MicroBatcher(lambda questions: get_rag_service().abatch(questions))
+
+
+async def _rag_ainvoke(inputs):
+    return await rag_batcher.submit(_question(inputs))
+
+
+def _rag_invoke(inputs):
+    return get_rag_service().batch([_question(inputs)])[0]
+
+
+# /rag/batch 요청은 항목별 ainvoke로 나뉜 뒤 MicroBatcher에서 다시 묶여 처리됨 (동시 /rag/invoke 요청도 함께 묶임)
+rag_chain = RunnableLambda(_rag_invoke, afunc=_rag_ainvoke).with_types(input_type=RAGInput, output_type=str)
+
+# FastAPI 서버를 설정
+app = FastAPI(
+    title="LangChain Server",
+    version="1.0",
+    description="Spin up a simple api server using Langchain's Runnable interfaces",
+)
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        metrics.observe(getattr(route, 'path', UNMATCHED_ROUTE), request.method, status,
+                        time.perf_counter() - start)
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# 라우팅 설정
+add_routes(
+    app,
+    ChatOpenAI(model="gpt-4.1-mini", callbacks=[token_callback]),
+    path="/openai",   # OpenAI 모델에 대한 경로
+)
+add_routes(
+    app,
+    rag_chain,
+    path="/rag",      # 근로기준법 RAG 체인 경로
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    # 워커 프로세스마다 앱을 import 하므로 모듈 경로 문자열로 실행 (Chroma는 워커별 첫 요청 시 로드)
+    os.chdir(PROJECT_ROOT)
+    uvicorn.run("app.server:app", host="localhost", port=8000, workers=SERVER_WORKERS)
@@ -0,0 +1,90 @@
+"""검색기 recall@k / 지연시간 벤치마크
+
+사용법:
+    uv run python bench_retrieval.py --collection db_korean_cosine --k 5
+
+ragas_testset.csv의 reference_contexts가 검색 결과에 포함되는 비율(recall@k)과
+질의당 지연시간(p50/p95)을 벡터 / BM25 / 하이브리드 검색기별로 비교한다.
+"""
+import ast
+import csv
+import time
+import argparse
+import statistics
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from langchain_chroma import Chroma
+from embedding_cache import CachedEmbeddings
+from hybrid_retriever import BM25Index, HybridRetriever, tokenize
+
+
+def _normalize(text):
+    return ' '.join(text.split())
+
+
+def is_match(reference, content):
+    """참조 컨텍스트가 검색된 문서에 포함(또는 대부분 겹침)되는지 판단"""
+    reference, content = _normalize(reference), _normalize(content)
+    if reference in content or content in reference:
+        return True
+    ref_tokens = set(tokenize(reference))
+    return bool(ref_tokens) and len(ref_tokens & set(tokenize(content))) / len(ref_tokens) >= 0.6
+
+
+def evaluate(retriever, questions, references, repeat):
+    recalls, latencies = [], []
+    for question, refs in zip(questions, references):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            docs = retriever(question)
+            latencies.append(time.perf_counter() - start)
+        found = sum(any(is_match(ref, doc.page_content) for doc in docs) for ref in refs)
+        recalls.append(found / len(refs))
+    latencies.sort()
+    return {
+        'recall@k': round(statistics.mean(recalls), 3),
+        'p50_ms': round(1000 * latencies[len(latencies) // 2], 1),
+        'p95_ms': round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="retrieval recall@k / latency benchmark")
+    parser.add_argument("--collection", default="db_korean_cosine")
+    parser.add_argument("--testset", default="./data/ragas_testset.csv")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    load_dotenv()
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"))
+    chroma_db = Chroma(
+        collection_name=args.collection,
+        embedding_function=embeddings,
+        persist_directory="./chroma_db",
+    )
+    with open(args.testset, encoding='utf-8') as f:
+        testset = list(csv.DictReader(f))
+    questions = [row['user_input'] for row in testset]
+    references = [ast.literal_eval(row['reference_contexts']) for row in testset]
+
+    vector_retriever = chroma_db.as_retriever(search_kwargs={'k': args.k})
+    bm25 = BM25Index.from_chroma(chroma_db)
+    hybrid = HybridRetriever(vector_retriever=vector_retriever, bm25=bm25, k=args.k, bm25_k=args.k * 2)
+
+    # 질의 임베딩을 미리 캐시해 두어 모든 검색기가 같은 조건(검색 자체의 지연시간)으로 비교되게 한다
+    for question in questions:
+        embeddings.embed_query(question)
+
+    retrievers = {
+        'vector': vector_retriever.invoke,
+        'bm25': lambda q: [doc for doc, _ in bm25.search(q, args.k)],
+        'hybrid': hybrid.invoke,
+    }
+    print(f"collection={args.collection} docs={len(bm25.documents)} queries={len(questions)} k={args.k}")
+    for name, retriever in retrievers.items():
+        print(f"{name:8s}", evaluate(retriever, questions, references, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""MMR 검색 지연시간 벤치마크: chroma_db.as_retriever vs InMemoryMMRRetriever
+
+사용법:
+    uv run python bench_vector_index.py --collection labor_law --repeat 50
+
+질의 임베딩은 미리 캐시해 두고 검색 자체의 p50/p99 지연시간과 두 검색기 결과의 일치율을 출력한다.
+"""
+import csv
+import time
+import argparse
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from langchain_chroma import Chroma
+from embedding_cache import CachedEmbeddings
+from vector_index import InMemoryVectorIndex, InMemoryMMRRetriever
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def measure(retriever, questions, repeat):
+    latencies, results = [], {}
+    for _ in range(repeat):
+        for question in questions:
+            start = time.perf_counter()
+            docs = retriever.invoke(question)
+            latencies.append(time.perf_counter() - start)
+            results[question] = [doc.page_content for doc in docs]
+    latencies.sort()
+    return {
+        'p50_ms': round(1000 * percentile(latencies, 0.50), 2),
+        'p99_ms': round(1000 * percentile(latencies, 0.99), 2),
+    }, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MMR retriever latency benchmark")
+    parser.add_argument("--collection", default="labor_law")
+    parser.add_argument("--testset", default="./data/ragas_testset.csv")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=10)
+    parser.add_argument("--lambda-mult", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"))
+    chroma_db = Chroma(
+        collection_name=args.collection,
+        embedding_function=embeddings,
+        persist_directory="./chroma_db",
+    )
+    with open(args.testset, encoding='utf-8') as f:
+        questions = [row['user_input'] for row in csv.DictReader(f)]
+    for question in questions:
+        embeddings.embed_query(question)
+
+    search_kwargs = {'k': args.k, 'fetch_k': args.fetch_k, 'lambda_mult': args.lambda_mult}
+    start = time.perf_counter()
+    index = InMemoryVectorIndex(chroma_db)
+    load_ms = 1000 * (time.perf_counter() - start)
+    retrievers = {
+        'chroma': chroma_db.as_retriever(search_type='mmr', search_kwargs=search_kwargs),
+        'inprocess': InMemoryMMRRetriever(index=index, embeddings=embeddings, **search_kwargs),
+    }
+    print(f"collection={args.collection} docs={len(index)} queries={len(questions)} "
+          f"repeat={args.repeat} index_load_ms={load_ms:.1f}")
+    if not len(index):
+        print("컬렉션이 비어 있습니다. --collection으로 문서가 있는 컬렉션을 지정하세요.")
+        return
+
+    outputs = {}
+    for name, retriever in retrievers.items():
+        numbers, outputs[name] = measure(retriever, questions, args.repeat)
+        print(f"{name:10s}", numbers)
+    # 같은 문서를 고르는지 확인 (HNSW 근사 탐색/동점 처리 차이로 일부 다를 수 있음)
+    overlap = [
+        len(set(outputs['chroma'][q]) & set(outputs['inprocess'][q])) / max(1, len(outputs['chroma'][q]))
+        for q in questions
+    ]
+    print(f"result overlap: {sum(overlap) / len(overlap):.3f}")
+
+
+if __name__ == "__main__":
+    main()
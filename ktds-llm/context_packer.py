@@ -0,0 +1,123 @@
+import re
+import threading
+import numpy as np
+from chat_history import _truncate, count_tokens
+from hybrid_retriever import tokenize
+
+# 문장 경계: 마침표/물음표/느낌표 뒤 공백, 또는 줄바꿈
+SENTENCE_RE = re.compile(r'(?<=[.?!。])\s+|\n+')
+
+_PRIME = (1 << 61) - 1
+
+
+class ContextPacker:
+    """검색된 문서를 토큰 예산 안의 컨텍스트 문자열로 묶는 도구
+
+    - 문자 n-gram shingle의 MinHash로 거의 같은 문서(유사도 dup_threshold 이상)를 제거
+    - 검색 순위(관련도) 순으로 max_tokens가 찰 때까지 채움
+    - compress=True면 문서마다 질의와 겹치는 문장 위주로 max_passage_tokens까지만 남김 (원래 순서 유지)
+    - 이미 넣은 문장은 다시 넣지 않음 (chunk overlap으로 겹친 부분 제거)
+    """
+
+    def __init__(self, max_tokens=2000, max_passage_tokens=400, dup_threshold=0.8,
+                 shingle_size=5, num_perm=64, compress=True, seed=42):
+        self.max_tokens = max_tokens
+        self.max_passage_tokens = max_passage_tokens
+        self.dup_threshold = dup_threshold
+        self.shingle_size = shingle_size
+        self.compress = compress
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.duplicates = 0
+
+    def _signature(self, text):
+        """문자 shingle 집합의 MinHash 서명"""
+        text = ' '.join(text.split())
+        n = self.shingle_size
+        shingles = {hash(text[i:i + n]) & 0xFFFFFFFF for i in range(max(1, len(text) - n + 1))}
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p 를 모든 순열/shingle에 대해 한 번에 계산 (x < 2^32, a < 2^29 이므로 overflow 없음)
+        hashed = (np.outer(values, self._a) + self._b) % _PRIME
+        return hashed.min(axis=0)
+
+    def _compress(self, text, query_tokens, seen):
+        """질의와 겹치는 문장 위주로 예산까지 남기고, 이미 사용한 문장은 제외"""
+        unique = {}
+        for sentence in SENTENCE_RE.split(text):
+            key = ' '.join(sentence.split())
+            if key and key not in seen:
+                unique.setdefault(key, sentence.strip())
+        sentences = list(unique.values())
+        if not self.compress or count_tokens(' '.join(sentences)) <= self.max_passage_tokens:
+            return sentences
+        scores = [len(query_tokens & set(tokenize(s))) for s in sentences]
+        order = sorted(range(len(sentences)), key=lambda i: (-scores[i], i))
+        keep, used = {}, 0
+        for i in order:
+            sentence = sentences[i]
+            tokens = count_tokens(sentence)
+            if tokens > self.max_passage_tokens:
+                # 한 문장이 예산보다 길면 버리지 않고 앞부분만 사용
+                sentence = _truncate(sentence, self.max_passage_tokens - used)
+                tokens = count_tokens(sentence)
+            if not sentence or used + tokens > self.max_passage_tokens:
+                continue
+            keep[i] = sentence
+            used += tokens
+        return [keep[i] for i in sorted(keep)]
+
+    def pack(self, docs, query=''):
+        """관련도 순 문서 목록을 중복 제거/압축해 max_tokens 이하의 컨텍스트 문자열로 변환"""
+        query_tokens = set(tokenize(query))
+        signatures, seen, passages = [], set(), []
+        used, duplicates = 0, 0
+        input_tokens = sum(count_tokens(doc.page_content) for doc in docs)
+        for doc in docs:
+            signature = self._signature(doc.page_content)
+            if any(np.mean(signature == other) >= self.dup_threshold for other in signatures):
+                duplicates += 1
+                continue
+            signatures.append(signature)
+            sentences = self._compress(doc.page_content, query_tokens, seen)
+            if not sentences:
+                continue
+            passage = ' '.join(sentences)
+            tokens = count_tokens(passage)
+            if used + tokens > self.max_tokens:
+                # 남은 예산만큼 앞 문장부터 채움
+                partial = []
+                for sentence in sentences:
+                    tokens = count_tokens(sentence)
+                    if used + tokens > self.max_tokens:
+                        # 첫 문장부터 넘치면 남은 예산만큼 잘라서라도 사용
+                        head = _truncate(sentence, self.max_tokens - used) if not partial else ''
+                        if head:
+                            partial.append(head)
+                        break
+                    partial.append(sentence)
+                    used += tokens
+                if partial:
+                    passages.append(' '.join(partial))
+                break
+            passages.append(passage)
+            seen.update(' '.join(s.split()) for s in sentences)
+            used += tokens
+        context = "\n\n".join(passages)
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += count_tokens(context) if context else 0
+            self.duplicates += duplicates
+        return context
+
+    def stats(self):
+        """압축 전/후 컨텍스트 토큰과 제거된 중복 문서 수"""
+        return {
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'reduction': round(1 - self.output_tokens / self.input_tokens, 3) if self.input_tokens else 0.0,
+            'duplicates_removed': self.duplicates,
+        }
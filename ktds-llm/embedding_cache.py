@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# 한 번의 SELECT ... IN (...) 에 넣는 최대 키 수 (SQLite 변수 개수 제한 이하)
+LOOKUP_CHUNK = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """임베딩 결과를 디스크(SQLite)와 메모리(LRU)에 캐시하는 Embeddings 래퍼
+
+    - 문서 임베딩: 내용 해시로 디스크 캐시를 조회하고, 없는 것만 batch_size 단위로 묶어 요청
+    - 질의 임베딩: 프로세스 내 LRU → 디스크 캐시 → API 순으로 조회
+    디스크에는 해시와 float32 벡터를 한 행에 함께 저장하므로, 쓰기 도중 중단되거나
+    여러 프로세스(uvicorn 워커, ingest 등)가 같은 cache_dir을 써도 키와 벡터가 어긋나지 않는다.
+    """
+
+    def __init__(self, embeddings, cache_dir="./embedding_cache", namespace=None,
+                 batch_size=256, query_cache_size=1024):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        # 모델이 바뀌면 벡터가 호환되지 않으므로 모델명별로 디렉터리를 나눈다
+        namespace = namespace or getattr(embeddings, 'model', None) or type(embeddings).__name__
+        self.cache_dir = os.path.join(cache_dir, namespace.replace('/', '_'))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._query_lru = OrderedDict()
+        self._dim = None
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "embeddings.sqlite3"),
+                                     timeout=30, check_same_thread=False)
+        # WAL: 다른 프로세스가 쓰는 중에도 읽기가 막히지 않음
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys):
+        """디스크 캐시에 있는 키 → 벡터(list)"""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[i:i + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, keys, vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        self._dim = matrix.shape[1]
+        with self._lock:
+            # 다른 프로세스가 먼저 저장한 키는 그대로 둔다 (같은 텍스트면 같은 벡터)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, row.tobytes()) for key, row in zip(keys, matrix)],
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        # 캐시에 없는 문서만 batch_size 단위로 묶어 요청 (API 호출 중에는 잠금을 잡지 않음)
+        items = list(missing.items())
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            vectors = self.embeddings.embed_documents([text for _, text in batch])
+            self._store([key for key, _ in batch], vectors)
+            # float32로 저장된 값과 같도록 디스크 캐시에서 읽을 때와 같은 정밀도로 반환
+            for (key, _), vector in zip(batch, np.asarray(vectors, dtype=np.float32)):
+                found[key] = vector.tolist()
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key(text)
+        with self._lock:
+            if key in self._query_lru:
+                self._query_lru.move_to_end(key)
+                return self._query_lru[key]
+        vector = self._lookup([key]).get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store([key], [vector])
+            vector = np.asarray(vector, dtype=np.float32).tolist()
+        with self._lock:
+            self._query_lru[key] = vector
+            if len(self._query_lru) > self.query_cache_size:
+                self._query_lru.popitem(last=False)
+        return vector
+
+    def stats(self):
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {'stored': stored, 'query_lru': len(self._query_lru), 'dim': self._dim}
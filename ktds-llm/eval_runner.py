@@ -0,0 +1,385 @@
+"""RAG 배치 평가 실행기
+
+사용법:
+    uv run python eval_runner.py --configs vector-k2 hybrid-k5 --workers 8
+    uv run python eval_runner.py --backend stub --stub-latency 50 --workers 16   # 오프라인(CI) 벤치마크
+
+ragas_testset.csv의 질문마다 검색 → 답변 생성 → LLM 채점(context_recall, faithfulness,
+factual_correctness)을 워커 풀에서 병렬로 실행한다. (질문, 설정, 백엔드) 단위로 결과를 SQLite에
+캐시하므로 다시 실행하면 바뀐 설정만 평가한다. 결과는 샘플별 지연시간과 함께 CSV(및 Parquet)로 저장한다.
+"""
+import os
+import re
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+import random
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from hybrid_retriever import BM25Index, reciprocal_rank_fusion, tokenize
+from vector_index import mmr_select
+from ingest import load_documents
+
+# 프롬프트/채점 방식을 바꾸면 버전을 올려 이전 캐시 결과를 무효화한다
+RUNNER_VERSION = "v1"
+
+# 평가할 설정 (retriever: vector / mmr / bm25 / hybrid)
+CONFIGS = {
+    'vector-k2': {'retriever': 'vector', 'k': 2, 'model': 'gpt-4.1-mini', 'temperature': 0},
+    'vector-k5': {'retriever': 'vector', 'k': 5, 'model': 'gpt-4.1-mini', 'temperature': 0},
+    'mmr-k5': {'retriever': 'mmr', 'k': 5, 'fetch_k': 10, 'lambda_mult': 0.3, 'model': 'gpt-4.1-mini', 'temperature': 0},
+    'bm25-k5': {'retriever': 'bm25', 'k': 5, 'model': 'gpt-4.1-mini', 'temperature': 0},
+    'hybrid-k5': {'retriever': 'hybrid', 'k': 5, 'model': 'gpt-4.1-mini', 'temperature': 0},
+}
+
+ANSWER_PROMPT = """Answer the question based only on the following context:
+{context}
+
+Question: {query}
+"""
+
+JUDGE_PROMPT = """당신은 RAG 시스템 평가자입니다. 아래 질문, 검색된 컨텍스트, 답변, 정답을 보고 0~1 사이 점수를 매기세요.
+
+- context_recall: 정답의 각 주장 중 컨텍스트로 뒷받침되는 비율
+- faithfulness: 답변의 각 주장 중 컨텍스트로 뒷받침되는 비율
+- factual_correctness: 답변과 정답의 주장 일치도 (F1)
+
+JSON으로만 답하세요. 예: {{"context_recall": 1.0, "faithfulness": 0.8, "factual_correctness": 0.67}}
+
+[질문]
+{question}
+
+[컨텍스트]
+{contexts}
+
+[답변]
+{response}
+
+[정답]
+{reference}
+"""
+
+METRICS = ['context_recall', 'faithfulness', 'factual_correctness']
+COLUMNS = ['config', 'user_input', 'retrieved_contexts', 'response', 'reference',
+           'context_recall', 'faithfulness', 'factual_correctness(mode=f1)',
+           'retrieval_ms', 'generation_ms', 'judge_ms', 'latency_ms', 'cached', 'error']
+
+# 429/타임아웃 등 일시적 오류의 재시도 횟수와 첫 대기 시간(초)
+EVAL_MAX_RETRIES = int(os.getenv("EVAL_MAX_RETRIES", "4"))
+EVAL_RETRY_BACKOFF = float(os.getenv("EVAL_RETRY_BACKOFF", "1.0"))
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+SENTENCE_RE = re.compile(r'(?<=[.?!])\s+|\n+')
+
+
+class StubEmbeddings(Embeddings):
+    """토큰 해시 기반 결정적 임베딩 (오프라인 평가용)"""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            vector[int(hashlib.md5(token.encode('utf-8')).hexdigest()[:8], 16) % self.dim] += 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _overlap(text, reference_tokens):
+    tokens = set(tokenize(text))
+    return len(tokens & reference_tokens) / len(tokens) if tokens else 0.0
+
+
+class StubBackend:
+    """LLM 없이 동작하는 백엔드: 추출식 답변 + 토큰 겹침 기반 채점, latency(초)만큼 지연"""
+
+    name = 'stub'
+
+    def __init__(self, latency=0.0):
+        self.embeddings = StubEmbeddings()
+        self.latency = latency
+
+    def answer(self, config, question, contexts):
+        time.sleep(self.latency)
+        query_tokens = set(tokenize(question))
+        sentences = [s.strip() for text in contexts for s in SENTENCE_RE.split(text) if s.strip()]
+        ranked = sorted(sentences, key=lambda s: -len(query_tokens & set(tokenize(s))))
+        return ' '.join(ranked[:3])
+
+    def judge(self, question, contexts, response, reference):
+        time.sleep(self.latency)
+        context_tokens = set(tokenize(' '.join(contexts)))
+
+        def supported(text):
+            sentences = [s for s in SENTENCE_RE.split(text) if s.strip()]
+            if not sentences:
+                return 0.0
+            return sum(_overlap(s, context_tokens) >= 0.5 for s in sentences) / len(sentences)
+
+        response_tokens, reference_tokens = set(tokenize(response)), set(tokenize(reference))
+        common = len(response_tokens & reference_tokens)
+        f1 = 2 * common / (len(response_tokens) + len(reference_tokens)) if common else 0.0
+        return {
+            'context_recall': supported(reference),
+            'faithfulness': supported(response),
+            'factual_correctness': f1,
+        }
+
+
+class OpenAIBackend:
+    """OpenAI 모델로 답변 생성/채점 (임베딩은 디스크 캐시 사용)"""
+
+    name = 'openai'
+
+    def __init__(self, judge_model="gpt-4.1-mini"):
+        from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+        from embedding_cache import CachedEmbeddings
+        self._chat_openai = ChatOpenAI
+        self.embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"))
+        self.judge_llm = ChatOpenAI(model=judge_model, temperature=0)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, config):
+        key = (config['model'], config['temperature'])
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self._chat_openai(model=config['model'], temperature=config['temperature'])
+            return self._models[key]
+
+    def answer(self, config, question, contexts):
+        prompt = ANSWER_PROMPT.format(context="\n".join(contexts), query=question)
+        return self._model(config).invoke(prompt).content
+
+    def judge(self, question, contexts, response, reference):
+        prompt = JUDGE_PROMPT.format(question=question, contexts="\n\n".join(contexts),
+                                     response=response, reference=reference)
+        text = self.judge_llm.invoke(prompt).content
+        match = re.search(r'\{.*\}', text, re.S)
+        try:
+            scores = json.loads(match.group())
+            return {metric: float(scores[metric]) for metric in METRICS}
+        except (AttributeError, ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"채점 응답을 해석할 수 없음: {text[:200]!r}") from e
+
+
+class Corpus:
+    """평가용 문서 모음: 벡터(NumPy 행렬) / MMR / BM25 / 하이브리드 검색"""
+
+    def __init__(self, documents, embeddings):
+        self.documents = documents
+        self.embeddings = embeddings
+        matrix = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+        self.bm25 = BM25Index(documents)
+
+    def _vector(self, question, k):
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self.matrix @ query
+        return query, np.argsort(-scores)[:k]
+
+    def search(self, config, question):
+        k = config['k']
+        if config['retriever'] == 'vector':
+            return [self.documents[i] for i in self._vector(question, k)[1]]
+        if config['retriever'] == 'mmr':
+            query, idx = self._vector(question, config.get('fetch_k', 20))
+            selected = mmr_select(query, self.matrix[idx], k, config.get('lambda_mult', 0.5))
+            return [self.documents[idx[i]] for i in selected]
+        if config['retriever'] == 'bm25':
+            return [doc for doc, _ in self.bm25.search(question, k)]
+        if config['retriever'] == 'hybrid':
+            vector_docs = [self.documents[i] for i in self._vector(question, k)[1]]
+            bm25_docs = [doc for doc, _ in self.bm25.search(question, 2 * k)]
+            return reciprocal_rank_fusion([vector_docs, bm25_docs], k)
+        raise ValueError(f"unknown retriever: {config['retriever']}")
+
+
+class EvalCache:
+    """(질문, 설정, 백엔드) 단위 평가 결과 SQLite 캐시"""
+
+    def __init__(self, path="./.cache/eval_results.sqlite3"):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(*parts):
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(json.dumps(part, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+                               (key, json.dumps(value, ensure_ascii=False)))
+            self._conn.commit()
+
+
+def _is_retryable(error):
+    """429/5xx 응답이나 타임아웃처럼 다시 시도하면 성공할 수 있는 오류인지"""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if status in RETRYABLE_STATUS:
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError)) or any(
+        word in type(error).__name__ for word in ('Timeout', 'RateLimit', 'Connection'))
+
+
+def call_with_retry(fn, *args, retries=EVAL_MAX_RETRIES, backoff=EVAL_RETRY_BACKOFF):
+    """일시적 오류는 지수 백오프(지터 포함)로 retries번까지 재시도"""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+def evaluate_sample(backend, corpus, cache, corpus_id, name, config, row):
+    """질문 하나를 검색 → 생성 → 채점 (캐시에 있으면 재사용)
+
+    실패해도 예외를 올리지 않고 error 컬럼에 기록한 행을 반환한다. (실패한 결과는 캐시하지 않음)
+    """
+    key = EvalCache.key(RUNNER_VERSION, backend.name, corpus_id, config, row['user_input'], row['reference'])
+    cached = cache.get(key)
+    if cached is not None:
+        return {**cached, 'config': name, 'cached': True}
+
+    start = time.perf_counter()
+    contexts, response = [], None
+    try:
+        contexts = [doc.page_content for doc in corpus.search(config, row['user_input'])]
+        retrieved = time.perf_counter()
+        response = call_with_retry(backend.answer, config, row['user_input'], contexts)
+        generated = time.perf_counter()
+        scores = call_with_retry(backend.judge, row['user_input'], contexts, response, row['reference'])
+        judged = time.perf_counter()
+    except Exception as e:
+        return {
+            'config': name, 'user_input': row['user_input'], 'retrieved_contexts': contexts,
+            'response': response, 'reference': row['reference'],
+            'latency_ms': round(1000 * (time.perf_counter() - start), 1),
+            'cached': False, 'error': f"{type(e).__name__}: {e}",
+        }
+
+    result = {
+        'user_input': row['user_input'],
+        'retrieved_contexts': contexts,
+        'response': response,
+        'reference': row['reference'],
+        'context_recall': round(scores['context_recall'], 4),
+        'faithfulness': round(scores['faithfulness'], 4),
+        'factual_correctness(mode=f1)': round(scores['factual_correctness'], 4),
+        'retrieval_ms': round(1000 * (retrieved - start), 1),
+        'generation_ms': round(1000 * (generated - retrieved), 1),
+        'judge_ms': round(1000 * (judged - generated), 1),
+        'latency_ms': round(1000 * (judged - start), 1),
+    }
+    cache.put(key, result)
+    return {**result, 'config': name, 'cached': False, 'error': None}
+
+
+def write_results(rows, output, parquet=None):
+    with open(output, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'retrieved_contexts': str(row['retrieved_contexts'])})
+    if parquet:
+        try:
+            import pandas as pd
+            pd.DataFrame(rows, columns=COLUMNS).to_parquet(parquet, index=False)
+        except ImportError as e:
+            print(f"Parquet 저장 생략 ({e})")
+
+
+def summarize(rows):
+    """설정별 평균 점수와 샘플 지연시간 p50/p95 (실패한 샘플은 failed 수로만 집계)"""
+    summary = {}
+    for name in dict.fromkeys(row['config'] for row in rows):
+        group = [row for row in rows if row['config'] == name and not row.get('error')]
+        latencies = sorted(row['latency_ms'] for row in group)
+        summary[name] = {
+            **{metric: round(statistics.mean(row[metric] for row in group), 3) if group else None
+               for metric in ['context_recall', 'faithfulness', 'factual_correctness(mode=f1)']},
+            'p50_ms': latencies[len(latencies) // 2] if group else None,
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if group else None,
+            'cached': sum(row['cached'] for row in group),
+            'failed': sum(1 for row in rows if row['config'] == name and row.get('error')),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="batch RAG evaluation runner")
+    parser.add_argument("--testset", default="./data/ragas_testset.csv")
+    parser.add_argument("--corpus", default="./data/korean_docs_final.jsonl", help="검색 대상 문서 (ingest.py가 읽는 형식)")
+    parser.add_argument("--configs", nargs="+", default=['vector-k2', 'hybrid-k5'], choices=list(CONFIGS))
+    parser.add_argument("--backend", choices=["openai", "stub"], default="openai")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="stub 백엔드의 호출당 지연(ms)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cache", default="./.cache/eval_results.sqlite3")
+    parser.add_argument("--output", default="./evaluation_runs.csv")
+    parser.add_argument("--parquet", default=None)
+    args = parser.parse_args()
+
+    if args.backend == 'openai':
+        from dotenv import load_dotenv
+        load_dotenv()
+        backend = OpenAIBackend()
+    else:
+        backend = StubBackend(latency=args.stub_latency / 1000)
+
+    with open(args.testset, encoding='utf-8') as f:
+        testset = list(csv.DictReader(f))
+    documents = list(load_documents(args.corpus))
+    with open(args.corpus, 'rb') as f:
+        corpus_id = hashlib.sha256(f.read()).hexdigest()
+    corpus = Corpus(documents, backend.embeddings)
+    cache = EvalCache(args.cache)
+
+    start = time.perf_counter()
+    tasks = [(name, row) for name in args.configs for row in testset]
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        rows = list(executor.map(
+            lambda task: evaluate_sample(backend, corpus, cache, corpus_id, task[0], CONFIGS[task[0]], task[1]),
+            tasks,
+        ))
+    elapsed = time.perf_counter() - start
+
+    write_results(rows, args.output, args.parquet)
+    failed = sum(1 for row in rows if row.get('error'))
+    print(f"backend={backend.name} samples={len(rows)} failed={failed} workers={args.workers} "
+          f"elapsed={elapsed:.2f}s ({len(rows) / elapsed:.1f} samples/s) -> {args.output}")
+    for name, numbers in summarize(rows).items():
+        print(f"{name:10s}", numbers)
+
+
+if __name__ == "__main__":
+    main()
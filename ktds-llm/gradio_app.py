@@ -1,42 +1,169 @@
+import time
+_IMPORT_START = time.perf_counter()
+
+import os
+import asyncio
+import threading
 import gradio as gr
 from dotenv import load_dotenv
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from chat_history import HistoryManager
+from context_packer import ContextPacker
+from hedging import Hedger
 
 # 환경변수 로드
 load_dotenv()
 
 ######################
-#  RAG 체인 구성
+#  공유 리소스 (처음 사용할 때 한 번만 생성)
 ######################
 
-# OpenAI 임베딩 모델 생성
-embeddings_openai = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-)
+# 리소스별 생성 소요 시간(초), 시작 시간 보고용
+STARTUP_TIMINGS = {}
 
-# 저장된 벡터 저장소를 가져오기
-chroma_db = Chroma(
-    collection_name="labor_law",
-    embedding_function=embeddings_openai,
-    persist_directory="./chroma_db",
-)
 
-print("Chroma DB loaded")
-print(chroma_db._collection.count())  # 벡터 저장소에 있는 문서 수 출력
+def lazy_resource(factory):
+    """처음 호출될 때 한 번만 생성하고 이후에는 같은 객체를 반환 (동시 호출 시에도 한 번만 생성)"""
+    lock = threading.Lock()
+    instance = []
+
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    start = time.perf_counter()
+                    instance.append(factory())
+                    STARTUP_TIMINGS[factory.__name__] = round(time.perf_counter() - start, 3)
+        return instance[0]
+
+    get.__name__ = factory.__name__
+    return get
+
 
-# 검색기 초기화
-retriever = chroma_db.as_retriever(
-    search_type='mmr',
-    search_kwargs={
+@lazy_resource
+def get_embeddings():
+    """OpenAI 임베딩 모델 (디스크/메모리 캐시로 감싸 같은 텍스트는 다시 요청하지 않음)"""
+    from langchain_openai import OpenAIEmbeddings
+    from embedding_cache import CachedEmbeddings
+    return CachedEmbeddings(
+        OpenAIEmbeddings(
+            model="text-embedding-3-small",
+        ),
+        cache_dir="./embedding_cache",
+        batch_size=256,           # 문서 임베딩 요청 당 최대 텍스트 수
+        query_cache_size=1024,    # 프로세스 내 질의 임베딩 LRU 크기
+    )
+
+
+@lazy_resource
+def get_chroma():
+    """저장된 벡터 저장소"""
+    from langchain_chroma import Chroma
+    return Chroma(
+        collection_name="labor_law",
+        embedding_function=get_embeddings(),
+        persist_directory="./chroma_db",
+    )
+
+
+@lazy_resource
+def get_retriever():
+    """하이브리드 검색기: "제60조" 같은 정확한 조문 번호는 BM25로, 의미 검색은 벡터로 찾고 RRF로 결합"""
+    from hybrid_retriever import BM25Index, HybridRetriever
+    from vector_index import InMemoryVectorIndex, InMemoryMMRRetriever
+    chroma_db = get_chroma()
+    mmr_kwargs = {
         'k': 5,                  # 검색할 문서의 수
         'fetch_k': 10,           # mmr 알고리즘에 전달할 문서의 수 (fetch_k > k)
         'lambda_mult': 0.3,      # 다양성을 고려하는 정도
-    },
-)
+    }
+    if os.getenv("VECTOR_INDEX", "inprocess") == "inprocess":
+        # 컬렉션을 메모리 행렬로 한 번 읽어 와 NumPy로 MMR 계산 (chroma.sqlite3가 바뀌면 BM25와 함께 자동 재로드)
+        index = InMemoryVectorIndex(chroma_db, reload_interval=5.0, with_bm25=True)
+        vector_retriever = InMemoryMMRRetriever(index=index, embeddings=get_embeddings(), **mmr_kwargs)
+        bm25 = index.bm25
+    else:
+        vector_retriever = chroma_db.as_retriever(search_type='mmr', search_kwargs=mmr_kwargs)
+        bm25 = BM25Index.from_chroma(chroma_db)
+    return HybridRetriever(
+        vector_retriever=vector_retriever,
+        bm25=bm25,
+        k=5,                     # 최종 문서 수
+        bm25_k=10,               # BM25에서 가져올 후보 수
+    )
+
+
+@lazy_resource
+def get_semantic_cache():
+    """의미 기반 응답 캐시 (비슷한 질문은 검색/LLM 호출 없이 이전 답변 재사용)"""
+    from semantic_cache import SemanticCache
+    return SemanticCache(
+        get_embeddings(),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),  # 코사인 유사도 기준 (1 초과면 캐시 비활성)
+        ttl=24 * 3600,           # 캐시 유지 시간(초)
+        max_entries=1000,        # 최대 저장 개수
+        history_turns=1,         # 캐시 키에 포함할 최근 대화 턴 수
+    )
+
+
+def _make_llm(model, base_url=None):
+    import httpx
+    from langchain_openai import ChatOpenAI
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    timeout = httpx.Timeout(60.0, connect=5.0)
+    return ChatOpenAI(
+        model=model,
+        base_url=base_url,
+        temperature=0.7,
+        top_p=0.9,
+        http_client=httpx.Client(limits=limits, timeout=timeout),
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+
+@lazy_resource
+def get_llm():
+    """LLM (동시 사용자 요청이 하나의 HTTP 연결 풀을 공유해 요청마다 TLS 연결을 새로 맺지 않음)"""
+    return _make_llm(LLM_MODEL)
+
+
+@lazy_resource
+def get_hedge_llm():
+    """헤지 요청용 보조 LLM (느린 연결을 피하도록 연결 풀을 따로 사용)"""
+    return _make_llm(LLM_HEDGE_MODEL or LLM_MODEL, LLM_HEDGE_BASE_URL)
+
+
+@lazy_resource
+def get_rag_chain():
+    return prompt | get_llm() | StrOutputParser()
+
+
+@lazy_resource
+def get_hedge_chain():
+    return prompt | get_hedge_llm() | StrOutputParser()
+
+
+def warmup():
+    """실행 직후 백그라운드에서 리소스를 미리 생성 (첫 사용자 요청이 초기화 비용을 내지 않도록)"""
+    start = time.perf_counter()
+    try:
+        get_retriever()
+        get_semantic_cache()
+        get_rag_chain()
+        if LLM_HEDGING:
+            get_hedge_chain()
+    except Exception as e:
+        print(f"[startup] warmup failed: {e}")
+        return
+    documents = get_chroma()._collection.count()  # 벡터 저장소에 있는 문서 수
+    print(f"[startup] warmup done in {time.perf_counter() - start:.2f}s, {documents} docs {STARTUP_TIMINGS}")
+
+
+######################
+#  RAG 체인 구성
+######################
 
 # 메시지 플레이스홀더가 있는 프롬프트 템플릿 정의
 prompt = ChatPromptTemplate.from_messages([
@@ -62,53 +189,145 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{question}")
 ])
 
-# LLM 설정
-llm = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.7,
-    top_p=0.9,
+# 동시에 진행할 수 있는 LLM 호출 수 (초과 요청은 대기)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))
+llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+# 헤지 요청 (LLM_HEDGING=1이면 응답이 최근 p95보다 늦을 때 보조 모델에 같은 요청을 보내 먼저 온 쪽 사용)
+# 스트리밍은 첫 토큰까지의 시간, invoke는 전체 응답 시간으로 지연 기준이 달라 따로 관리
+# 같은 모델/엔드포인트로 보내면 이미 느리거나 제한 중인 곳에 부하만 더하므로, 다른 모델(LLM_HEDGE_MODEL)이나
+# 다른 엔드포인트(LLM_HEDGE_BASE_URL)가 설정된 경우에만 켠다
+LLM_MODEL = "gpt-4.1-mini"
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", "")
+LLM_HEDGE_BASE_URL = os.getenv("LLM_HEDGE_BASE_URL") or None
+LLM_HEDGING = os.getenv("LLM_HEDGING", "0") == "1" and (
+    LLM_HEDGE_MODEL not in ("", LLM_MODEL) or LLM_HEDGE_BASE_URL is not None)
+if os.getenv("LLM_HEDGING", "0") == "1" and not LLM_HEDGING:
+    print("[startup] LLM_HEDGING ignored: set LLM_HEDGE_MODEL or LLM_HEDGE_BASE_URL to a separate secondary")
+invoke_hedger = Hedger() if LLM_HEDGING else None
+stream_hedger = Hedger() if LLM_HEDGING else None
+
+# 대화 이력 관리 (최근 대화는 그대로, 오래된 대화는 누적 요약으로 대체해 CHAT_HISTORY_MAX_TOKENS 이하 유지)
+history_manager = HistoryManager(
+    lambda messages: get_llm().invoke([(msg['role'], msg['content']) for msg in messages]).content,
 )
 
-# 문서 포맷팅
-def format_docs(docs):
-    return "\n\n".join([f"{doc.page_content}" for doc in docs])
+# 컨텍스트 패킹 (중복 문서/겹치는 문장 제거 + 질문과 관련된 문장 위주로 토큰 예산 안에 채움)
+context_packer = ContextPacker(
+    max_tokens=2000,          # 컨텍스트 전체 최대 토큰 수
+    max_passage_tokens=400,   # 문서 하나당 최대 토큰 수 (넘으면 관련 문장만 추출)
+    dup_threshold=0.8,        # MinHash 유사도가 이 이상이면 중복으로 보고 제외
+)
 
-# RAG 체인 생성
-rag_chain = prompt | llm | StrOutputParser()
+# 문서 포맷팅
+def format_docs(docs, question=""):
+    return context_packer.pack(docs, question)
 
-# 사용자 메시지를 처리하고 AI 응답을 생성하는 함수
-def answer_invoke(message, history):
-    # 대화 이력을 LangChain 메시지 형식으로 변환
+# 대화 이력을 토큰 예산 안으로 압축한 뒤 LangChain 메시지 형식으로 변환
+def to_history_messages(history):
     history_messages = []
-    for msg in history:
-        if msg['role'] == "user":
+    for msg in history_manager.compact(history):
+        if msg['role'] == "system":
+            history_messages.append(SystemMessage(content=msg['content']))
+        elif msg['role'] == "user":
             history_messages.append(HumanMessage(content=msg['content']))
         elif msg['role'] == "assistant":
             history_messages.append(AIMessage(content=msg['content']))
-    
+    return history_messages
+
+# 사용자 메시지를 처리하고 AI 응답을 생성하는 함수
+def answer_invoke(message, history):
+    # 질문 임베딩으로 캐시 조회 (임베딩은 캐시되어 검색 시 다시 요청하지 않음)
+    semantic_cache = get_semantic_cache()
+    query_vector = semantic_cache.embed(message)
+    cached = semantic_cache.lookup(query_vector, history)
+    if cached is not None:
+        return cached
+    start = time.perf_counter()
+
     # RAG 체인 실행
-    response = rag_chain.invoke({
-        "chat_history": history_messages,
-        "context": format_docs(retriever.invoke(message)), 
+    inputs = {
+        "chat_history": to_history_messages(history),
+        "context": format_docs(get_retriever().invoke(message), message), 
         "question": message
-    })
-    
+    }
+    if invoke_hedger is None:
+        response = get_rag_chain().invoke(inputs)
+    else:
+        response = invoke_hedger.call(
+            lambda: get_rag_chain().invoke(inputs),
+            lambda: get_hedge_chain().invoke(inputs),
+        )
+
+    semantic_cache.add(query_vector, history, message, response, time.perf_counter() - start)
     return response
 
+# answer_invoke의 비동기 스트리밍 버전 (LLM 응답을 기다리는 동안 워커 스레드를 점유하지 않음)
+async def answer_stream(message, history):
+    semantic_cache = await asyncio.to_thread(get_semantic_cache)
+    query_vector = await asyncio.to_thread(semantic_cache.embed, message)
+    cached = semantic_cache.lookup(query_vector, history)
+    if cached is not None:
+        yield cached
+        return
+    start = time.perf_counter()
+
+    retriever, rag_chain = await asyncio.to_thread(lambda: (get_retriever(), get_rag_chain()))
+    docs, history_messages = await asyncio.gather(
+        retriever.ainvoke(message),
+        asyncio.to_thread(to_history_messages, history),  # 이력 요약이 필요하면 LLM 호출이 발생
+    )
+    inputs = {
+        "chat_history": history_messages,
+        "context": format_docs(docs, message),
+        "question": message
+    }
+    if stream_hedger is None:
+        stream = rag_chain.astream(inputs)
+    else:
+        hedge_chain = await asyncio.to_thread(get_hedge_chain)
+        stream = stream_hedger.astream(lambda: rag_chain.astream(inputs), lambda: hedge_chain.astream(inputs))
+    response = ""
+    async with llm_semaphore:
+        async for chunk in stream:
+            response += chunk
+            yield response
+
+    semantic_cache.add(query_vector, history, message, response, time.perf_counter() - start)
+
 # Gradio ChatInterface 객체 생성
-demo = gr.ChatInterface(
-    fn=answer_invoke,                    # 메시지 처리 함수
-    title="근로기준법 Q&A 챗봇",              # 채팅 인터페이스의 제목
-    description="근로기준법 관련 질문에 답변하는 AI 챗봇입니다.",
-    examples=[
-        "근로계약서에는 어떤 내용이 포함되어야 하나요?",
-        "연차휴가는 어떻게 계산하나요?",
-        "최저임금은 어떻게 정해지나요?",
-        "해고 절차는 어떻게 되나요?"
-    ],
-    type="messages"
-)
+with gr.Blocks(title="근로기준법 Q&A 챗봇") as demo:
+    gr.ChatInterface(
+        fn=answer_stream,                    # 메시지 처리 함수 (비동기 스트리밍)
+        title="근로기준법 Q&A 챗봇",              # 채팅 인터페이스의 제목
+        description="근로기준법 관련 질문에 답변하는 AI 챗봇입니다.",
+        examples=[
+            "근로계약서에는 어떤 내용이 포함되어야 하나요?",
+            "연차휴가는 어떻게 계산하나요?",
+            "최저임금은 어떻게 정해지나요?",
+            "해고 절차는 어떻게 되나요?"
+        ],
+        type="messages",
+        concurrency_limit=None,              # 비동기 함수이므로 동시 실행 수 제한 없음 (LLM 호출은 세마포어로 제한)
+    )
+    # 캐시 히트율/절약 시간 확인용
+    with gr.Accordion("응답 캐시 통계", open=False):
+        cache_stats = gr.JSON()
+        gr.Button("새로고침").click(
+            lambda: {
+                'semantic_cache': get_semantic_cache().stats(),
+                'history': history_manager.stats(),
+                'context': context_packer.stats(),
+                'startup': STARTUP_TIMINGS,
+                'hedging': {'invoke': invoke_hedger.stats(), 'stream': stream_hedger.stats()} if LLM_HEDGING else None,
+            },
+            outputs=cache_stats,
+        )
 
 # Gradio 인터페이스 실행
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    # 리소스는 백그라운드에서 준비하고 UI는 바로 띄운다
+    threading.Thread(target=warmup, daemon=True).start()
+    demo.launch(prevent_thread_lock=True)
+    print(f"[startup] ready in {time.perf_counter() - _IMPORT_START:.2f}s (import + UI build + launch)")
+    demo.block_thread()
\ No newline at end of file
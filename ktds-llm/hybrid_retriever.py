@@ -0,0 +1,140 @@
+import re
+import math
+import asyncio
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# 조사/어미 (긴 것부터 제거)
+JOSA = sorted([
+    '은', '는', '이', '가', '을', '를', '의', '에', '에서', '에게', '께', '으로', '로', '와', '과', '도', '만',
+    '까지', '부터', '보다', '이나', '나', '이란', '란', '이며', '며', '이고', '고',
+    '이다', '입니다', '합니다', '하는', '하고', '한다', '하여', '해야', '하면', '된다', '되는',
+    '인가요', '나요', '은가요', '는가요', '가요', '까요', '요',
+], key=len, reverse=True)
+# 명사 끝 음절과 겹치기 쉬운 한 글자 어미 (휴가, 해고, 연장근로 등) → 떼지 않는다
+AMBIGUOUS_JOSA = {'가', '고', '로', '이', '도', '나', '요'}
+# 조사를 떼고 남아야 하는 최소 음절 수
+MIN_STEM_LEN = 2
+
+# "제60조", "제 60 조의 2" 같은 조문 번호는 하나의 토큰으로 유지
+TOKEN_RE = re.compile(r'제\s*\d+\s*조(?:\s*의\s*\d+)?|[가-힣]+|[a-z]+|\d+')
+ARTICLE_RE = re.compile(r'^제\d+조')
+
+
+def strip_josa(token):
+    """어절 끝의 조사/어미를 떼어낸 어간 (애매하거나 어간이 너무 짧아지면 그대로)"""
+    for josa in JOSA:
+        if josa in AMBIGUOUS_JOSA or len(token) - len(josa) < MIN_STEM_LEN:
+            continue
+        if token.endswith(josa):
+            return token[:-len(josa)]
+    return token
+
+
+def tokenize(text):
+    """한국어용 간단 토크나이저: 조문 번호 보존 + 조사 제거 + 한글 2-gram"""
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        token = re.sub(r'\s+', '', match.group())
+        if token in JOSA:
+            continue
+        if ARTICLE_RE.match(token) or not ('가' <= token[0] <= '힣'):
+            tokens.append(token)
+            continue
+        stem = strip_josa(token)
+        tokens.append(stem)
+        # 조사 제거가 틀렸을 때도 원형으로 일치하도록 원래 어절도 색인
+        if stem != token:
+            tokens.append(token)
+        # 복합명사(예: 연차유급휴가)가 띄어쓰기 없이 붙어 있어도 일부 일치하도록 2-gram 추가
+        if len(stem) > 2:
+            tokens.extend(stem[i:i + 2] for i in range(len(stem) - 1))
+    return tokens
+
+
+class BM25Index:
+    """메모리 역색인 기반 BM25 (Okapi)"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # token -> [(doc_idx, tf)]
+        self.doc_lens = []
+        for idx, doc in enumerate(self.documents):
+            counts = Counter(tokenize(doc.page_content))
+            self.doc_lens.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self.postings[token].append((idx, tf))
+        n = len(self.documents)
+        self.avg_len = (sum(self.doc_lens) / n) if n else 0.0
+        self.idf = {
+            token: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for token, posting in self.postings.items()
+        }
+
+    def search(self, query, k=10):
+        """질의와 BM25 점수가 높은 (문서, 점수) 목록"""
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for idx, tf in self.postings[token]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[idx] / self.avg_len)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.documents[idx], score) for idx, score in top]
+
+    @classmethod
+    def from_chroma(cls, chroma_db, **kwargs):
+        """Chroma 컬렉션에 저장된 문서로 색인 생성"""
+        data = chroma_db.get(include=['documents', 'metadatas'])
+        documents = [
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas'])
+        ]
+        return cls(documents, **kwargs)
+
+
+def reciprocal_rank_fusion(result_lists, k=5, rrf_k=60):
+    """여러 검색 결과 순위를 RRF 점수(sum 1/(rrf_k + rank))로 합침"""
+    scores, docs = defaultdict(float), {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc.id or doc.page_content
+            scores[key] += 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in ranked]
+
+
+# 두 검색을 동시에 실행하기 위한 공유 스레드 풀
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid")
+
+
+class HybridRetriever(BaseRetriever):
+    """벡터 검색기와 BM25 검색을 동시에 실행하고 RRF로 결합하는 검색기"""
+
+    vector_retriever: BaseRetriever
+    bm25: Any
+    k: int = 5
+    bm25_k: int = 10
+    rrf_k: int = 60
+
+    model_config = {'arbitrary_types_allowed': True}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        vector_future = _executor.submit(self.vector_retriever.invoke, query)
+        bm25_docs = [doc for doc, _ in self.bm25.search(query, self.bm25_k)]
+        return reciprocal_rank_fusion([vector_future.result(), bm25_docs], self.k, self.rrf_k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        vector_docs, bm25_results = await asyncio.gather(
+            self.vector_retriever.ainvoke(query),
+            asyncio.to_thread(self.bm25.search, query, self.bm25_k),
+        )
+        return reciprocal_rank_fusion([vector_docs, [doc for doc, _ in bm25_results]], self.k, self.rrf_k)
@@ -0,0 +1,252 @@
+"""data/ 문서를 Chroma 벡터 저장소에 적재하는 CLI
+
+사용법:
+    uv run python ingest.py --collection labor_law --include labor_law.pdf
+    uv run python ingest.py --collection db_korean_cosine --include "*_KR.md" --strategy sentence --chunk-size 300 --chunk-overlap 0
+
+- 파일 단위로 스트리밍 로드 → 청크 분할 → batch_size 단위 병렬 임베딩 → 배치 upsert
+- 파일 내용 해시와 청크 설정이 이전 적재와 같으면 파일을 읽지도 않고 건너뜀
+- 파일이 바뀌면 새 청크를 upsert 하고 더 이상 없는 이전 청크는 삭제 (삭제된 파일의 청크도 삭제)
+"""
+import os
+import json
+import glob
+import time
+import fnmatch
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_openai import OpenAIEmbeddings
+from langchain_chroma import Chroma
+from embedding_cache import CachedEmbeddings
+
+SUPPORTED_EXTS = ('.pdf', '.md', '.txt', '.jsonl')
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_documents(path):
+    """파일 하나를 Document 단위로 차례대로 읽음 (PDF는 페이지, jsonl은 줄 단위)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.pdf':
+        from langchain_community.document_loaders import PyPDFLoader
+        yield from PyPDFLoader(path).lazy_load()
+    elif ext == '.jsonl':
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if isinstance(record, str):  # 문자열로 한 번 더 직렬화된 줄
+                    record = json.loads(record)
+                metadata = dict(record.get('metadata') or {})
+                metadata.setdefault('source', path)
+                yield Document(page_content=record['page_content'], metadata=metadata)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield Document(page_content=f.read(), metadata={'source': path})
+
+
+def make_splitter(strategy, chunk_size, chunk_overlap):
+    """청크 분할 전략: token(토큰 수 기준) / sentence(문장 경계 우선) / char(글자 수 기준)"""
+    if strategy == 'token':
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name="cl100k_base", chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+        )
+    if strategy == 'sentence':
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name="cl100k_base",
+            separators=['\n\n', '\n', r'(?<=[.!?])\s+'],
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            is_separator_regex=True,
+            keep_separator=True,
+        )
+    if strategy == 'char':
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    raise ValueError(f"unknown strategy: {strategy}")
+
+
+def _clean_metadata(metadata):
+    # Chroma 메타데이터는 str/int/float/bool 값만 허용
+    return {key: value for key, value in metadata.items() if isinstance(value, (str, int, float, bool))}
+
+
+def iter_chunks(path, digest, splitter):
+    """파일의 청크를 (id, Document)로 스트리밍 (id는 파일 경로 + 순번 + 내용 해시로 고정)"""
+    index = 0
+    for doc in load_documents(path):
+        for chunk in splitter.split_documents([doc]):
+            content_id = hashlib.sha256(chunk.page_content.encode('utf-8')).hexdigest()[:16]
+            chunk.metadata = _clean_metadata({**chunk.metadata, 'source': path, 'file_hash': digest})
+            yield f"{hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]}-{index}-{content_id}", chunk
+            index += 1
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def discover(data_dir, includes):
+    paths = []
+    for path in sorted(glob.glob(os.path.join(data_dir, '**', '*'), recursive=True)):
+        name = os.path.basename(path)
+        if not os.path.isfile(path) or not name.lower().endswith(SUPPORTED_EXTS):
+            continue
+        if includes and not any(fnmatch.fnmatch(name, pattern) for pattern in includes):
+            continue
+        paths.append(path)
+    return paths
+
+
+def ingest(paths, chroma_db, embeddings, splitter, config, manifest_path,
+           batch_size=128, max_workers=4, prune=True):
+    """변경된 파일만 청크/임베딩/upsert 하고 통계 반환"""
+    collection = chroma_db._collection
+    manifest = load_manifest(manifest_path)
+    stats = {'files': len(paths), 'skipped': 0, 'ingested': 0, 'removed': 0, 'chunks': 0, 'deleted_chunks': 0}
+    start = time.perf_counter()
+
+    if prune:
+        for source in [source for source in manifest if not os.path.exists(source)]:
+            ids = manifest.pop(source)['ids']
+            if ids:
+                collection.delete(ids=ids)
+            stats['removed'] += 1
+            stats['deleted_chunks'] += len(ids)
+        save_manifest(manifest_path, manifest)
+
+    def embed_batch(batch):
+        return batch, embeddings.embed_documents([doc.page_content for _, _, doc in batch])
+
+    # 파일별 남은 배치 수; 마지막 배치가 upsert 되면 manifest에 기록 (중단 후 재실행 시 이어서 처리)
+    pending, new_ids = {}, {}
+    in_flight = set()
+
+    def finish(future):
+        batch, vectors = future.result()
+        collection.upsert(
+            ids=[chunk_id for _, chunk_id, _ in batch],
+            embeddings=vectors,
+            documents=[doc.page_content for _, _, doc in batch],
+            metadatas=[doc.metadata for _, _, doc in batch],
+        )
+        stats['chunks'] += len(batch)
+        for source in {source for source, _, _ in batch}:
+            pending[source] -= 1
+            if pending[source] == 0:
+                complete(source)
+
+    def complete(source):
+        old_ids = set(manifest.get(source, {}).get('ids', []))
+        stale = sorted(old_ids - set(new_ids[source]))
+        if stale:
+            collection.delete(ids=stale)
+            stats['deleted_chunks'] += len(stale)
+        manifest[source] = {'hash': digests[source], 'config': config, 'ids': new_ids[source]}
+        save_manifest(manifest_path, manifest)
+        stats['ingested'] += 1
+
+    def submit(executor, batch):
+        for source in {source for source, _, _ in batch}:
+            pending[source] += 1
+            if source in chunked:
+                # 분할이 끝난 파일의 마지막 배치가 제출되었으므로 자리 표시용 1을 뺀다
+                chunked.discard(source)
+                pending[source] -= 1
+        in_flight.add(executor.submit(embed_batch, batch))
+        # 진행 중인 배치 수를 워커 수의 2배로 제한해 메모리 사용량을 일정하게 유지
+        while len(in_flight) >= 2 * max_workers:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                finish(future)
+
+    digests, chunked = {}, set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batch = []
+        for path in paths:
+            digests[path] = file_hash(path)
+            previous = manifest.get(path)
+            if previous and previous['hash'] == digests[path] and previous['config'] == config:
+                stats['skipped'] += 1
+                continue
+            # 마지막 청크가 배치로 제출되기 전에 완료 처리되지 않도록 1을 더해 두었다가 나중에 뺀다
+            pending[path], new_ids[path] = 1, []
+            for chunk_id, chunk in iter_chunks(path, digests[path], splitter):
+                new_ids[path].append(chunk_id)
+                batch.append((path, chunk_id, chunk))
+                if len(batch) >= batch_size:
+                    submit(executor, batch)
+                    batch = []
+            if batch and batch[-1][0] == path:
+                chunked.add(path)  # 남은 청크가 아직 다음 배치에 쌓이는 중
+            else:
+                pending[path] -= 1
+                if pending[path] == 0:
+                    complete(path)
+        if batch:
+            submit(executor, batch)
+        for future in list(in_flight):
+            finish(future)
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = round(elapsed, 2)
+    stats['chunks_per_sec'] = round(stats['chunks'] / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ingest ./data documents into Chroma")
+    parser.add_argument("--data-dir", default="./data")
+    parser.add_argument("--include", nargs="*", default=[], help="파일명 패턴 (예: labor_law.pdf '*_KR.md')")
+    parser.add_argument("--collection", default="labor_law")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--strategy", choices=["token", "sentence", "char"], default="token")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--no-prune", action="store_true", help="사라진 파일의 청크를 삭제하지 않음")
+    args = parser.parse_args()
+
+    load_dotenv()
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-small"), batch_size=args.batch_size)
+    chroma_db = Chroma(
+        collection_name=args.collection,
+        embedding_function=embeddings,
+        persist_directory=args.persist_directory,
+        collection_metadata={'hnsw:space': 'cosine'},
+    )
+    splitter = make_splitter(args.strategy, args.chunk_size, args.chunk_overlap)
+    config = f"{args.strategy}:{args.chunk_size}:{args.chunk_overlap}:text-embedding-3-small"
+    manifest_path = os.path.join(args.persist_directory, f"ingest_manifest_{args.collection}.json")
+
+    paths = discover(args.data_dir, args.include)
+    stats = ingest(paths, chroma_db, embeddings, splitter, config, manifest_path,
+                   batch_size=args.batch_size, max_workers=args.workers, prune=not args.no_prune)
+    print(stats)
+    print(f"collection={args.collection} count={chroma_db._collection.count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+
+class LRUSQLiteCache(BaseCache):
+    """LLM 응답 캐시: 메모리 LRU + (선택) SQLite 영구 저장
+
+    - 같은 프롬프트와 같은 모델 설정(llm_string)이면 저장된 응답을 반환
+    - 메모리에는 max_entries개까지 최근 사용 순으로 유지하고, 없으면 SQLite에서 찾아 메모리에 올림
+    - path가 None이면 메모리 전용
+    - SQLite에는 max_rows개까지만 두고, ttl(초)이 지난 항목과 넘치는 오래된 항목은 저장 시 제거 (0이면 제한 없음)
+    """
+
+    def __init__(self, max_entries=1024, path=None, max_rows=10000, ttl=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created)")
+            self._conn.commit()
+
+    @staticmethod
+    def _key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def lookup(self, prompt, llm_string):
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+            elif self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM llm_cache WHERE key = ? AND created >= ?", (key, self._min_created()),
+                ).fetchone()
+                if row is not None:
+                    value = [loads(item) for item in loads(row[0])]
+                    self._remember(key, value)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def update(self, prompt, llm_string, return_val):
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            self._remember(key, return_val)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, dumps([dumps(generation) for generation in return_val]), time.time()),
+                )
+                self._prune()
+                self._conn.commit()
+
+    def _min_created(self):
+        return time.time() - self.ttl if self.ttl else 0.0
+
+    def _prune(self):
+        """만료된 항목과 max_rows를 넘는 오래된 항목 삭제"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (self._min_created(),))
+        if self.max_rows:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._lru.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._lru)}
@@ -0,0 +1,74 @@
+"""gradio_app 동시 사용자 부하 테스트
+
+사용법:
+    # 캐시 효과를 빼고 측정하려면 서버를 SEMANTIC_CACHE_THRESHOLD=1.1 로 실행
+    SEMANTIC_CACHE_THRESHOLD=1.1 uv run python gradio_app.py
+    uv run python loadtest_chat.py --url http://127.0.0.1:7860/ --users 1 5 10 25 50
+
+동시 사용자 수별로 각 사용자가 질문을 하나씩 보내고, 전체 응답 완료까지의
+p50/p95 지연시간과 처리량(건/초), 실패 수를 표로 출력한다.
+"""
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from gradio_client import Client
+
+QUESTIONS = [
+    "근로계약서에는 어떤 내용이 포함되어야 하나요?",
+    "연차휴가는 어떻게 계산하나요?",
+    "최저임금은 어떻게 정해지나요?",
+    "해고 절차는 어떻게 되나요?",
+    "연장근로 시간의 한도는 얼마인가요?",
+    "휴게시간은 어떻게 부여해야 하나요?",
+    "퇴직금은 언제까지 지급해야 하나요?",
+    "임산부의 야간근로는 허용되나요?",
+]
+
+
+def ask(url, question):
+    client = Client(url, verbose=False)
+    start = time.perf_counter()
+    client.predict(question, api_name="/chat")
+    return time.perf_counter() - start
+
+
+def run(url, users):
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(users)]
+    latencies, failures = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        futures = [executor.submit(ask, url, question) for question in questions]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                failures += 1
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    if not latencies:
+        return {'users': users, 'failures': failures}
+    return {
+        'users': users,
+        'p50_s': round(statistics.median(latencies), 2),
+        'p95_s': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'failures': failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gradio_app concurrent users load test")
+    parser.add_argument("--url", default="http://127.0.0.1:7860/")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    args = parser.parse_args()
+
+    print(f"{'users':>6} {'p50_s':>7} {'p95_s':>7} {'rps':>7} {'fail':>5}")
+    for users in args.users:
+        row = run(args.url, users)
+        print(f"{row['users']:>6} {row.get('p50_s', '-'):>7} {row.get('p95_s', '-'):>7} "
+              f"{row.get('throughput_rps', '-'):>7} {row['failures']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import time
+import hashlib
+import threading
+import numpy as np
+
+
+class SemanticCache:
+    """질문 임베딩의 코사인 유사도로 이전 답변을 재사용하는 캐시
+
+    - threshold 이상으로 유사한 질문이 있으면 저장된 답변을 반환
+    - 최근 대화 이력(history_turns 턴)이 같은 경우에만 재사용 (문맥이 다른 후속 질문 구분)
+    - ttl(초)이 지난 항목과 max_entries를 넘는 오래된 항목은 제거
+    """
+
+    def __init__(self, embeddings, threshold=0.92, ttl=24 * 3600, max_entries=1000, history_turns=1):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.history_turns = history_turns
+        self._lock = threading.Lock()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._entries = []  # {'history_key', 'question', 'answer', 'created', 'last_used', 'latency'}
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+
+    def history_key(self, history):
+        """최근 history_turns 턴의 대화 내용으로 문맥 키 생성"""
+        recent = history[-2 * self.history_turns:] if self.history_turns else []
+        h = hashlib.sha256()
+        for msg in recent:
+            h.update(f"{msg['role']}\0{msg['content']}\0".encode('utf-8'))
+        return h.hexdigest()
+
+    def embed(self, question):
+        """질문을 정규화된 float32 벡터로 변환"""
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _expire(self, now):
+        keep = [i for i, entry in enumerate(self._entries) if now - entry['created'] < self.ttl]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = self._vectors[keep]
+
+    def lookup(self, vector, history):
+        """유사한 이전 질문의 답변 반환 (없으면 None)"""
+        start = time.perf_counter()
+        key = self.history_key(history)
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            answer = None
+            if self._entries:
+                scores = self._vectors @ vector
+                for i in np.argsort(-scores):
+                    if scores[i] < self.threshold:
+                        break
+                    if self._entries[i]['history_key'] == key:
+                        entry = self._entries[i]
+                        entry['last_used'] = now
+                        answer = entry['answer']
+                        self.saved_seconds += entry['latency']
+                        break
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.lookup_seconds += time.perf_counter() - start
+        return answer
+
+    def add(self, vector, history, question, answer, latency):
+        """답변 저장 (latency는 캐시 히트 시 절약된 시간 집계에 사용)"""
+        now = time.time()
+        entry = {'history_key': self.history_key(history), 'question': question, 'answer': answer,
+                 'created': now, 'last_used': now, 'latency': latency}
+        with self._lock:
+            if self._vectors.size == 0:
+                self._vectors = vector[np.newaxis, :].copy()
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                # 가장 오랫동안 사용되지 않은 항목부터 제거
+                order = sorted(range(len(self._entries)), key=lambda i: self._entries[i]['last_used'])
+                keep = sorted(order[len(self._entries) - self.max_entries:])
+                self._entries = [self._entries[i] for i in keep]
+                self._vectors = self._vectors[keep]
+
+    def stats(self):
+        """히트율과 절약된 시간 등 카운터"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'latency_saved_sec': round(self.saved_seconds, 2),
+            'avg_lookup_ms': round(1000 * self.lookup_seconds / total, 2) if total else 0.0,
+        }
@@ -0,0 +1,80 @@
+import os
+import threading
+from collections import defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+# 요청 지연시간 히스토그램 구간(초)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metrics:
+    """Prometheus 텍스트 형식으로 내보내는 간단한 지표 저장소 (워커 프로세스별)
+
+    - http_request_duration_seconds: 경로/메서드/상태 코드별 지연시간 히스토그램
+    - llm_tokens_total: 모델/종류(prompt, completion)별 토큰 수
+    - counter/gauge: 캐시 히트 수 등 내보낼 때 값을 읽어 오는 함수로 등록한 지표
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._sums = defaultdict(float)
+        self._tokens = defaultdict(int)
+        self._readers = {}
+
+    def observe(self, route, method, status, seconds):
+        key = (route, method, str(status))
+        with self._lock:
+            counts = self._histograms[key]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[key] += seconds
+
+    def add_tokens(self, model, kind, count):
+        with self._lock:
+            self._tokens[(model, kind)] += count
+
+    def counter(self, name, help_text, read):
+        """단조 증가하는 값 (read()는 누적값을 반환)"""
+        self._readers[name] = ('counter', help_text, read)
+
+    def gauge(self, name, help_text, read):
+        self._readers[name] = ('gauge', help_text, read)
+
+    def render(self):
+        worker = os.getpid()
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (route, method, status), counts in sorted(self._histograms.items()):
+                labels = f'route="{route}",method="{method}",status="{status}",worker="{worker}"'
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {self._sums[(route, method, status)]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {counts[-1]}')
+            lines += ["# HELP llm_tokens_total LLM tokens by model and kind", "# TYPE llm_tokens_total counter"]
+            for (model, kind), count in sorted(self._tokens.items()):
+                lines.append(f'llm_tokens_total{{model="{model}",kind="{kind}",worker="{worker}"}} {count}')
+        for name, (kind, help_text, read) in sorted(self._readers.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f'{name}{{worker="{worker}"}} {read()}']
+        return "\n".join(lines) + "\n"
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """LLM 호출이 끝날 때 응답의 token_usage를 Metrics에 누적 (캐시 히트는 사용량이 없어 집계되지 않음)"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        model = (response.llm_output or {}).get('model_name', 'unknown')
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            if usage.get(kind):
+                self.metrics.add_tokens(model, kind.replace('_tokens', ''), usage[kind])
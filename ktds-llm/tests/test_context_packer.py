@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from chat_history import count_tokens
+from context_packer import ContextPacker
+
+
+def test_oversized_sentence_is_truncated_not_dropped():
+    long_sentence = ' '.join(f'연차휴가 규정 {i}번 항목' for i in range(200)) + '.'
+    packer = ContextPacker(max_tokens=1000, max_passage_tokens=50)
+    context = packer.pack([Document(page_content=long_sentence + ' 짧은 문장.')], query='연차휴가')
+    assert context
+    assert context.startswith('연차휴가 규정 0번 항목')
+    assert count_tokens(context) <= 50
+
+
+def test_oversized_first_passage_fills_remaining_budget():
+    long_sentence = ' '.join(f'해고 예고 {i}' for i in range(300)) + '.'
+    packer = ContextPacker(max_tokens=40, max_passage_tokens=1000, compress=False)
+    context = packer.pack([Document(page_content=long_sentence)], query='해고')
+    assert context
+    assert count_tokens(context) <= 40
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hybrid_retriever import tokenize
+
+
+def test_josa_stripping_keeps_same_stem():
+    assert tokenize('휴가')[0] == '휴가'
+    assert tokenize('휴가를')[0] == '휴가'
+    assert tokenize('해고')[0] == '해고'
+    assert tokenize('연장근로')[0] == '연장근로'
+
+
+def test_short_stem_is_not_stripped():
+    assert '휴' not in tokenize('휴가')
+    assert '해' not in tokenize('해고')
+    assert '연장근' not in tokenize('연장근로')
+
+
+def test_unstripped_token_is_indexed():
+    tokens = tokenize('휴가를')
+    assert '휴가' in tokens and '휴가를' in tokens
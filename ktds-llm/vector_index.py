@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, List
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from hybrid_retriever import BM25Index
+
+try:
+    import hnswlib  # chromadb 설치 시 함께 설치되는 chroma-hnswlib
+except ImportError:
+    hnswlib = None
+
+# 문서 수가 이 값 이상이고 hnswlib가 있으면 전수 탐색 대신 HNSW 그래프 사용
+HNSW_MIN_DOCS = int(os.getenv("VECTOR_INDEX_HNSW_MIN_DOCS", "20000"))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _normalize_query(embedding):
+    query = np.asarray(embedding, dtype=np.float32)
+    return query / (np.linalg.norm(query) or 1.0)
+
+
+def mmr_select(query, candidates, k, lambda_mult=0.5):
+    """후보 벡터(정규화된 행렬)에서 MMR로 k개 선택한 후보 인덱스 목록
+
+    후보 간 유사도 행렬을 한 번만 계산하고, 선택된 문서와의 최대 유사도를
+    np.maximum으로 누적해 매 단계 O(fetch_k)로 다음 문서를 고른다.
+    """
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    query_sim = candidates @ query
+    pair_sim = candidates @ candidates.T
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = [int(np.argmax(query_sim))]
+    for _ in range(min(k, n) - 1):
+        last = selected[-1]
+        available[last] = False
+        np.maximum(max_sim, pair_sim[:, last], out=max_sim)
+        scores = lambda_mult * query_sim - (1 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+
+class _Snapshot:
+    """한 시점의 컬렉션 (문서 + 정규화된 float32 행렬 + 선택적 HNSW 그래프/BM25 색인)"""
+
+    def __init__(self, documents, matrix, with_bm25=False):
+        self.documents = documents
+        self.bm25 = BM25Index(documents) if with_bm25 else None
+        self.matrix = np.ascontiguousarray(_normalize_rows(matrix), dtype=np.float32)
+        self.graph = None
+        if hnswlib is not None and len(documents) >= HNSW_MIN_DOCS:
+            self.graph = hnswlib.Index(space='ip', dim=self.matrix.shape[1])
+            self.graph.init_index(max_elements=len(documents), ef_construction=200, M=16)
+            self.graph.add_items(self.matrix, np.arange(len(documents)))
+            self.graph.set_ef(100)
+
+    def top(self, query, fetch_k):
+        """질의와 코사인 유사도가 높은 후보 인덱스 (유사도 내림차순)"""
+        fetch_k = min(fetch_k, len(self.documents))
+        if fetch_k == 0:
+            return np.empty(0, dtype=np.int64)
+        if self.graph is not None:
+            labels, _ = self.graph.knn_query(query, k=fetch_k)
+            return labels[0].astype(np.int64)
+        scores = self.matrix @ query
+        if fetch_k < len(scores):
+            idx = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+        else:
+            idx = np.arange(len(scores))
+        return idx[np.argsort(-scores[idx])]
+
+
+class InMemoryVectorIndex:
+    """Chroma 컬렉션을 프로세스 메모리로 한 번 읽어 와 검색/MMR을 NumPy로 처리하는 인덱스
+
+    - 질의마다 Chroma에 임베딩을 다시 요청하지 않고 메모리의 float32 행렬에서 top-fetch_k 검색
+    - chroma.sqlite3 파일이 바뀌면(mtime/크기) 다음 검색 시 다시 읽어 교체 (hot reload)
+    - 재로드 확인은 reload_interval(초)마다 한 번만 수행
+    - with_bm25=True면 같은 문서로 BM25 색인도 만들어 스냅샷과 함께 교체 (index.bm25로 검색)
+    """
+
+    def __init__(self, chroma_db, sqlite_path=None, reload_interval=5.0, with_bm25=False):
+        self.chroma_db = chroma_db
+        persist_directory = getattr(chroma_db, '_persist_directory', None)
+        if sqlite_path is None and persist_directory:
+            sqlite_path = os.path.join(persist_directory, "chroma.sqlite3")
+        self.sqlite_path = sqlite_path
+        self.reload_interval = reload_interval
+        self.with_bm25 = with_bm25
+        self.bm25 = _SnapshotBM25(self)
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0.0
+        self._snapshot = None
+        self.reload()
+
+    def _file_signature(self):
+        if not self.sqlite_path or not os.path.exists(self.sqlite_path):
+            return None
+        stat = os.stat(self.sqlite_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """컬렉션 전체(임베딩 포함)를 읽어 스냅샷 교체"""
+        signature = self._file_signature()
+        data = self.chroma_db.get(include=['embeddings', 'documents', 'metadatas'])
+        documents = [
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas'])
+        ]
+        embeddings = data['embeddings']
+        matrix = np.asarray(embeddings if len(documents) else np.empty((0, 0)), dtype=np.float32)
+        snapshot = _Snapshot(documents, matrix, self.with_bm25)
+        with self._lock:
+            self._snapshot = snapshot
+            self._signature = signature
+            self._checked = time.monotonic()
+            self.reloads += 1
+
+    def _current(self):
+        now = time.monotonic()
+        if now - self._checked >= self.reload_interval:
+            self._checked = now
+            if self._file_signature() != self._signature:
+                self.reload()
+        return self._snapshot
+
+    def __len__(self):
+        return len(self._snapshot.documents)
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        snapshot = self._current()
+        query = _normalize_query(embedding)
+        return [snapshot.documents[i] for i in snapshot.top(query, k)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5):
+        snapshot = self._current()
+        query = _normalize_query(embedding)
+        idx = snapshot.top(query, fetch_k)
+        selected = mmr_select(query, snapshot.matrix[idx], k, lambda_mult)
+        return [snapshot.documents[idx[i]] for i in selected]
+
+
+class _SnapshotBM25:
+    """InMemoryVectorIndex의 현재 스냅샷에 있는 BM25 색인으로 검색 (BM25Index.search와 같은 형식)"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def search(self, query, k=10):
+        snapshot = self.index._current()
+        if snapshot.bm25 is None:
+            raise RuntimeError("BM25 색인이 없습니다. InMemoryVectorIndex(with_bm25=True)로 생성하세요.")
+        return snapshot.bm25.search(query, k)
+
+
+class InMemoryMMRRetriever(BaseRetriever):
+    """InMemoryVectorIndex로 MMR 검색하는 검색기 (chroma_db.as_retriever(search_type='mmr') 대체)"""
+
+    index: Any
+    embeddings: Any
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    model_config = {'arbitrary_types_allowed': True}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        vector = self.embeddings.embed_query(query)
+        return self.index.max_marginal_relevance_search_by_vector(
+            vector, k=self.k, fetch_k=self.fetch_k, lambda_mult=self.lambda_mult,
+        )
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return await asyncio.to_thread(self._get_relevant_documents, query)